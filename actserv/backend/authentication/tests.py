@@ -7,6 +7,7 @@ from django.core.exceptions import ImproperlyConfigured
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
+from core.query_budget import QueryBudgetTestMixin
 CustomUser = get_user_model()
 
 class CustomUserModelTest(TestCase):
@@ -245,3 +246,31 @@ class UserRegistrationAPITest(APITestCase):
 
 
 
+class AuthenticationQueryBudgetTest(QueryBudgetTestMixin, APITestCase):
+    """Authentication endpoints stay within their declared query budgets."""
+
+    def setUp(self):
+        self.credentials = {'username': 'budgetuser', 'password': 'StrongPassword123!'}
+        CustomUser.objects.create_user(email='budget@test.com', role='individual', **self.credentials)
+
+    def test_registration_budgets(self):
+        for i in range(20):
+            CustomUser.objects.create(username=f'bulk{i}', email=f'bulk{i}@test.com', role='individual')
+        response = self.request_within_budget('get', USER_REGISTRATION_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = {
+            'username': 'fresh', 'email': 'fresh@test.com', 'first_name': 'F', 'last_name': 'L',
+            'password': 'StrongPassword123!', 'confirm_password': 'StrongPassword123!', 'role': 'individual',
+        }
+        response = self.request_within_budget('post', USER_REGISTRATION_LIST_URL, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_token_budgets(self):
+        response = self.request_within_budget('post', reverse('token_obtain_pair'), self.credentials, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.request_within_budget(
+            'post', reverse('token_refresh'), {'refresh': response.data['refresh']}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -16,6 +16,7 @@ from rest_framework.exceptions import ValidationError
 class UserRegistrationCreateListAPIView(APIView):
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
+    query_budget = {'GET': 2, 'POST': 6}
     def post(self,request):
         data = request.data
         password = data.get('password')
@@ -40,6 +41,7 @@ class UserRegistrationCreateListAPIView(APIView):
     
 class LoginAPIView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    query_budget = {'POST': 5}
 
     def post(self, request, *args, **kwargs):
         response = super().post(request, *args, **kwargs)
@@ -1,4 +1,3 @@
-
 import os
 from celery import Celery
 
@@ -16,6 +15,26 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+def worker_argv(queue, loglevel='INFO'):
+    """
+    ``celery worker`` arguments for a worker serving only ``queue``, with its
+    concurrency and prefetch from ``QUEUE_WORKER_PROFILES``.
+    """
+    from django.conf import settings
+
+    profile = settings.QUEUE_WORKER_PROFILES[queue]
+    return [
+        'worker',
+        f'--queues={queue}',
+        f'--hostname={queue}@%h',
+        f'--concurrency={profile["concurrency"]}',
+        f'--prefetch-multiplier={profile["prefetch_multiplier"]}',
+        f'--loglevel={loglevel}',
+        # hand tasks to free processes only, so one long task does not hold back the ones queued behind it
+        '-O', 'fair',
+    ]
+
+
 @app.task(bind=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}')
\ No newline at end of file
+    print(f'Request: {self.request!r}')
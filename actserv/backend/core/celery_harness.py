@@ -0,0 +1,59 @@
+"""
+Test helpers for the Celery queue topology (``CELERY_TASK_*`` in settings.py).
+
+``CeleryHarnessMixin`` checks routing without a broker or a worker:
+
+* ``route_of(name)`` is the queue and priority the router gives a task;
+* ``memory_broker()`` publishes to kombu's in-memory transport. It yields a
+  ``send(task, *args, **kwargs)`` that publishes like ``.delay()``, and a
+  ``received(queue)`` that drains a queue into ``(task name, priority)``
+  pairs in the order a Redis broker would serve them (lowest priority number
+  first, FIFO within a priority, no priority counted as 0 like kombu's redis
+  transport does). The memory transport itself keeps one FIFO per queue;
+* ``eager()`` runs tasks inline, the way a worker would, errors included.
+  ``eager(propagate=False)`` keeps errors in the result instead, which is
+  also how eager retries run: a propagated ``Retry`` ends the call.
+"""
+from contextlib import contextmanager
+
+from .celery import app
+
+
+class CeleryHarnessMixin:
+
+    def route_of(self, name):
+        route = app.amqp.router.route({}, name)
+        return {'queue': route['queue'].name, 'priority': route.get('priority')}
+
+    @contextmanager
+    def memory_broker(self):
+        with app.connection_for_write('memory://') as connection:
+            channel = connection.default_channel
+            queues = {name: queue.bind(channel) for name, queue in app.amqp.queues.items()}
+            for queue in queues.values():
+                queue.declare()
+            producer = connection.Producer()
+
+            def send(task, *args, **kwargs):
+                return task.apply_async(args, kwargs, producer=producer)
+
+            def received(name):
+                messages = []
+                while (message := queues[name].get(no_ack=True)) is not None:
+                    messages.append((message.headers['task'], message.properties.get('priority')))
+                return sorted(messages, key=lambda item: item[1] or 0)
+
+            try:
+                yield send, received
+            finally:
+                for queue in queues.values():
+                    queue.purge()
+
+    @contextmanager
+    def eager(self, propagate=True):
+        previous = app.conf.task_always_eager, app.conf.task_eager_propagates
+        app.conf.task_always_eager, app.conf.task_eager_propagates = True, propagate
+        try:
+            yield
+        finally:
+            app.conf.task_always_eager, app.conf.task_eager_propagates = previous
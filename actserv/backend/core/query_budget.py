@@ -0,0 +1,132 @@
+"""
+Per-endpoint query budgets.
+
+Views declare how many SQL queries a request may run::
+
+    class FormCreateListAPIView(APIView):
+        query_budget = {'GET': 3, 'POST': 8}
+
+``QueryBudgetMiddleware`` (opt-in, see ``QUERY_BUDGET_ENABLED``) records the
+query count and total SQL time of every request and logs a warning when the
+view's budget is exceeded, or raises ``QueryBudgetExceeded`` when
+``QUERY_BUDGET_RAISE`` is set. Views we do not own get their budget from the
+``QUERY_BUDGETS`` setting, keyed by URL name. ``QueryBudgetTestMixin`` does
+the same check inside test cases.
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import resolve
+
+
+logger = logging.getLogger('core.query_budget')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def get_query_budget(view_class, method, url_name=None):
+    """
+    Budget for an HTTP method: ``QUERY_BUDGETS[url_name]`` from settings (for views
+    we do not own) or the view's ``query_budget``. None when there is none.
+    """
+    budget = getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+    if budget is None:
+        budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        return budget.get(method.upper())
+    return budget
+
+
+class QueryRecorder:
+    """
+    Context manager counting the queries (and their total time) run on every
+    database connection of the current thread.
+    """
+
+    def __init__(self, keep_statements=False):
+        self.keep_statements = keep_statements
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+            if self.keep_statements:
+                self.statements.append(sql)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+
+def budget_message(method, path, recorder, budget):
+    return (
+        f'{method} {path} ran {recorder.count} queries '
+        f'({recorder.duration_ms:.1f} ms) against a budget of {budget}'
+    )
+
+
+class QueryBudgetMiddleware:
+    """
+    Only queries run while the response is produced are counted; streamed
+    bodies run theirs after this middleware has returned.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view_class = getattr(match.func, 'view_class', None) if match else None
+        budget = get_query_budget(view_class, request.method, match.url_name if match else None)
+        logger.debug('%s %s: %d queries, %.1f ms', request.method, request.path, recorder.count, recorder.duration_ms)
+
+        if budget is not None and recorder.count > budget:
+            message = budget_message(request.method, request.path, recorder, budget)
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class QueryBudgetTestMixin:
+    """
+    Test case helpers: run a request through ``self.client`` and fail when it
+    runs more queries than the view's declared budget.
+    """
+
+    def request_within_budget(self, method, url, *args, **kwargs):
+        match = resolve(url.split('?')[0])
+        budget = get_query_budget(getattr(match.func, 'view_class', None), method, match.url_name)
+        self.assertIsNotNone(budget, f'{method} {url} does not declare a query budget')
+
+        with QueryRecorder(keep_statements=True) as recorder:
+            response = getattr(self.client, method.lower())(url, *args, **kwargs)
+        if recorder.count > budget:
+            statements = '\n'.join(recorder.statements)
+            raise QueryBudgetExceeded(f'{budget_message(method.upper(), url, recorder, budget)}\n{statements}')
+        response.query_count = recorder.count
+        response.query_time_ms = recorder.duration_ms
+        return response
@@ -14,6 +14,7 @@ from datetime import timedelta
 import os
 from pathlib import Path
 from decouple import config
+from kombu import Exchange, Queue
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -220,6 +221,49 @@ SITE_ID = 1
 # CELERY_RESULT_SERIALIZER = 'json'
 # CELERY_TIMEZONE = 'UTC'
 
+#celery queue configs
+# one queue per kind of work, so a long export or index build never holds up notifications;
+# run one worker per queue with `manage.py celery_worker <queue>` (see core/celery.py)
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_QUEUES = [
+    Queue(name, Exchange(name, type='direct'), routing_key=name)
+    for name in ('default', 'notifications', 'exports', 'media-processing', 'maintenance')
+]
+# redis priorities: 0 is served first, each queue is split into one list per step
+CELERY_BROKER_TRANSPORT_OPTIONS = {'queue_order_strategy': 'priority', 'priority_steps': list(range(10)), 'sep': ':'}
+# priorities come from the routes only: no CELERY_TASK_DEFAULT_PRIORITY, since apply_async fills it in
+# before routing and it would override every route's priority
+CELERY_TASK_ROUTES = {
+    'forms.tasks.notify_admin_of_submission': {'queue': 'notifications', 'priority': 0},
+    'forms.tasks.relay_outbox': {'queue': 'notifications', 'priority': 0},
+    'forms.tasks.send_admin_digests': {'queue': 'notifications', 'priority': 3},
+    'forms.tasks.export_submissions': {'queue': 'exports', 'priority': 5},
+    'forms.tasks.sync_search_index': {'queue': 'maintenance', 'priority': 7},
+}
+# rate limits apply per worker
+CELERY_TASK_ANNOTATIONS = {
+    'forms.tasks.notify_admin_of_submission': {'rate_limit': config('NOTIFICATION_RATE_LIMIT', default='60/m')},
+    'forms.tasks.export_submissions': {'rate_limit': config('EXPORT_RATE_LIMIT', default='6/m')},
+    'forms.tasks.sync_search_index': {'rate_limit': config('SEARCH_INDEX_RATE_LIMIT', default='30/m')},
+}
+# concurrency and prefetch of the worker for each queue; long tasks are never prefetched
+QUEUE_WORKER_PROFILES = {
+    'default': {'concurrency': 2, 'prefetch_multiplier': 4},
+    'notifications': {
+        'concurrency': config('NOTIFICATIONS_WORKER_CONCURRENCY', default=4, cast=int),
+        'prefetch_multiplier': config('NOTIFICATIONS_WORKER_PREFETCH', default=4, cast=int),
+    },
+    'exports': {
+        'concurrency': config('EXPORTS_WORKER_CONCURRENCY', default=2, cast=int),
+        'prefetch_multiplier': 1,
+    },
+    'media-processing': {
+        'concurrency': config('MEDIA_WORKER_CONCURRENCY', default=2, cast=int),
+        'prefetch_multiplier': 1,
+    },
+    'maintenance': {'concurrency': 1, 'prefetch_multiplier': 1},
+}
+
 #email configs
 # --- EMAIL CONFIGURATION ---
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -252,3 +296,119 @@ SPECTACULAR_SETTINGS = {
     'CONTACT': {'name': 'System Admin', 'email': 'summitseekers254@gmail.com'},
 }
 
+#cache configs
+# point REDIS_URL at a shared redis so every worker sees the same cache (and schema invalidations)
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# max number of compiled form schemas each process keeps in memory
+FORM_SCHEMA_CACHE_SIZE = config('FORM_SCHEMA_CACHE_SIZE', default=256, cast=int)
+# without REDIS_URL schema invalidations stay in the process that made them;
+# other processes then recompile a form's schema once it is this many seconds old (0: never)
+FORM_SCHEMA_LOCAL_TTL = config('FORM_SCHEMA_LOCAL_TTL', default=5, cast=float)
+# published form snapshots each process keeps compiled (they never change)
+FORM_SNAPSHOT_CACHE_SIZE = config('FORM_SNAPSHOT_CACHE_SIZE', default=1024, cast=int)
+
+#response cache configs
+# rendered public form/field reads, invalidated by Form and Field signals;
+# on by default only with a shared cache, as the signals clear a local memory cache in one process only
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=bool(REDIS_URL), cast=bool)
+RESPONSE_CACHE_ALIAS = config('RESPONSE_CACHE_ALIAS', default='default')
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=3600, cast=int)
+# how long one request may hold a key while rendering, and how long the others wait for it
+RESPONSE_CACHE_LOCK_TIMEOUT = config('RESPONSE_CACHE_LOCK_TIMEOUT', default=10, cast=int)
+RESPONSE_CACHE_LOCK_WAIT = config('RESPONSE_CACHE_LOCK_WAIT', default=2.0, cast=float)
+
+#query budget configs
+# opt-in: count queries per request and warn (or raise, with QUERY_BUDGET_RAISE) when a view's query_budget is exceeded
+QUERY_BUDGET_ENABLED = config('QUERY_BUDGET_ENABLED', default=False, cast=bool)
+QUERY_BUDGET_RAISE = config('QUERY_BUDGET_RAISE', default=False, cast=bool)
+# budgets for views we do not own, keyed by url name
+QUERY_BUDGETS = {
+    'token_refresh': {'POST': 3},
+}
+if QUERY_BUDGET_ENABLED:
+    MIDDLEWARE.insert(0, 'core.query_budget.QueryBudgetMiddleware')
+
+#pagination configs
+SUBMISSION_PAGE_SIZE = config('SUBMISSION_PAGE_SIZE', default=50, cast=int)
+# upper bound for ?page_size= on submission listings
+SUBMISSION_MAX_PAGE_SIZE = config('SUBMISSION_MAX_PAGE_SIZE', default=200, cast=int)
+# rows fetched per round trip when a list is streamed with ?stream=json|ndjson
+STREAM_CHUNK_SIZE = config('STREAM_CHUNK_SIZE', default=500, cast=int)
+
+#bulk ingest configs
+# rows per bulk_create batch (and transaction) on POST submissions/bulk/
+BULK_INGEST_BATCH_SIZE = config('BULK_INGEST_BATCH_SIZE', default=500, cast=int)
+BULK_INGEST_MAX_RECORDS = config('BULK_INGEST_MAX_RECORDS', default=10000, cast=int)
+
+#submission value projection configs
+# write typed copies of answers on save and use them for answer ranges and ?order_by=data.<field>;
+# run `manage.py backfill_submission_values` after turning it on
+SUBMISSION_PROJECTION_ENABLED = config('SUBMISSION_PROJECTION_ENABLED', default=False, cast=bool)
+
+#submission analytics configs
+# number/date answers kept as NumPy columns per form, extended with new submissions on each read
+ANALYTICS_CACHE_ALIAS = config('ANALYTICS_CACHE_ALIAS', default='default')
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', default=3600, cast=int)
+ANALYTICS_CHUNK_SIZE = config('ANALYTICS_CHUNK_SIZE', default=2000, cast=int)
+
+#submission export configs
+# rows per read from the cursor, per CSV write and per Parquet row group
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=5000, cast=int)
+
+#resumable upload configs
+# chunks are staged on a volume every web worker shares (MEDIA_ROOT/partial by default)
+UPLOAD_STAGING_ROOT = config('UPLOAD_STAGING_ROOT', default='')
+UPLOAD_MAX_SIZE = config('UPLOAD_MAX_SIZE', default=50 * 1024 * 1024, cast=int)
+UPLOAD_READ_SIZE = config('UPLOAD_READ_SIZE', default=64 * 1024, cast=int)
+
+#document blob configs
+BLOB_READ_SIZE = config('BLOB_READ_SIZE', default=64 * 1024, cast=int)
+# unreferenced blobs are kept this long (seconds) before prune_blobs deletes them
+BLOB_PRUNE_GRACE = config('BLOB_PRUNE_GRACE', default=3600, cast=int)
+
+#direct upload configs
+# 'local' takes the presigned PUTs itself (development, tests); 's3' signs them for DIRECT_UPLOAD_BUCKET,
+# which must be the bucket behind the default storage (objects are copied into it server side);
+# the forms.E001 system check stops startup when it is not
+DIRECT_UPLOAD_BACKEND = config('DIRECT_UPLOAD_BACKEND', default='local')
+DIRECT_UPLOAD_BUCKET = config('DIRECT_UPLOAD_BUCKET', default='')
+# set for MinIO and other S3-compatible stores
+DIRECT_UPLOAD_ENDPOINT_URL = config('DIRECT_UPLOAD_ENDPOINT_URL', default='')
+DIRECT_UPLOAD_REGION = config('DIRECT_UPLOAD_REGION', default='')
+# seconds a presigned URL stays valid
+DIRECT_UPLOAD_EXPIRES = config('DIRECT_UPLOAD_EXPIRES', default=900, cast=int)
+DIRECT_UPLOAD_LOCAL_ROOT = config('DIRECT_UPLOAD_LOCAL_ROOT', default='')
+
+#outbox configs
+# messages handed to the broker per relay transaction
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=100, cast=int)
+OUTBOX_RELAY_INTERVAL = config('OUTBOX_RELAY_INTERVAL', default=5, cast=float)
+OUTBOX_RETENTION_DAYS = config('OUTBOX_RETENTION_DAYS', default=7, cast=int)
+
+#admin notification configs
+# 'digest' emails each admin one list of new submissions per window; 'immediate' sends one email per submission
+ADMIN_NOTIFICATION_MODE = config('ADMIN_NOTIFICATION_MODE', default='digest')
+# seconds between digests
+ADMIN_DIGEST_WINDOW = config('ADMIN_DIGEST_WINDOW', default=300, cast=float)
+ADMIN_DIGEST_BATCH_SIZE = config('ADMIN_DIGEST_BATCH_SIZE', default=1000, cast=int)
+# prefix of the admin links in notification emails
+ADMIN_BASE_URL = config('ADMIN_BASE_URL', default='http://127.0.0.1:8001')
+
+CELERY_BEAT_SCHEDULE = {
+    'relay-outbox': {'task': 'forms.tasks.relay_outbox', 'schedule': OUTBOX_RELAY_INTERVAL},
+    'send-admin-digests': {'task': 'forms.tasks.send_admin_digests', 'schedule': ADMIN_DIGEST_WINDOW},
+}
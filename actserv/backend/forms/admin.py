@@ -6,6 +6,8 @@ admin.site.register(Form)
 
 admin.site.register(Field)
 
+admin.site.register(FormSnapshot)
+
 admin.site.register(Submission)
 
 admin.site.register(Document)
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+Per-field statistics over submissions.
+
+The answers of a form's number and date fields are read from
+``Submission.data`` once, streamed from the database ``ANALYTICS_CHUNK_SIZE``
+rows at a time, and kept as NumPy columns: one float array per field (dates
+as day ordinals, NaN where the answer is missing or unparseable) next to the
+status and submission day of every row. Statistics, status and date filters
+are then vectorized passes over those arrays.
+
+The columns are cached per form under the form's version and schema revision
+together with their high-water mark, the highest submission id read, so a
+later call only reads and appends the submissions created since. Ids are
+taken before commit, so a submission can become visible below the mark after
+it was passed: every later call also counts the rows up to the mark, and a
+count that differs from the columns rebuilds them. Status and data edits and
+deletes invalidate the form's entry (see signals.py); changes that bypass
+signals are picked up when the entry expires, ``ANALYTICS_CACHE_TIMEOUT``
+seconds after it was built (folding new rows in does not extend it).
+
+Answers too large for a float64 (``inf``) count as unanswered.
+"""
+import datetime
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .counters import submission_day
+from .models import Submission
+from .schema import get_form_schema
+from .values import parse_date, parse_number
+
+
+STATISTICS_KEY = 'forms:statistics:{form_id}'
+STATISTIC_TYPES = ('number', 'date')
+STATUS_CODES = {status: code for code, (status, _) in enumerate(Submission.STATUS_CHOICES)}
+PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_BINS = 10
+MAX_BINS = 100
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')]
+
+
+def _number(value):
+    number = parse_number(value)
+    return float(number) if number is not None else np.nan
+
+
+def _day(value):
+    date = parse_date(value)
+    return float(date.toordinal()) if date is not None else np.nan
+
+
+EXTRACTORS = {'number': _number, 'date': _day}
+
+
+class SubmissionColumns:
+    """
+    The answers of ``fields`` (number and date ``FieldSchema``) of one form,
+    one array element per submission, in submission id order.
+    """
+
+    def __init__(self, form_id, version, revision, fields):
+        self.form_id = form_id
+        self.version = version
+        self.revision = revision
+        self.types = {field.name: field.type for field in fields}
+        self.built_at = time.time()
+        self.high_water_mark = 0
+        self.status = np.empty(0, dtype=np.int8)
+        self.day = np.empty(0, dtype=np.int32)
+        self.values = {name: np.empty(0, dtype=np.float64) for name in self.types}
+
+    def __len__(self):
+        return len(self.status)
+
+    def matches(self, schema):
+        return (self.form_id, self.version, self.revision) == (schema.id, schema.version, schema.revision)
+
+    def expires_in(self, timeout):
+        """Seconds left of ``timeout`` counted from when the columns were first built."""
+        return getattr(self, 'built_at', 0) + timeout - time.time()
+
+    def missed_rows(self):
+        """True when the submissions up to the high-water mark are no longer the ones read."""
+        count = Submission.objects.filter(form_id=self.form_id, pk__lte=self.high_water_mark).count()
+        return count != len(self)
+
+    def _extract(self, rows):
+        """Arrays of ``(id, status, submitted_at, data)`` rows: status, day and one per field."""
+        count = len(rows)
+        status = np.fromiter((STATUS_CODES[status] for _, status, _, _ in rows), dtype=np.int8, count=count)
+        day = np.fromiter(
+            (submission_day(submitted_at).toordinal() for _, _, submitted_at, _ in rows), dtype=np.int32, count=count
+        )
+        values = {
+            name: np.fromiter(
+                (EXTRACTORS[field_type](data.get(name)) if isinstance(data, dict) else np.nan for _, _, _, data in rows),
+                dtype=np.float64, count=count,
+            )
+            for name, field_type in self.types.items()
+        }
+        return status, day, values
+
+    def fold_in(self, chunk_size=None):
+        """
+        Appends the form's submissions past the high-water mark, read and
+        extracted ``chunk_size`` rows at a time. Returns how many were added.
+        """
+        chunk_size = chunk_size or getattr(settings, 'ANALYTICS_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+        rows = (
+            Submission.objects.filter(form_id=self.form_id, pk__gt=self.high_water_mark)
+            .order_by('pk').values_list('pk', 'status', 'submitted_at', 'data')
+            .iterator(chunk_size=chunk_size)
+        )
+        chunks = []
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                chunks.append(self._extract(chunk))
+                self.high_water_mark = chunk[-1][0]
+                chunk = []
+        if chunk:
+            chunks.append(self._extract(chunk))
+            self.high_water_mark = chunk[-1][0]
+        if not chunks:
+            return 0
+
+        # one copy per column, however many chunks were read
+        self.status = np.concatenate([self.status] + [status for status, _, _ in chunks])
+        self.day = np.concatenate([self.day] + [day for _, day, _ in chunks])
+        for name in self.types:
+            self.values[name] = np.concatenate([self.values[name]] + [values[name] for _, _, values in chunks])
+        return sum(len(status) for status, _, _ in chunks)
+
+    def mask(self, status=None, since=None, until=None):
+        selected = np.ones(len(self), dtype=bool)
+        if status is not None:
+            selected &= self.status == STATUS_CODES[status]
+        if since is not None:
+            selected &= self.day >= since.toordinal()
+        if until is not None:
+            selected &= self.day <= until.toordinal()
+        return selected
+
+
+def _as_type(field_type, value):
+    if field_type == 'date':
+        return datetime.date.fromordinal(int(round(value))).isoformat()
+    return round(float(value), 6)
+
+
+def describe(values, field_type, bins=DEFAULT_BINS):
+    """min, max, mean, percentiles, histogram and null ratio of one column."""
+    # np.histogram refuses inf, and it would swamp the mean anyway
+    answered = values[np.isfinite(values)]
+    stats = {
+        'count': int(len(values)),
+        'answered': int(len(answered)),
+        'null_ratio': round(float(1 - len(answered) / len(values)), 6) if len(values) else None,
+    }
+    if not len(answered):
+        return {**stats, 'min': None, 'max': None, 'mean': None, 'percentiles': {}, 'histogram': []}
+
+    counts, edges = np.histogram(answered, bins=bins)
+    percentiles = np.percentile(answered, PERCENTILES)
+    return {
+        **stats,
+        'min': _as_type(field_type, answered.min()),
+        'max': _as_type(field_type, answered.max()),
+        'mean': _as_type(field_type, answered.mean()),
+        'percentiles': {f'p{p}': _as_type(field_type, value) for p, value in zip(PERCENTILES, percentiles)},
+        'histogram': [
+            {'start': _as_type(field_type, start), 'end': _as_type(field_type, end), 'count': int(count)}
+            for start, end, count in zip(edges[:-1], edges[1:], counts)
+        ],
+    }
+
+
+def get_columns(form_id):
+    """
+    Columns of a form's number and date answers, brought up to date. Raises
+    ``Form.DoesNotExist`` for unknown ids.
+    """
+    schema = get_form_schema(form_id)
+    key = STATISTICS_KEY.format(form_id=schema.id)
+    timeout = getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 3600)
+    columns = _cache().get(key)
+    stale = columns is None or not columns.matches(schema) or columns.expires_in(timeout) <= 0
+    added = 0
+    if not stale:
+        added = columns.fold_in()
+        stale = columns.missed_rows()
+    if stale:
+        fields = [field for field in schema.fields if field.type in STATISTIC_TYPES]
+        columns = SubmissionColumns(schema.id, schema.version, schema.revision, fields)
+        added = columns.fold_in()
+
+    if added or stale:
+        _cache().set(key, columns, max(1, int(columns.expires_in(timeout))))
+    return columns
+
+
+def field_statistics(form_id, names=None, status=None, since=None, until=None, bins=DEFAULT_BINS):
+    """
+    Statistics of the number and date fields of a form (or those in
+    ``names``) over its submissions, optionally only those with ``status``
+    made between ``since`` and ``until`` (dates, inclusive).
+    """
+    columns = get_columns(form_id)
+    selected = columns.mask(status, since, until)
+    return {
+        'submissions': int(selected.sum()),
+        'high_water_mark': columns.high_water_mark,
+        'fields': {
+            name: {'type': field_type, **describe(columns.values[name][selected], field_type, bins)}
+            for name, field_type in columns.types.items()
+            if names is None or name in names
+        },
+    }
+
+
+def invalidate_form_statistics(form_id):
+    _cache().delete(STATISTICS_KEY.format(form_id=form_id))
@@ -0,0 +1,105 @@
+"""
+Files sent with a submission.
+
+Uploads are matched to the form's ``type='file'`` fields from the compiled
+schema, by field name or id (``Image`` or ``12``), so no field is looked up
+per file. Each field may limit its uploads in ``options``::
+
+    {"max_size": 5242880, "content_types": ["application/pdf", "image/*"], "max_files": 3}
+
+``max_size`` is in bytes and ``content_types`` is checked against the type
+the client declared for each file. A required file field that is shown (see
+conditions.py) needs at least one file. Every problem is reported, keyed by
+field name, in one response.
+
+The same rules hold for finished resumable and direct uploads attached
+later (``check_upload``, called by ``uploads.attach_upload``).
+"""
+from .validation import REQUIRED_MESSAGE
+from .values import parse_number
+
+
+def _rules(field):
+    return field.options if hasattr(field.options, 'get') else {}
+
+
+def _max_files(field):
+    return parse_number(_rules(field).get('max_files'))
+
+
+def _type_allowed(content_type, allowed):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    family = content_type.split('/')[0]
+    return any(pattern == content_type or pattern == f'{family}/*' for pattern in allowed)
+
+
+def _check(field, name, size, content_type):
+    rules = _rules(field)
+    errors = []
+    max_size = parse_number(rules.get('max_size'))
+    if max_size is not None and size > max_size:
+        errors.append(f'{name}: must be at most {int(max_size)} bytes.')
+    allowed = [str(pattern).lower() for pattern in rules.get('content_types') or ()]
+    if allowed and not _type_allowed(content_type, allowed):
+        errors.append(f'{name}: must be one of {", ".join(allowed)}.')
+    return errors
+
+
+def check_file(field, file):
+    """Messages for one uploaded ``file`` of ``field`` (a ``FieldSchema``); empty when it is acceptable."""
+    return _check(field, file.name, file.size, file.content_type)
+
+
+def check_upload(field, upload, attached):
+    """
+    Messages for attaching a finished ``upload`` to ``field`` (a ``Field`` or
+    ``FieldSchema``) that already holds ``attached`` documents of the submission.
+    """
+    errors = _check(field, upload.filename, upload.size, upload.content_type)
+    max_files = _max_files(field)
+    if max_files is not None and attached >= max_files:
+        errors.append(f'At most {int(max_files)} files.')
+    return errors
+
+
+def _required_file_fields(schema, data):
+    required = [field for field in schema.fields if field.type == 'file' and field.is_required]
+    if not required or schema.validator.graph is None:
+        return required
+    # a field hidden by its condition is not required
+    states = schema.validator.visibility(data if isinstance(data, dict) else {})
+    return [field for field in required if states[field.name].required]
+
+
+def match_files(schema, files, data=None):
+    """
+    Pairs the uploads in ``files`` (``request.FILES``) with the file fields
+    of ``schema``, for a submission answering ``data``. Returns
+    ``([(field_id, file), ...], errors)``; uploads under a key that is not a
+    file field of the form are errors too.
+    """
+    file_fields = {field.name: field for field in schema.fields if field.type == 'file'}
+    file_fields.update({str(field.id): field for field in list(file_fields.values())})
+
+    by_field, errors = {}, {}
+    for key in files:
+        field = file_fields.get(key)
+        if field is None:
+            errors[key] = ['Not a file field of this form.']
+            continue
+        by_field.setdefault(field.id, (field, []))[1].extend(files.getlist(key))
+
+    matched = []
+    for field, uploads in by_field.values():
+        messages = [message for file in uploads for message in check_file(field, file)]
+        max_files = _max_files(field)
+        if max_files is not None and len(uploads) > max_files:
+            messages.append(f'At most {int(max_files)} files.')
+        if messages:
+            errors[field.name] = messages
+        matched.extend((field.id, file) for file in uploads)
+
+    for field in _required_file_fields(schema, data):
+        if field.id not in by_field:
+            errors[field.name] = [REQUIRED_MESSAGE]
+    return matched, errors
@@ -0,0 +1,187 @@
+"""
+Content-addressed document storage.
+
+Document bytes are stored once per sha256 digest, as a ``Blob`` named
+``uploads/blobs/<ab>/<cd>/<digest>``. Storing a file first hashes it in one
+streaming pass (``BLOB_READ_SIZE`` bytes at a time). When a blob with that
+digest already exists, its ``ref_count`` goes up and nothing is written, so
+the same passport scan attached to ten submissions costs one file and ten
+rows. Only a new digest is copied to storage.
+
+Every ``Document`` holding a blob, and every finished ``Upload`` not attached
+yet, is one reference. Deleting them releases it (see signals.py). Blobs left
+without references are deleted by ``prune_blobs``, never inline, and
+``verify_blobs`` re-hashes stored files against their digest.
+"""
+import datetime
+import hashlib
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from .models import Blob, Document
+
+
+DEFAULT_READ_SIZE = 64 * 1024
+DEFAULT_PRUNE_GRACE = 3600
+
+
+def blob_name(digest):
+    return f'uploads/blobs/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def hash_file(file):
+    """sha256 hex digest and size of a file, read from the start in chunks; leaves it rewound."""
+    read_size = getattr(settings, 'BLOB_READ_SIZE', DEFAULT_READ_SIZE)
+    hasher = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    while True:
+        piece = file.read(read_size)
+        if not piece:
+            break
+        hasher.update(piece)
+        size += len(piece)
+    file.seek(0)
+    return hasher.hexdigest(), size
+
+
+def _reference(digests):
+    """
+    Takes ``digests[digest]`` references on each stored blob among
+    ``digests`` and returns those blobs by digest (two queries).
+    """
+    with transaction.atomic():
+        # locked against a concurrent prune deleting them under us
+        blobs = {blob.digest: blob for blob in Blob.objects.select_for_update().filter(digest__in=list(digests))}
+        if blobs:
+            Blob.objects.filter(pk__in=[blob.pk for blob in blobs.values()]).update(
+                ref_count=F('ref_count') + Case(
+                    *(When(pk=blob.pk, then=Value(digests[digest])) for digest, blob in blobs.items()),
+                    output_field=PositiveIntegerField(),
+                ),
+                updated_at=timezone.now(),
+            )
+            for digest, blob in blobs.items():
+                blob.ref_count += digests[digest]
+        return blobs
+
+
+def store_blobs(files):
+    """
+    Returns the ``Blob`` holding the content of each of ``files`` (seekable
+    file objects), in order, with one more reference per file. Known digests
+    are looked up and referenced together; only new content is written, once
+    per digest, and inserted in one ``bulk_create``.
+    """
+    hashed = [hash_file(file) for file in files]
+    counts = Counter(digest for digest, _ in hashed)
+    blobs = _reference(counts)
+
+    new = {}
+    for file, (digest, size) in zip(files, hashed):
+        if digest not in blobs and digest not in new:
+            name = default_storage.save(blob_name(digest), File(file))
+            new[digest] = Blob(digest=digest, size=size, file=name, ref_count=counts[digest])
+    if new:
+        try:
+            with transaction.atomic():
+                Blob.objects.bulk_create(new.values())
+            blobs.update(new)
+        except IntegrityError:
+            # some were stored concurrently by another request: use theirs
+            stored = _reference({digest: counts[digest] for digest in new})
+            for digest, blob in new.items():
+                if digest in stored:
+                    default_storage.delete(blob.file.name)
+                else:
+                    blob.save()
+            blobs.update(new)
+            blobs.update(stored)
+    return [blobs[digest] for digest, _ in hashed]
+
+
+def store_blob(file):
+    """The ``Blob`` holding the content of ``file``, with one more reference."""
+    return store_blobs([file])[0]
+
+
+def adopt_blob(digest, size, promote):
+    """
+    The ``Blob`` of content that was hashed and stored elsewhere (a direct
+    upload), with one more reference. ``promote(name)`` copies it into
+    storage under ``name`` and returns the stored name; it is only called
+    when no blob has the digest yet.
+    """
+    blob = _reference({digest: 1}).get(digest)
+    if blob is not None:
+        return blob
+
+    name = promote(blob_name(digest))
+    try:
+        with transaction.atomic():
+            return Blob.objects.create(digest=digest, size=size, file=name, ref_count=1)
+    except IntegrityError:
+        default_storage.delete(name)
+        return _reference({digest: 1})[digest]
+
+
+def release_blob(blob_id):
+    """Drops one reference; the blob is deleted by ``prune_blobs`` once none are left."""
+    Blob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1, updated_at=timezone.now())
+
+
+def store_documents(submission, uploads):
+    """
+    Creates the ``Document`` rows of ``submission`` for ``(field_id, file)``
+    pairs in one ``bulk_create``, after storing their content.
+    """
+    uploads = list(uploads)
+    if not uploads:
+        return []
+    blobs = store_blobs([file for _, file in uploads])
+    return Document.objects.bulk_create([
+        Document(
+            submission=submission,
+            field_id=field_id,
+            blob=blob,
+            file=blob.file.name,
+            filename=os.path.basename(file.name or ''),
+        )
+        for (field_id, file), blob in zip(uploads, blobs)
+    ])
+
+
+def verify_blob(blob):
+    """True when the stored file of ``blob`` still hashes to its digest."""
+    try:
+        with blob.file.open('rb') as file:
+            digest, size = hash_file(file)
+    except FileNotFoundError:
+        return False
+    return (digest, size) == (blob.digest, blob.size)
+
+
+def prune_blobs(grace=None):
+    """
+    Deletes blobs that have had no references for ``grace`` seconds
+    (``BLOB_PRUNE_GRACE``), with their files, and returns how many.
+    """
+    grace = getattr(settings, 'BLOB_PRUNE_GRACE', DEFAULT_PRUNE_GRACE) if grace is None else grace
+    cutoff = timezone.now() - datetime.timedelta(seconds=grace)
+    with transaction.atomic():
+        blobs = list(
+            Blob.objects.select_for_update(skip_locked=True)
+            .filter(ref_count=0, updated_at__lte=cutoff).only('pk', 'file')
+        )
+        Blob.objects.filter(pk__in=[blob.pk for blob in blobs]).delete()
+        names = [blob.file.name for blob in blobs]
+        # the files go once the rows are gone for good
+        transaction.on_commit(lambda: [default_storage.delete(name) for name in names])
+    return len(blobs)
@@ -0,0 +1,18 @@
+from django.core import checks
+from django.conf import settings
+
+from .object_storage import direct_upload_storage_error
+
+
+@checks.register(checks.Tags.compatibility)
+def check_direct_upload_storage(app_configs, **kwargs):
+    """S3 direct uploads are copied inside their bucket, so documents must be served from it too."""
+    error = direct_upload_storage_error()
+    if error is None:
+        return []
+    return [checks.Error(
+        error,
+        hint=f'Set STORAGES["default"] to an S3 storage of the bucket {settings.DIRECT_UPLOAD_BUCKET!r} '
+             'or use DIRECT_UPLOAD_BACKEND="local".',
+        id='forms.E001',
+    )]
@@ -0,0 +1,166 @@
+"""
+Conditional visibility rules resolved as a dependency graph.
+
+Each conditional field depends on the field named by ``conditional_field``. The
+graph is built once per compiled form schema, ordered topologically (cycles are
+rejected), and used to work out which fields are visible and required for a
+payload. When a single answer changes only its dependents are re-evaluated.
+"""
+from collections import deque, namedtuple
+
+from django.core.exceptions import ValidationError
+
+from .values import is_empty, parse_number
+
+
+FieldState = namedtuple('FieldState', ['visible', 'required'])
+
+
+class ConditionCycleError(ValueError):
+    """Raised when conditional rules form a cycle."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        super().__init__(f"Conditional fields form a cycle: {' -> '.join(self.names)}")
+
+
+OPERATORS = {
+    'equal_to': lambda left, right: left == right,
+    'not_equal_to': lambda left, right: left != right,
+    'greater_than': lambda left, right: left > right,
+    'less_than': lambda left, right: left < right,
+}
+
+
+def condition_holds(rule, value):
+    """
+    Evaluates a ``ConditionRule`` against the controlling field's answer. Numbers
+    compare numerically, booleans and everything else as case-insensitive strings.
+    """
+    if is_empty(value):
+        return rule.operator == 'not_equal_to' and not is_empty(rule.value)
+    compare = OPERATORS[rule.operator]
+    left, right = parse_number(value), parse_number(rule.value)
+    if left is not None and right is not None:
+        return compare(left, right)
+    if rule.operator in ('greater_than', 'less_than'):
+        return False
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    return compare(str(value).strip().lower(), str(rule.value or '').strip().lower())
+
+
+class ConditionGraph:
+    """
+    Dependency DAG of a form's fields, keyed by field name.
+    """
+
+    def __init__(self, fields):
+        self.fields = {field.name: field for field in fields}
+        self.dependents = {name: [] for name in self.fields}
+        self.controllers = {}
+        for field in self.fields.values():
+            rule = field.condition
+            if rule is not None and rule.field_name in self.fields:
+                self.controllers[field.name] = rule.field_name
+                self.dependents[rule.field_name].append(field.name)
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        pending = {name: 1 if name in self.controllers else 0 for name in self.fields}
+        ready = deque(name for name in self.fields if not pending[name])
+        order = []
+        while ready:
+            name = ready.popleft()
+            order.append(name)
+            for dependent in self.dependents[name]:
+                pending[dependent] -= 1
+                if not pending[dependent]:
+                    ready.append(dependent)
+        if len(order) != len(self.fields):
+            raise ConditionCycleError(self._find_cycle(set(self.fields) - set(order)))
+        return tuple(order)
+
+    def _find_cycle(self, remaining):
+        name = next(iter(sorted(remaining)))
+        path = []
+        while name not in path:
+            path.append(name)
+            name = self.controllers[name]
+        return path[path.index(name):] + [name]
+
+    def descendants(self, names):
+        """``names`` plus every field whose visibility depends on them, directly or not."""
+        seen = set()
+        stack = [name for name in names if name in self.fields]
+        while stack:
+            name = stack.pop()
+            if name not in seen:
+                seen.add(name)
+                stack.extend(self.dependents[name])
+        return seen
+
+    def ancestors(self, names):
+        """Every field that ``names`` depend on, directly or not."""
+        seen = set()
+        for name in names:
+            while name in self.controllers and self.controllers[name] not in seen:
+                name = self.controllers[name]
+                seen.add(name)
+        return seen
+
+    def _evaluate(self, payload, names, states):
+        for name in names:
+            field = self.fields[name]
+            controller = self.controllers.get(name)
+            visible = controller is None or (
+                states[controller].visible and condition_holds(field.condition, payload.get(controller))
+            )
+            states[name] = FieldState(visible, visible and field.is_required)
+        return states
+
+    def evaluate(self, payload):
+        """Returns ``{field_name: FieldState}`` for every field of the form."""
+        return self._evaluate(payload, self.order, {})
+
+    def reevaluate(self, payload, changed, states=None):
+        """
+        Re-evaluates only the fields affected by the ``changed`` answers. Pass the
+        previous ``states`` to skip their controllers; without them the affected
+        fields' ancestors are evaluated too. Returns ``(states, affected_names)``.
+        """
+        affected = self.descendants(changed)
+        if states is None:
+            needed, states = affected | self.ancestors(affected), {}
+        else:
+            needed, states = affected, dict(states)
+        return self._evaluate(payload, [name for name in self.order if name in needed], states), affected
+
+
+def validate_conditional_link(field):
+    """
+    Checks that a field's ``conditional_field`` is another field of the same form
+    and that the link does not close a cycle. Loads the form's links in one query
+    and raises ``ValidationError`` on the ``conditional_field`` key.
+    """
+    from .models import Field
+
+    controller_id = field.conditional_field_id
+    if controller_id is None:
+        return
+    if field.pk is not None and controller_id == field.pk:
+        raise ValidationError({'conditional_field': 'A field cannot depend on itself.'})
+
+    links = dict(Field.objects.filter(form_id=field.form_id).values_list('id', 'conditional_field_id'))
+    if controller_id not in links:
+        raise ValidationError({'conditional_field': 'The controlling field must belong to the same form.'})
+    if field.pk is None:
+        return
+
+    links[field.pk] = controller_id
+    current, seen = controller_id, set()
+    while current is not None and current not in seen:
+        if current == field.pk:
+            raise ValidationError({'conditional_field': 'This conditional rule would create a cycle.'})
+        seen.add(current)
+        current = links.get(current)
@@ -0,0 +1,165 @@
+"""
+Submission counters for the admin dashboard.
+
+Counting submissions per form and status, or per day, is a ``COUNT(*)`` over
+the whole table that grows with every month of intake. Instead two small
+tables keep running totals: ``SubmissionCount`` per ``(form, status)`` and
+``SubmissionDailyCount`` per ``(form, day)``. They are updated in the same
+transaction as the submission (see signals.py, and ingest.py for bulk
+inserts) with one upsert per table,
+``INSERT ... ON CONFLICT DO UPDATE SET count = count + EXCLUDED.count``, so
+concurrent writers never lose an increment. The dashboard then reads
+O(forms) rows.
+
+``QuerySet.update()`` and ``QuerySet.delete()`` on submissions bypass the
+signals; ``repair_submission_counts`` recomputes the totals from the
+submissions after such changes, or whenever they are suspected to drift.
+"""
+import datetime
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Form, Submission, SubmissionCount, SubmissionDailyCount
+
+
+DEFAULT_REPAIR_CHUNK_SIZE = 10000
+DEFAULT_DASHBOARD_DAYS = 30
+MAX_DASHBOARD_DAYS = 366
+# rows per upsert statement, well under sqlite's bound parameter limit
+UPSERT_BATCH_SIZE = 300
+
+
+def submission_day(submitted_at):
+    """The day a submission counts towards, in the current time zone."""
+    if timezone.is_aware(submitted_at):
+        return timezone.localdate(submitted_at)
+    return submitted_at.date()
+
+
+def _add(model, key, deltas):
+    rows = sorted((form_id, value, delta) for (form_id, value), delta in deltas.items() if delta)
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table, key_column, count = quote(model._meta.db_table), quote(key), quote('count')
+    adapt = connection.ops.adapt_datefield_value if key == 'day' else (lambda value: value)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {table} ({quote("form_id")}, {key_column}, {count}) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT ({quote("form_id")}, {key_column}) '
+                f'DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}',
+                [param for form_id, value, delta in batch for param in (form_id, adapt(value), delta)],
+            )
+
+
+def count_submissions(submissions, delta=1):
+    """
+    Adds ``delta`` (1 for new submissions, -1 for deleted ones) to the status
+    and day counters of each of ``submissions``. Two statements whatever the
+    number of submissions.
+    """
+    statuses, days = Counter(), Counter()
+    for submission in submissions:
+        statuses[submission.form_id, submission.status] += delta
+        days[submission.form_id, submission_day(submission.submitted_at)] += delta
+    _add(SubmissionCount, 'status', statuses)
+    _add(SubmissionDailyCount, 'day', days)
+
+
+def move_status(submission, old_status):
+    """Moves a submission from the ``old_status`` counter to its current one."""
+    if old_status == submission.status:
+        return
+    _add(SubmissionCount, 'status', {
+        (submission.form_id, old_status): -1,
+        (submission.form_id, submission.status): 1,
+    })
+
+
+def _chunks(queryset, chunk_size):
+    # primary key ranges of chunk_size rows, each aggregated by the database
+    last_pk = 0
+    while True:
+        upper = queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[chunk_size - 1:chunk_size]
+        upper = next(iter(upper), None)
+        if upper is None:
+            yield queryset.filter(pk__gt=last_pk)
+            return
+        yield queryset.filter(pk__gt=last_pk, pk__lte=upper)
+        last_pk = upper
+
+
+def recount(form_id=None, chunk_size=None):
+    """
+    Recomputes the counters of every form (or of ``form_id``) from the
+    submissions. They are aggregated ``chunk_size`` submissions at a time and
+    the totals replaced in one transaction at the end. Yields the number of
+    submissions counted so far after each chunk.
+
+    Status changes and deletes of already counted submissions made while it
+    runs are overwritten, so run it when intake is quiet.
+    """
+    chunk_size = chunk_size or DEFAULT_REPAIR_CHUNK_SIZE
+    queryset = Submission.objects.order_by()
+    if form_id is not None:
+        queryset = queryset.filter(form_id=form_id)
+
+    statuses, days = Counter(), Counter()
+    counted = 0
+    for chunk in _chunks(queryset, chunk_size):
+        for row in chunk.values('form_id', 'status').annotate(n=Count('id')):
+            statuses[row['form_id'], row['status']] += row['n']
+            counted += row['n']
+        for row in chunk.annotate(day=TruncDate('submitted_at')).values('form_id', 'day').annotate(n=Count('id')):
+            days[row['form_id'], row['day']] += row['n']
+        yield counted
+
+    with transaction.atomic():
+        for model in (SubmissionCount, SubmissionDailyCount):
+            stale = model.objects.all() if form_id is None else model.objects.filter(form_id=form_id)
+            stale.delete()
+        SubmissionCount.objects.bulk_create([
+            SubmissionCount(form_id=form, status=status, count=n) for (form, status), n in statuses.items()
+        ])
+        SubmissionDailyCount.objects.bulk_create([
+            SubmissionDailyCount(form_id=form, day=day, count=n) for (form, day), n in days.items()
+        ], batch_size=1000)
+
+
+def dashboard(days=DEFAULT_DASHBOARD_DAYS, form_id=None):
+    """
+    Submission totals per form and status, and intake per day over the last
+    ``days`` days (today included, zero-filled). Three queries, reading
+    counter rows only.
+    """
+    today = timezone.localdate()
+    forms = Form.objects.order_by('name')
+    counts = SubmissionCount.objects.all()
+    daily = SubmissionDailyCount.objects.filter(day__gt=today - datetime.timedelta(days=days))
+    if form_id is not None:
+        forms, counts, daily = forms.filter(pk=form_id), counts.filter(form_id=form_id), daily.filter(form_id=form_id)
+
+    by_form = {
+        pk: {'id': pk, 'name': name, 'total': 0, 'statuses': {status: 0 for status, _ in Submission.STATUS_CHOICES}}
+        for pk, name in forms.values_list('id', 'name')
+    }
+    for form, status, n in counts.values_list('form_id', 'status', 'count'):
+        if form in by_form:
+            by_form[form]['statuses'][status] = n
+            by_form[form]['total'] += n
+
+    intake = dict(daily.values_list('day').annotate(n=Sum('count')).order_by('day'))
+    return {
+        'forms': list(by_form.values()),
+        'daily': [
+            {'day': day, 'count': intake.get(day, 0)}
+            for day in (today - datetime.timedelta(days=offset) for offset in range(days - 1, -1, -1))
+        ],
+    }
@@ -0,0 +1,89 @@
+"""
+Conditional GET for form and field reads.
+
+Each endpoint gets its validators from one indexed query, without loading or
+serializing the form tree:
+
+* a form (and each of its fields): ``version``, ``fields_revision`` and
+  ``updated_at`` of the form row, looked up by primary key;
+* the form and field lists: ``Count(id)`` and ``Max(updated_at)`` over forms.
+
+Field changes bump their form's ``fields_revision`` and ``updated_at`` (see
+signals.py), so the form validators cover the fields too. ``If-None-Match`` or
+``If-Modified-Since`` then short-circuit to 304 before the view runs.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .models import Field, Form
+
+
+def form_list_validators():
+    row = Form.objects.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    return f"forms:{row['count']}:{row['last_modified']}", row['last_modified']
+
+
+def form_validators(pk):
+    row = Form.objects.filter(pk=pk).values_list('version', 'fields_revision', 'updated_at').first()
+    if row is None:
+        return None
+    version, fields_revision, updated_at = row
+    return f'form:{pk}:{version}:{fields_revision}:{updated_at}', updated_at
+
+
+def field_validators(pk):
+    row = Field.objects.filter(pk=pk).values_list(
+        'form_id', 'form__version', 'form__fields_revision', 'form__updated_at'
+    ).first()
+    if row is None:
+        return None
+    form_id, version, fields_revision, updated_at = row
+    return f'field:{pk}:{form_id}:{version}:{fields_revision}:{updated_at}', updated_at
+
+
+def _validators(request, validators, kwargs):
+    # condition() asks for the ETag and Last-Modified separately; query once
+    if not hasattr(request, '_conditional_validators'):
+        request._conditional_validators = validators(**kwargs)
+    return request._conditional_validators
+
+
+def _etag(request, validators, kwargs):
+    found = _validators(request, validators, kwargs)
+    if found is None:
+        return None
+    # ?view=, ?fields=, ?stream=... render different bodies, so they get different tags
+    query = '&'.join(sorted(f'{key}={value}' for key, values in request.GET.lists() for value in values if key != 'cursor'))
+    return hashlib.sha256(f'{found[0]}?{query}'.encode()).hexdigest()[:32]
+
+
+def conditional_get(validators):
+    """
+    Decorates an ``APIView`` ``get`` with ETag / Last-Modified handling.
+    ``validators(**url_kwargs)`` returns ``(token, last_modified)`` or None when
+    the object does not exist (the view then answers, usually with a 404).
+    Responses are marked ``no-cache`` so clients revalidate instead of guessing
+    a freshness lifetime from Last-Modified.
+    """
+    conditional = condition(
+        etag_func=lambda request, **kwargs: _etag(request, validators, kwargs),
+        last_modified_func=lambda request, **kwargs: (_validators(request, validators, kwargs) or (None, None))[1],
+    )
+
+    def decorator(view):
+        conditional_view = conditional(view)
+
+        @wraps(view)
+        def wrapped(request, **kwargs):
+            response = conditional_view(request, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+
+        return wrapped
+
+    return method_decorator(decorator)
@@ -0,0 +1,182 @@
+"""
+Full exports of a form's submissions, to CSV or Parquet.
+
+Exports run in the worker (``tasks.export_submissions``). Submissions are read
+in id order with ``iterator(chunk_size=EXPORT_CHUNK_SIZE)``, a server-side
+cursor on Postgres, so the worker holds one chunk of rows at a time. Each
+chunk is flattened into columns (``submission_id``, ``submitted_at``,
+``status``, ``user_email`` and one ``data.<field>`` column per field of the
+form, in form order) and appended to a temporary file: CSV rows, or one
+Parquet row group. The finished file is then copied to storage and the
+progress (``rows_written`` out of ``total_rows``) is saved after every chunk.
+
+CSV cells keep the answers as submitted; Parquet columns are typed from the
+field (numbers as doubles, dates, booleans, text) with null where an answer
+does not parse.
+"""
+import csv
+import io
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Submission, SubmissionCount, SubmissionExport
+from .schema import get_form_schema
+from .values import is_empty, parse_bool, parse_date, parse_number
+
+
+DEFAULT_CHUNK_SIZE = 5000
+BASE_COLUMNS = ('submission_id', 'submitted_at', 'status', 'user_email')
+
+
+def get_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def _text(value):
+    if is_empty(value):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _number(value):
+    number = parse_number(value)
+    return float(number) if number is not None else None
+
+
+PARQUET_CONVERTERS = {
+    'number': _number,
+    'date': parse_date,
+    'checkbox': parse_bool,
+}
+
+
+class CSVExportWriter:
+    extension = 'csv'
+
+    def __init__(self, file, fields):
+        self.fields = fields
+        self.text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+        self.writer = csv.writer(self.text)
+        self.writer.writerow([*BASE_COLUMNS, *(f'data.{field.name}' for field in fields)])
+
+    def write(self, rows):
+        self.writer.writerows(
+            [pk, submitted_at.isoformat(), status, email or '', *(_text(data.get(field.name)) or '' for field in self.fields)]
+            for pk, submitted_at, status, email, data in rows
+        )
+
+    def close(self):
+        self.text.flush()
+        # leave the underlying file open for the copy to storage
+        self.text.detach()
+
+
+class ParquetExportWriter:
+    extension = 'parquet'
+
+    def __init__(self, file, fields):
+        # pyarrow is only loaded by the workers that write Parquet
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.fields = fields
+        types = {'number': pa.float64(), 'date': pa.date32(), 'checkbox': pa.bool_()}
+        self.schema = pa.schema([
+            ('submission_id', pa.int64()),
+            ('submitted_at', pa.timestamp('us', tz='UTC')),
+            ('status', pa.string()),
+            ('user_email', pa.string()),
+            *((f'data.{field.name}', types.get(field.type, pa.string())) for field in fields),
+        ])
+        self.writer = pq.ParquetWriter(file, self.schema, compression='snappy')
+
+    def write(self, rows):
+        columns = {
+            'submission_id': [row[0] for row in rows],
+            'submitted_at': [row[1] for row in rows],
+            'status': [row[2] for row in rows],
+            'user_email': [row[3] for row in rows],
+        }
+        for field in self.fields:
+            convert = PARQUET_CONVERTERS.get(field.type, _text)
+            columns[f'data.{field.name}'] = [convert(row[4].get(field.name)) for row in rows]
+        # one row group per chunk
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {
+    'csv': CSVExportWriter,
+    'parquet': ParquetExportWriter,
+}
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for pk, submitted_at, status, email, data in rows:
+        chunk.append((pk, submitted_at, status, email, data if isinstance(data, dict) else {}))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def expected_rows(form_id, status=''):
+    """Rows an export will write, read from the submission counters."""
+    counts = SubmissionCount.objects.filter(form_id=form_id)
+    if status:
+        counts = counts.filter(status=status)
+    return counts.aggregate(total=Sum('count'))['total'] or 0
+
+
+def run_export(export_id, chunk_size=None):
+    """
+    Writes the file of a pending ``SubmissionExport`` and returns it. When
+    writing fails the export is marked failed and the error re-raised.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    export = SubmissionExport.objects.select_related('form').get(pk=export_id)
+    export.state, export.started_at, export.rows_written = 'running', timezone.now(), 0
+    export.total_rows = expected_rows(export.form_id, export.status)
+    export.save(update_fields=['state', 'started_at', 'rows_written', 'total_rows'])
+
+    try:
+        fields = get_form_schema(export.form_id).fields
+        submissions = Submission.objects.filter(form_id=export.form_id).order_by('pk')
+        if export.status:
+            submissions = submissions.filter(status=export.status)
+        rows = submissions.values_list('pk', 'submitted_at', 'status', 'user__email', 'data').iterator(chunk_size=chunk_size)
+
+        with tempfile.TemporaryFile() as file:
+            writer = WRITERS[export.format](file, fields)
+            for chunk in _chunks(rows, chunk_size):
+                writer.write(chunk)
+                export.rows_written += len(chunk)
+                SubmissionExport.objects.filter(pk=export.pk).update(rows_written=export.rows_written)
+            writer.close()
+
+            file.seek(0)
+            name = f'{slugify(export.form.name) or "form"}-{export.pk}.{writer.extension}'
+            export.file.save(name, File(file), save=False)
+    except Exception as exc:
+        export.state, export.error, export.finished_at = 'failed', str(exc), timezone.now()
+        export.save(update_fields=['state', 'error', 'finished_at'])
+        raise
+
+    export.state, export.finished_at = 'done', timezone.now()
+    export.save(update_fields=['state', 'file', 'rows_written', 'finished_at'])
+    return export
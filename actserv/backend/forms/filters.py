@@ -0,0 +1,217 @@
+"""
+Query filters for the submission listings.
+
+    ?form=3&status=pending&data.city=Nairobi&data.income__gte=50000&data.plan__in=gold,silver
+
+``form`` and ``status`` filter the columns. ``data.<field>[__<op>]`` filters
+the answers of one field of the form given by ``form`` (required with any
+``data.`` filter, since field names are only unique within a form). Operators
+are ``eq`` (the default), ``ne``, ``in`` (comma separated) and, for number and
+date fields, ``gt``, ``gte``, ``lt`` and ``lte``. Values are parsed with the
+field's type, so ``data.income=50000`` matches an answer stored as ``50000``
+or ``"50000"``. ``order_by=data.<field>`` (``-data.<field>`` descending) sorts
+on an answer; it lists the submissions that answered the field and needs the
+typed projection (projection.py).
+
+On Postgres equality compiles to JSONB containment (``data @> '{"city":
+"Nairobi"}'``, served by the GIN index) and ranges to a ``->>`` cast (served by
+the field's expression index when it is searchable), see search.py. With
+``SUBMISSION_PROJECTION_ENABLED`` ranges and sorting read the typed
+``SubmissionValue`` rows instead.
+"""
+from django.db import connections
+from django.db.models import F, FilteredRelation, Q
+from django.db.models.fields.json import KeyTransform
+from rest_framework.exceptions import ValidationError
+
+from .models import Form, Submission, SubmissionValue
+from .pagination import DEFAULT_ORDERING
+from .projection import VALUE_COLUMNS, is_enabled as projection_enabled
+from .schema import get_form_schema
+from .search import answer_expression
+from .values import parse_bool, parse_date, parse_number
+
+
+DATA_PREFIX = 'data.'
+OPERATORS = ('eq', 'ne', 'in', 'gt', 'gte', 'lt', 'lte')
+RANGE_OPERATORS = ('gt', 'gte', 'lt', 'lte')
+RANGE_TYPES = ('number', 'date')
+STATUSES = [value for value, _ in Submission.STATUS_CHOICES]
+
+
+def _json_number(number):
+    # JSON has no Decimal; 50000 and 50000.0 are the same JSONB number anyway
+    return int(number) if number == number.to_integral_value() else float(number)
+
+
+def _candidates(field, raw):
+    """
+    The stored answers ``raw`` stands for, in the field's type, or None when it
+    is not a valid value for the field.
+    """
+    raw = raw.strip()
+    if field.type == 'number':
+        number = parse_number(raw)
+        return None if number is None else [_json_number(number), raw]
+    if field.type == 'date':
+        date = parse_date(raw)
+        return None if date is None else [date.isoformat()]
+    if field.type == 'checkbox':
+        checked = parse_bool(raw)
+        return None if checked is None else [checked, 'true' if checked else 'false']
+    return [raw]
+
+
+def _range_value(field, raw):
+    if field.type == 'number':
+        return parse_number(raw)
+    date = parse_date(raw)
+    return None if date is None else date.isoformat()
+
+
+class SubmissionFilter:
+
+    def __init__(self, form_id=None, status=None, conditions=(), order=None):
+        self.form_id = form_id
+        self.status = status
+        # (param, field name, operator, raw value)
+        self.conditions = list(conditions)
+        # (field name, descending) or None for the default order
+        self.order = order
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        errors = {}
+
+        form_id = params.get('form') or None
+        if form_id is not None and not form_id.isdigit():
+            errors['form'] = 'Must be a form id.'
+        status = params.get('status') or None
+        if status is not None and status not in STATUSES:
+            errors['status'] = f'Must be one of: {", ".join(STATUSES)}.'
+
+        conditions = []
+        for param, values in params.lists():
+            if not param.startswith(DATA_PREFIX):
+                continue
+            name, operator = param[len(DATA_PREFIX):], 'eq'
+            head, separator, tail = name.rpartition('__')
+            if separator and tail in OPERATORS:
+                name, operator = head, tail
+            if not name:
+                errors[param] = 'Name a field, e.g. data.income__gte=50000.'
+                continue
+            conditions.extend((param, name, operator, value) for value in values)
+        order = None
+        order_by = params.get('order_by') or None
+        if order_by is not None:
+            name = order_by.lstrip('-')
+            if not name.startswith(DATA_PREFIX) or name == DATA_PREFIX:
+                errors['order_by'] = 'Must be data.<field> or -data.<field>.'
+            else:
+                order = (name[len(DATA_PREFIX):], order_by.startswith('-'))
+        if (conditions or order) and form_id is None and 'form' not in errors:
+            errors['form'] = 'Required when filtering or sorting on data.'
+
+        if errors:
+            raise ValidationError(errors)
+        return cls(int(form_id) if form_id else None, status, conditions, order)
+
+    @property
+    def is_empty(self):
+        return self.form_id is None and self.status is None and not self.conditions and self.order is None
+
+    @property
+    def ordering(self):
+        """The unique ordering the listing is paginated on."""
+        if self.order is None:
+            return DEFAULT_ORDERING
+        return ('-answer', '-id') if self.order[1] else ('answer', 'id')
+
+    def apply(self, queryset):
+        if self.is_empty:
+            return queryset
+        if self.form_id is not None:
+            queryset = queryset.filter(form_id=self.form_id)
+        if self.status is not None:
+            queryset = queryset.filter(status=self.status)
+        if not self.conditions and self.order is None:
+            return queryset
+
+        try:
+            schema = get_form_schema(self.form_id)
+        except Form.DoesNotExist:
+            raise ValidationError({'form': 'Form not found.'})
+        containment = connections[queryset.db].vendor == 'postgresql'
+
+        errors = {}
+        for index, (param, name, operator, raw) in enumerate(self.conditions):
+            field = schema.field(name)
+            if field is None:
+                errors[param] = f"Form has no field '{name}'."
+                continue
+            if field.type == 'file':
+                errors[param] = 'File fields cannot be filtered.'
+                continue
+
+            alias = f'_filter_{index}'
+            if operator in RANGE_OPERATORS:
+                if field.type not in RANGE_TYPES:
+                    errors[param] = f"'{operator}' only applies to number and date fields."
+                    continue
+                value = _range_value(field, raw)
+                if value is None:
+                    errors[param] = f'Not a valid {field.type}.'
+                    continue
+                if projection_enabled():
+                    column = VALUE_COLUMNS[field.type]
+                    matching = SubmissionValue.objects.filter(field_id=field.id, **{f'{column}__{operator}': value})
+                    queryset = queryset.filter(pk__in=matching.values('submission_id'))
+                else:
+                    queryset = queryset.alias(**{alias: answer_expression(field.type, name)})
+                    queryset = queryset.filter(**{f'{alias}__{operator}': value})
+                continue
+
+            raws = raw.split(',') if operator == 'in' else [raw]
+            candidates = []
+            for item in raws:
+                found = _candidates(field, item)
+                if found is None:
+                    errors[param] = f'Not a valid {field.type}: {item.strip()!r}.'
+                    break
+                candidates.extend(found)
+            if param in errors:
+                continue
+
+            if not containment:
+                queryset = queryset.alias(**{alias: KeyTransform(name, 'data')})
+            condition = Q()
+            for candidate in candidates:
+                condition |= Q(data__contains={name: candidate}) if containment else Q(**{alias: candidate})
+            queryset = queryset.filter(~condition if operator == 'ne' else condition)
+
+        if self.order is not None:
+            queryset = self._order(queryset, schema, errors)
+        if errors:
+            raise ValidationError(errors)
+        return queryset
+
+    def _order(self, queryset, schema, errors):
+        name, _ = self.order
+        field = schema.field(name)
+        if field is None:
+            errors['order_by'] = f"Form has no field '{name}'."
+        elif field.type not in VALUE_COLUMNS:
+            errors['order_by'] = f'{field.type.capitalize()} fields cannot be sorted on.'
+        elif not projection_enabled():
+            errors['order_by'] = 'Sorting on answers needs SUBMISSION_PROJECTION_ENABLED.'
+        if 'order_by' in errors:
+            return queryset
+
+        # one join on the field's projected row; (field, value, submission) is walked in order
+        column = VALUE_COLUMNS[field.type]
+        queryset = queryset.alias(
+            answer_row=FilteredRelation('values', condition=Q(values__field_id=field.id))
+        ).annotate(answer=F(f'answer_row__{column}')).filter(answer__isnull=False)
+        return queryset.order_by(*self.ordering)
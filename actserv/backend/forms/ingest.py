@@ -0,0 +1,124 @@
+"""
+Bulk submission ingest.
+
+Every record is validated against its form's cached schema first; the valid
+ones are then written with ``bulk_create`` in batches of
+``BULK_INGEST_BATCH_SIZE``, each batch in its own transaction. One result is
+returned per record, in input order, so callers can retry only what failed.
+
+Bulk inserts bypass ``save()`` and model signals, so nothing hooked on
+``Submission`` saves runs for ingested rows; the typed answer projection and
+the submission counters are written here, in the batch's transaction.
+"""
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from .counters import count_submissions
+from .models import Form, Submission
+from .parsers import InvalidRecord
+from .projection import is_enabled as projection_enabled, project_submissions
+from .schema import get_form_schema
+from .snapshots import current_snapshot_id
+
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_RECORDS = 10000
+
+
+def get_batch_size():
+    return getattr(settings, 'BULK_INGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def get_max_records():
+    return getattr(settings, 'BULK_INGEST_MAX_RECORDS', DEFAULT_MAX_RECORDS)
+
+
+def _result(index, record, status, **extra):
+    result = {'index': index, 'status': status}
+    if isinstance(record, dict) and 'reference' in record:
+        # opaque partner id, echoed back so results can be matched to the source rows
+        result['reference'] = record['reference']
+    result.update(extra)
+    return result
+
+
+class SubmissionIngest:
+    """
+    Validates and stores a list of ``{"form_id": ..., "data": {...}}`` records
+    for ``user``. Records may carry a ``reference`` that is echoed back.
+    """
+
+    def __init__(self, user, batch_size=None):
+        self.user = user
+        self.batch_size = batch_size or get_batch_size()
+        self._schemas = {}
+        self._snapshots = {}
+
+    def schema(self, form_id):
+        if form_id not in self._schemas:
+            try:
+                self._schemas[form_id] = get_form_schema(form_id)
+            except Form.DoesNotExist:
+                self._schemas[form_id] = None
+        return self._schemas[form_id]
+
+    def snapshot_id(self, form_id):
+        if form_id not in self._snapshots:
+            self._snapshots[form_id] = current_snapshot_id(self._schemas[form_id])
+        return self._snapshots[form_id]
+
+    def check(self, record):
+        """Returns the error dict of a record, empty when it can be stored."""
+        if isinstance(record, InvalidRecord):
+            return {'non_field_errors': [record.message]}
+        if not isinstance(record, dict):
+            return {'non_field_errors': ['Each record must be a JSON object.']}
+
+        form_id = record.get('form_id')
+        if isinstance(form_id, bool) or not isinstance(form_id, int):
+            return {'form_id': ['A valid integer is required.']}
+        schema = self.schema(form_id)
+        if schema is None:
+            return {'form_id': ['Form does not exist.']}
+
+        errors = schema.validator.validate(record.get('data', {}))
+        return {'data': errors} if errors else {}
+
+    def run(self, records):
+        results = [None] * len(records)
+        pending = []
+        for index, record in enumerate(records):
+            errors = self.check(record)
+            if errors:
+                results[index] = _result(index, record, 'invalid', errors=errors)
+            else:
+                pending.append((index, record))
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            rows = [
+                Submission(
+                    form_id=record['form_id'],
+                    snapshot_id=self.snapshot_id(record['form_id']),
+                    user=self.user,
+                    data=record.get('data', {}),
+                )
+                for _, record in batch
+            ]
+            try:
+                with transaction.atomic():
+                    created = Submission.objects.bulk_create(rows)
+                    count_submissions(created)
+                    if projection_enabled():
+                        project_submissions(created)
+            except DatabaseError as exc:
+                for index, record in batch:
+                    results[index] = _result(index, record, 'failed', errors={'non_field_errors': [str(exc)]})
+                continue
+            for (index, record), submission in zip(batch, created):
+                results[index] = _result(index, record, 'created', id=submission.pk)
+        return results
+
+
+def ingest_submissions(records, user, batch_size=None):
+    return SubmissionIngest(user, batch_size=batch_size).run(records)
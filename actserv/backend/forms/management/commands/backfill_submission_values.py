@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from forms.projection import DEFAULT_BACKFILL_CHUNK_SIZE, backfill, is_enabled
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the typed answer projection (SubmissionValue) in chunks, one transaction per chunk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, dest='form_id', help='Only rebuild submissions of this form.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_BACKFILL_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if not is_enabled():
+            self.stdout.write(self.style.WARNING(
+                'SUBMISSION_PROJECTION_ENABLED is off: the values are written but not kept up to date.'
+            ))
+
+        submissions = values = 0
+        for chunk_submissions, chunk_values in backfill(options['form_id'], options['chunk_size']):
+            submissions += chunk_submissions
+            values += chunk_values
+            self.stdout.write(f'{submissions} submissions projected ({values} values)')
+        self.stdout.write(self.style.SUCCESS(f'Done: {submissions} submissions, {values} values'))
@@ -0,0 +1,87 @@
+import random
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.models import Form
+from forms.schema import FieldSchema, FormSchema, get_form_schema
+from forms.validation import compile_validator
+
+
+FIELD_TYPES = ['text', 'number', 'date', 'dropdown', 'checkbox']
+
+
+def synthetic_schema(field_count):
+    """Builds an in-memory schema with a mix of field types (no database needed)."""
+    fields = []
+    for index in range(field_count):
+        field_type = FIELD_TYPES[index % len(FIELD_TYPES)]
+        options = {}
+        if field_type == 'number':
+            options = {'min': 0, 'max': 1000000}
+        elif field_type == 'dropdown':
+            options = ['low', 'medium', 'high']
+        elif field_type == 'text':
+            options = {'max_length': 100}
+        field = SimpleNamespace(
+            id=index + 1, name=f'field_{index}', type=field_type, options=options,
+            is_required=index % 3 == 0, order=index, is_conditional=False,
+            conditional_operator=None, conditional_value=None,
+        )
+        fields.append(FieldSchema.from_field(field))
+    return FormSchema(id=0, version=1, name='benchmark', is_active=True, revision='', fields=tuple(fields))
+
+
+def sample_value(field, valid):
+    if field.type == 'number':
+        return random.randint(0, 1000000) if valid else 'not-a-number'
+    if field.type == 'date':
+        return '2025-01-31' if valid else '31/01/2025'
+    if field.type == 'dropdown':
+        return random.choice(field.choices or ['x']) if valid else 'unknown'
+    if field.type == 'checkbox':
+        return True
+    return 'some text answer'
+
+
+class Command(BaseCommand):
+    help = 'Measures submission validation throughput (validations per second).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form-id', type=int, help='Benchmark against an existing form instead of a synthetic one.')
+        parser.add_argument('--fields', type=int, default=40, help='Number of fields in the synthetic form.')
+        parser.add_argument('--payloads', type=int, default=10000, help='Number of payloads to validate.')
+        parser.add_argument('--invalid-ratio', type=float, default=0.1, help='Share of payloads containing errors.')
+
+    def handle(self, *args, **options):
+        if options['form_id']:
+            try:
+                schema = get_form_schema(options['form_id'])
+            except Form.DoesNotExist:
+                raise CommandError(f"Form {options['form_id']} does not exist.")
+        else:
+            schema = synthetic_schema(options['fields'])
+
+        corruptible = [field for field in schema.fields if field.type in ('number', 'date', 'dropdown')]
+        payloads = []
+        for _ in range(options['payloads']):
+            payload = {field.name: sample_value(field, True) for field in schema.fields}
+            if corruptible and random.random() < options['invalid_ratio']:
+                field = random.choice(corruptible)
+                payload[field.name] = sample_value(field, False)
+            payloads.append(payload)
+
+        started = time.perf_counter()
+        validator = compile_validator(schema)
+        compiled = time.perf_counter()
+        results = validator.validate_many(payloads)
+        finished = time.perf_counter()
+
+        elapsed = finished - compiled
+        invalid = sum(1 for errors in results if errors)
+        self.stdout.write(
+            f'Compiled {len(validator.checks)} checks in {(compiled - started) * 1000:.2f} ms\n'
+            f'Validated {len(payloads)} payloads ({invalid} invalid) in {elapsed:.3f} s '
+            f'= {len(payloads) / elapsed:,.0f} validations/sec'
+        )
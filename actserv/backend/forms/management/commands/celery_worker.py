@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.celery import app, worker_argv
+
+
+class Command(BaseCommand):
+    help = 'Starts a Celery worker for one queue, with the concurrency and prefetch of QUEUE_WORKER_PROFILES.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queue', choices=sorted(settings.QUEUE_WORKER_PROFILES))
+        parser.add_argument('--loglevel', default='INFO')
+
+    def handle(self, *args, **options):
+        app.worker_main(worker_argv(options['queue'], options['loglevel']))
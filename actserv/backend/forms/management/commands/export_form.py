@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.models import Form
+from forms.transfer import export_form
+
+
+class Command(BaseCommand):
+    help = 'Writes a form and all of its fields as one JSON definition document.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('form_id', type=int)
+        parser.add_argument('--output', '-o', help='File to write to (default: stdout).')
+
+    def handle(self, *args, **options):
+        try:
+            definition = export_form(options['form_id'])
+        except Form.DoesNotExist:
+            raise CommandError(f"Form {options['form_id']} does not exist.")
+
+        document = json.dumps(definition, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(document + '\n')
+            self.stdout.write(f"Exported form {options['form_id']} to {options['output']}")
+        else:
+            self.stdout.write(document)
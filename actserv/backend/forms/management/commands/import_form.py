@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import CustomUser
+from forms.serializers import FormDefinitionSerializer
+
+
+class Command(BaseCommand):
+    help = 'Creates a form and all of its fields from a JSON definition document, in one transaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Definition file, as written by export_form.')
+        parser.add_argument('--created-by', help='Email of the user recorded as the creator.')
+        parser.add_argument('--name', help='Import under another name (form names are unique).')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path']) as source:
+                document = json.load(source)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read {options['path']}: {exc}")
+        if options['name']:
+            document['name'] = options['name']
+
+        created_by = None
+        if options['created_by']:
+            try:
+                created_by = CustomUser.objects.get(email=options['created_by'])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"No user with email {options['created_by']}.")
+
+        serializer = FormDefinitionSerializer(data=document)
+        if not serializer.is_valid():
+            raise CommandError(f'Invalid form definition: {json.dumps(serializer.errors)}')
+        form = serializer.save(created_by=created_by)
+        self.stdout.write(f'Imported form {form.id} ({form.name}) with {len(document.get("form_fields", []))} fields')
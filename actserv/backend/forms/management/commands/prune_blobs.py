@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from forms.blobs import prune_blobs
+
+
+class Command(BaseCommand):
+    help = 'Deletes stored document blobs that no document or upload references any more.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, help='Seconds a blob must have been unreferenced (default BLOB_PRUNE_GRACE).')
+
+    def handle(self, *args, **options):
+        pruned = prune_blobs(options['grace'])
+        self.stdout.write(self.style.SUCCESS(f'Done: {pruned} blobs pruned'))
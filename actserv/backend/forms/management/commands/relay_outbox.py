@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forms.outbox import DEFAULT_BATCH_SIZE, drain, purge
+
+
+class Command(BaseCommand):
+    help = 'Hands outbox messages to their Celery tasks, once or (with --interval) continuously.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, help='Keep relaying, sleeping this many seconds between passes.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent = drain(options['batch_size'])
+            purged = purge()
+            self.stdout.write(f'{sent} messages relayed, {purged} purged')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from forms.counters import DEFAULT_REPAIR_CHUNK_SIZE, recount
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the submission counters (SubmissionCount, SubmissionDailyCount) from the submissions, in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, dest='form_id', help='Only recount submissions of this form.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_REPAIR_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        counted = 0
+        for counted in recount(options['form_id'], options['chunk_size']):
+            self.stdout.write(f'{counted} submissions counted')
+        self.stdout.write(self.style.SUCCESS(f'Done: {counted} submissions'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from forms.search import sync_search_indexes
+
+
+class Command(BaseCommand):
+    help = 'Creates the expression indexes of searchable fields and drops stale ones (Postgres only).'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write('Search indexes are only used on Postgres; nothing to do.')
+            return
+
+        created, dropped = sync_search_indexes()
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        for name in dropped:
+            self.stdout.write(f'Dropped {name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} created, {len(dropped)} dropped'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.blobs import verify_blob
+from forms.models import Blob
+
+
+class Command(BaseCommand):
+    help = 'Re-hashes stored document blobs and reports any whose file is missing or no longer matches its digest.'
+
+    def handle(self, *args, **options):
+        checked, damaged = 0, []
+        for blob in Blob.objects.order_by('pk').iterator(chunk_size=500):
+            checked += 1
+            if not verify_blob(blob):
+                damaged.append(blob)
+                self.stderr.write(f'{blob.digest}: {blob.file.name} is missing or does not match')
+        if damaged:
+            raise CommandError(f'{len(damaged)} of {checked} blobs are damaged')
+        self.stdout.write(self.style.SUCCESS(f'Done: {checked} blobs verified'))
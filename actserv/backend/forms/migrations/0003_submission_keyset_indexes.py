@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0002_field_conditional_field_field_conditional_operator_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='submission',
+            options={'ordering': ['-submitted_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['-submitted_at', '-id'], name='submission_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user', '-submitted_at', '-id'], name='submission_user_recent_idx'),
+        ),
+    ]
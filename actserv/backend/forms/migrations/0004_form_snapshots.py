@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0003_submission_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.IntegerField()),
+                ('digest', models.CharField(help_text='sha256 of the definition, so an unchanged form is not published twice.', max_length=64)),
+                ('schema', models.JSONField(help_text='The form as FormSerializer rendered it when it was published.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='forms.form')),
+                ('published_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='published_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['form', '-version'],
+            },
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='snapshot',
+            field=models.ForeignKey(blank=True, help_text='The published definition the answers were validated against (empty for older submissions).', null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='submissions', to='forms.formsnapshot'),
+        ),
+        migrations.AddConstraint(
+            model_name='formsnapshot',
+            constraint=models.UniqueConstraint(fields=('form', 'version'), name='snapshot_form_version_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='formsnapshot',
+            constraint=models.UniqueConstraint(fields=('form', 'digest'), name='snapshot_form_digest_unique'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0004_form_snapshots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='form',
+            name='fields_revision',
+            field=models.PositiveIntegerField(default=0, help_text="Bumped whenever one of the form's fields changes."),
+        ),
+        migrations.AddIndex(
+            model_name='form',
+            index=models.Index(fields=['updated_at'], name='form_updated_idx'),
+        ),
+    ]
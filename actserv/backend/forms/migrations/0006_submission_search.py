@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+GIN_INDEX_NAME = 'submission_data_gin'
+
+
+def create_data_index(apps, schema_editor):
+    # containment (@>) filters on Submission.data; jsonb_path_ops is smaller and faster for @> only
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {GIN_INDEX_NAME} ON forms_submission USING gin (data jsonb_path_ops)'
+    )
+
+
+def drop_data_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {GIN_INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('forms', '0005_form_fields_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='field',
+            name='is_searchable',
+            field=models.BooleanField(default=False, help_text="Index this field's answers so submission filters on it stay fast."),
+        ),
+        migrations.RunPython(create_data_index, drop_data_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-16 21:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0006_submission_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_value', models.DecimalField(blank=True, decimal_places=6, max_digits=24, null=True)),
+                ('date_value', models.DateField(blank=True, null=True)),
+                ('text_value', models.CharField(blank=True, max_length=255, null=True)),
+                ('bool_value', models.BooleanField(blank=True, null=True)),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='forms.field')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='forms.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['field', 'num_value', 'submission'], name='submission_value_num_idx'), models.Index(fields=['field', 'date_value', 'submission'], name='submission_value_date_idx'), models.Index(fields=['field', 'text_value', 'submission'], name='submission_value_text_idx'), models.Index(fields=['field', 'bool_value', 'submission'], name='submission_value_bool_idx')],
+                'constraints': [models.UniqueConstraint(fields=('submission', 'field'), name='submission_value_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def count_existing(apps, schema_editor):
+    Submission = apps.get_model('forms', 'Submission')
+    SubmissionCount = apps.get_model('forms', 'SubmissionCount')
+    SubmissionDailyCount = apps.get_model('forms', 'SubmissionDailyCount')
+    submissions = Submission.objects.order_by()
+    SubmissionCount.objects.bulk_create([
+        SubmissionCount(form_id=row['form_id'], status=row['status'], count=row['n'])
+        for row in submissions.values('form_id', 'status').annotate(n=Count('id'))
+    ])
+    SubmissionDailyCount.objects.bulk_create([
+        SubmissionDailyCount(form_id=row['form_id'], day=row['day'], count=row['n'])
+        for row in submissions.annotate(day=TruncDate('submitted_at')).values('form_id', 'day').annotate(n=Count('id'))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0007_submission_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_counts', to='forms.form')),
+            ],
+            options={
+                'ordering': ['form', 'status'],
+                'constraints': [models.UniqueConstraint(fields=('form', 'status'), name='submission_count_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SubmissionDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Day the submissions were made on, in TIME_ZONE.')),
+                ('count', models.IntegerField(default=0)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_daily_counts', to='forms.form')),
+            ],
+            options={
+                'ordering': ['form', 'day'],
+                'indexes': [models.Index(fields=['day', 'form'], name='submission_daily_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('form', 'day'), name='submission_daily_count_unique')],
+            },
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0010_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(help_text='sha256 of the content, hex encoded.', max_length=64, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('file', models.FileField(max_length=255, upload_to='')),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Documents and unattached uploads using this content.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='blob_unreferenced_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='blob',
+            field=models.ForeignKey(blank=True, help_text='The stored content; ``file`` names the same file (empty for older documents).', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='forms.blob'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='filename',
+            field=models.CharField(blank=True, help_text='Name of the file as uploaded; blobs are stored under their digest.', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='uploads', to='forms.blob'),
+        ),
+    ]
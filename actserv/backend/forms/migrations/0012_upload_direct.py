@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0011_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='object_key',
+            field=models.CharField(blank=True, help_text='Key the client PUTs a direct upload to; empty for chunked uploads.', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='sha256',
+            field=models.CharField(blank=True, help_text='Digest the client declared for a direct upload, checked by the object store.', max_length=64),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0012_upload_direct'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dispatched_at', models.DateTimeField(blank=True, help_text='When the relay handed the message to the broker.', null=True)),
+                ('processed_at', models.DateTimeField(blank=True, help_text='When a worker claimed it; a redelivered message is skipped.', null=True)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Failed hand-overs to the broker.')),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['id'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
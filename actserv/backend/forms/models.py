@@ -1,5 +1,68 @@
+import uuid
+
 from django.db import models
 from authentication.models import *
+from .conditions import validate_conditional_link
+from .representation import FULL
+
+class FormQuerySet(models.QuerySet):
+    def for_serialization(self, representation=FULL):
+        """
+        Loads everything FormSerializer touches: creator, fields and their controllers.
+        A sparse or summary ``representation`` loads only the columns and
+        relations it renders.
+        """
+        queryset = self
+        if representation.expands('created_by'):
+            queryset = queryset.select_related('created_by')
+        if representation.expands('form_fields'):
+            queryset = queryset.prefetch_related(
+                models.Prefetch('fields', queryset=Field.objects.select_related('conditional_field'))
+            )
+        if not representation.is_default:
+            columns = ['name', 'description', 'created_by', 'version', 'is_active', 'created_at', 'updated_at']
+            queryset = queryset.only('id', *[column for column in columns if representation.wants(column)])
+        return queryset
+
+
+class FieldQuerySet(models.QuerySet):
+    def for_serialization(self):
+        return self.select_related('form', 'conditional_field')
+
+
+class SubmissionQuerySet(models.QuerySet):
+    def for_serialization(self, representation=FULL):
+        """
+        Loads everything SubmissionSerializer touches in a constant number of queries.
+        A sparse or summary ``representation`` loads only the columns and
+        relations it renders.
+        """
+        queryset = self
+        # keyset pagination orders on (submitted_at, id), so both are always loaded
+        columns = ['id', 'submitted_at']
+        if representation.expands('form'):
+            queryset = queryset.select_related('form__created_by').prefetch_related(
+                models.Prefetch('form__fields', queryset=Field.objects.select_related('conditional_field'))
+            )
+            columns.append('form')
+        elif representation.wants('form'):
+            queryset = queryset.select_related('form')
+            columns += ['form__id', 'form__name', 'form__version']
+        if representation.expands('user'):
+            queryset = queryset.select_related('user')
+        if representation.wants('user'):
+            columns.append('user')
+        if representation.wants('snapshot') or representation.wants('form'):
+            columns.append('snapshot')
+        if representation.expands('documents'):
+            queryset = queryset.prefetch_related(
+                models.Prefetch('documents', queryset=Document.objects.select_related('blob'))
+            )
+        if not representation.is_default:
+            columns += [column for column in ('data', 'status', 'updated_at') if representation.wants(column)]
+            queryset = queryset.only(*columns)
+        return queryset
+
 
 class Form(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -9,9 +72,16 @@ class Form(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    fields_revision = models.PositiveIntegerField(default=0, help_text="Bumped whenever one of the form's fields changes.")
+
+    objects = FormQuerySet.as_manager()
     
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Max(updated_at) validates the cached form list
+            models.Index(fields=['updated_at'], name='form_updated_idx'),
+        ]
         
     def __str__ (self):
         return self.name
@@ -42,6 +112,7 @@ class Field(models.Model):
         help_text="Stores validation rules or dropdown options e.g {'min': 1000, 'max': 100000} or ['Option1', 'Option2']"
     )
     is_required = models.BooleanField(default=False)
+    is_searchable = models.BooleanField(default=False, help_text="Index this field's answers so submission filters on it stay fast.")
     order = models.IntegerField(default=0)  
     created_at = models.DateTimeField(auto_now_add=True)
     is_conditional = models.BooleanField(default=False, help_text="Set to True if this field's visibility depends on another field.")
@@ -65,6 +136,8 @@ class Field(models.Model):
         null=True,
         help_text="The threshold value (e.g., '50000' or 'true')."
     )
+
+    objects = FieldQuerySet.as_manager()
    
     class Meta:
         unique_together = ("form","name")
@@ -72,9 +145,40 @@ class Field(models.Model):
         
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so unmarking a searchable field still drops its index
+        instance._was_searchable = instance.__dict__.get('is_searchable', False)
+        return instance
+
+    def clean(self):
+        super().clean()
+        validate_conditional_link(self)
     
     
     
+# frozen copy of a published form definition, never edited once written
+class FormSnapshot(models.Model):
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='snapshots')
+    version = models.IntegerField()
+    digest = models.CharField(max_length=64, help_text="sha256 of the definition, so an unchanged form is not published twice.")
+    schema = models.JSONField(help_text="The form as FormSerializer rendered it when it was published.")
+    published_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='published_snapshots')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['form', '-version']
+        constraints = [
+            models.UniqueConstraint(fields=['form', 'version'], name='snapshot_form_version_unique'),
+            models.UniqueConstraint(fields=['form', 'digest'], name='snapshot_form_digest_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.form_id} v{self.version}'
+
+
 #holds/stores client data/submitted forms
 class Submission(models.Model):
     STATUS_CHOICES = (
@@ -84,6 +188,14 @@ class Submission(models.Model):
     )
 
     form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='submissions')
+    snapshot = models.ForeignKey(
+        FormSnapshot,
+        on_delete=models.RESTRICT,
+        null=True,
+        blank=True,
+        related_name='submissions',
+        help_text="The published definition the answers were validated against (empty for older submissions)."
+    )
     user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='submissions')
     data = models.JSONField(
         default=dict,
@@ -93,21 +205,225 @@ class Submission(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SubmissionQuerySet.as_manager()
+
     class Meta:
-        ordering = ['-submitted_at']
+        ordering = ['-submitted_at', '-id']
+        indexes = [
+            # keyset pagination: (submitted_at, id) for all submissions and per user
+            models.Index(fields=['-submitted_at', '-id'], name='submission_recent_idx'),
+            models.Index(fields=['user', '-submitted_at', '-id'], name='submission_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Submission for {self.form.name} by {self.user or 'Anonymous'}"
 
-# Docs uploads 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so a status change moves the submission between counters
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+# running totals kept by counters.py, so the dashboard never counts submissions
+class SubmissionCount(models.Model):
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='submission_counts')
+    status = models.CharField(max_length=20, choices=Submission.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['form', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['form', 'status'], name='submission_count_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.form_id} {self.status}: {self.count}'
+
+
+class SubmissionDailyCount(models.Model):
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='submission_daily_counts')
+    day = models.DateField(help_text="Day the submissions were made on, in TIME_ZONE.")
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['form', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['form', 'day'], name='submission_daily_count_unique'),
+        ]
+        indexes = [
+            # intake over a date range across all forms
+            models.Index(fields=['day', 'form'], name='submission_daily_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.form_id} {self.day}: {self.count}'
+
+# typed copy of each answer (see projection.py), so answers can be range-filtered and sorted on B-tree indexes
+class SubmissionValue(models.Model):
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='values')
+    field = models.ForeignKey(Field, on_delete=models.CASCADE, related_name='values')
+    num_value = models.DecimalField(max_digits=24, decimal_places=6, null=True, blank=True)
+    date_value = models.DateField(null=True, blank=True)
+    text_value = models.CharField(max_length=255, null=True, blank=True)
+    bool_value = models.BooleanField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['submission', 'field'], name='submission_value_unique'),
+        ]
+        indexes = [
+            # (field, value, submission): range scans and ordered scans per field
+            models.Index(fields=['field', 'num_value', 'submission'], name='submission_value_num_idx'),
+            models.Index(fields=['field', 'date_value', 'submission'], name='submission_value_date_idx'),
+            models.Index(fields=['field', 'text_value', 'submission'], name='submission_value_text_idx'),
+            models.Index(fields=['field', 'bool_value', 'submission'], name='submission_value_bool_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.field_id} of submission {self.submission_id}'
+
+# full export of a form's submissions, written by the export_submissions task (see exports.py)
+class SubmissionExport(models.Model):
+    FORMATS = (
+        ('csv', 'CSV'),
+        ('parquet', 'Parquet'),
+    )
+    STATES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='submission_exports')
+    format = models.CharField(max_length=10, choices=FORMATS, default='csv')
+    status = models.CharField(
+        max_length=20,
+        choices=Submission.STATUS_CHOICES,
+        blank=True,
+        help_text="Only export submissions with this status (all of them when empty)."
+    )
+    state = models.CharField(max_length=10, choices=STATES, default='pending')
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='submission_exports')
+    total_rows = models.PositiveIntegerField(null=True, blank=True, help_text="Expected rows, from the submission counters.")
+    rows_written = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/%Y/%m/%d/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.get_format_display()} export of {self.form_id} ({self.state})'
+
+# stored file content, kept once per sha256 digest however many documents share it (see blobs.py)
+class Blob(models.Model):
+    digest = models.CharField(max_length=64, unique=True, help_text="sha256 of the content, hex encoded.")
+    size = models.PositiveBigIntegerField()
+    file = models.FileField(max_length=255)
+    ref_count = models.PositiveIntegerField(default=0, help_text="Documents and unattached uploads using this content.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # unreferenced blobs, for pruning
+            models.Index(fields=['ref_count', 'updated_at'], name='blob_unreferenced_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.digest} ({self.ref_count} references)'
+
+# Docs uploads
 class Document(models.Model):
     submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='documents')
     field = models.ForeignKey(Field, on_delete=models.CASCADE, related_name='documents')
     file = models.FileField(upload_to='uploads/%Y/%m/%d/')
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='documents',
+        help_text="The stored content; ``file`` names the same file (empty for older documents)."
+    )
+    filename = models.CharField(max_length=255, blank=True, help_text="Name of the file as uploaded; blobs are stored under their digest.")
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['uploaded_at']
         
     def __str__(self):
-        return f'{self.file} was uploaded at {self.uploaded_at}'
\ No newline at end of file
+        return f'{self.file} was uploaded at {self.uploaded_at}'
+
+
+# resumable upload of one file, sent in chunks (see uploads.py) and attached to a Document once complete
+class Upload(models.Model):
+    STATES = (
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('attached', 'Attached'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='uploads')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(help_text="Total size of the file in bytes, declared when the upload is created.")
+    offset = models.PositiveBigIntegerField(default=0, help_text="Bytes received so far.")
+    state = models.CharField(max_length=10, choices=STATES, default='uploading')
+    file = models.FileField(upload_to='uploads/%Y/%m/%d/', blank=True, help_text="The stored file, once the upload is complete.")
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name='uploads')
+    object_key = models.CharField(max_length=255, blank=True, help_text="Key the client PUTs a direct upload to; empty for chunked uploads.")
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Digest the client declared for a direct upload, checked by the object store.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size} bytes)'
+
+
+# message written in the same transaction as the change it announces, handed to Celery by the relay (see outbox.py)
+class OutboxMessage(models.Model):
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True, help_text="When the relay handed the message to the broker.")
+    processed_at = models.DateTimeField(null=True, blank=True, help_text="When a worker claimed it; a redelivered message is skipped.")
+    attempts = models.PositiveIntegerField(default=0, help_text="Failed hand-overs to the broker.")
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # the relay only ever scans messages not dispatched yet
+            models.Index(fields=['id'], condition=models.Q(dispatched_at__isnull=True), name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} #{self.pk}'
+
+
+# pending line of an admin's submission digest, sent in batches by notifications.py
+class AdminNotification(models.Model):
+    recipient = models.EmailField()
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='admin_notifications')
+    form_name = models.CharField(max_length=255)
+    client_email = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the digest run only reads what is still unsent
+            models.Index(fields=['recipient', 'id'], condition=models.Q(sent_at__isnull=True), name='admin_notification_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'Submission {self.submission_id} for {self.recipient}'
@@ -0,0 +1,119 @@
+"""
+Admin notifications of new submissions.
+
+``ADMIN_NOTIFICATION_MODE`` picks how ``notify_admin_of_submission`` delivers:
+
+* ``immediate``: one email per submission, as it arrives;
+* ``digest``: the task only records an ``AdminNotification`` per admin.
+  ``send_admin_digests`` (beat, every ``ADMIN_DIGEST_WINDOW`` seconds) then
+  coalesces everything pending into one email per admin, rendered from
+  templates compiled once per process. All of them go out through a single
+  SMTP connection with ``send_messages``.
+
+An admin's notifications are marked sent only once their email went out. A
+failure leaves the rest pending for the next run.
+"""
+from functools import cache
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import AdminNotification
+
+
+DEFAULT_MODE = 'digest'
+DEFAULT_BATCH_SIZE = 1000
+
+
+def get_mode():
+    return getattr(settings, 'ADMIN_NOTIFICATION_MODE', DEFAULT_MODE)
+
+
+def admin_recipients():
+    return [email for _, email in settings.ADMINS]
+
+
+def admin_url(submission_id):
+    base_url = getattr(settings, 'ADMIN_BASE_URL', 'http://127.0.0.1:8001')
+    return f"{base_url}{reverse('admin:forms_submission_change', args=[submission_id])}"
+
+
+def from_email():
+    return f"Onboarding Form System <{settings.DEFAULT_FROM_EMAIL}>"
+
+
+@cache
+def _templates():
+    # loaded and compiled on first use, then reused for every digest
+    return get_template('forms/email/admin_digest.txt'), get_template('forms/email/admin_digest.html')
+
+
+def queue_admin_notification(submission_id, form_name, client_email):
+    """Records one pending digest line per admin."""
+    return AdminNotification.objects.bulk_create([
+        AdminNotification(recipient=recipient, submission_id=submission_id, form_name=form_name, client_email=client_email or '')
+        for recipient in admin_recipients()
+    ])
+
+
+def build_digest(recipient, notifications):
+    """The digest email of ``recipient`` listing ``notifications``."""
+    text, html = _templates()
+    context = {
+        'count': len(notifications),
+        'items': [
+            {
+                'form_name': notification.form_name,
+                'client_email': notification.client_email,
+                'submission_id': notification.submission_id,
+                'url': admin_url(notification.submission_id),
+            }
+            for notification in notifications
+        ],
+    }
+    subject = f"{len(notifications)} New Form Submission{'s' if len(notifications) != 1 else ''}"
+    message = EmailMultiAlternatives(subject, text.render(context), from_email(), [recipient])
+    message.attach_alternative(html.render(context), "text/html")
+    return message
+
+
+def send_admin_digests(batch_size=None, connection=None):
+    """
+    Sends one digest per admin with pending notifications, over one SMTP
+    connection, and returns how many emails went out. Reads at most
+    ``batch_size`` (``ADMIN_DIGEST_BATCH_SIZE``) notifications per pass.
+    """
+    batch_size = batch_size or getattr(settings, 'ADMIN_DIGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    connection = connection or get_connection()
+    emails = 0
+    # one SMTP session for every digest of the run
+    with connection:
+        while True:
+            error = None
+            with transaction.atomic():
+                pending = list(
+                    AdminNotification.objects.select_for_update(skip_locked=True)
+                    .filter(sent_at__isnull=True).order_by('recipient', 'pk')[:batch_size]
+                )
+                sent = []
+                for recipient, notifications in groupby(pending, key=attrgetter('recipient')):
+                    notifications = list(notifications)
+                    try:
+                        connection.send_messages([build_digest(recipient, notifications)])
+                    except Exception as exc:
+                        error = exc
+                        break
+                    sent.extend(notification.pk for notification in notifications)
+                    emails += 1
+                if sent:
+                    AdminNotification.objects.filter(pk__in=sent).update(sent_at=timezone.now())
+            if error is not None:
+                raise error
+            if len(pending) < batch_size:
+                return emails
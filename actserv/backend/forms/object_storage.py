@@ -0,0 +1,182 @@
+"""
+Object stores that clients upload to directly, with presigned PUT URLs.
+
+``DIRECT_UPLOAD_BACKEND`` picks one of:
+
+* ``s3``: any S3-compatible API (AWS, or MinIO at
+  ``DIRECT_UPLOAD_ENDPOINT_URL``). URLs are signed for ``DIRECT_UPLOAD_BUCKET``
+  with boto3's usual credentials.
+  The declared sha256 is part of the signature (``x-amz-checksum-sha256``), so
+  the store refuses a body with any other content. Confirmed objects are
+  copied server side into document storage, so that bucket must be the one
+  behind the default storage; the ``forms.E001`` system check refuses to
+  start otherwise.
+* ``local``: a stand-in for development and tests. URLs point at
+  ``DirectUploadPutAPIView``, which checks a signed token and the checksum
+  just like the object store would and keeps objects under
+  ``DIRECT_UPLOAD_LOCAL_ROOT``.
+
+Both expose the same four calls: ``presign_put``, ``head``, ``promote`` and
+``delete``.
+"""
+import base64
+import hashlib
+import os
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.urls import reverse
+
+from .blobs import hash_file
+
+
+DEFAULT_EXPIRES = 900
+LOCAL_SALT = 'forms.object_storage.local'
+
+
+class ObjectRejected(ValueError):
+    """The local store refused a PUT: bad or expired token, wrong size or checksum."""
+
+
+def get_expires():
+    return getattr(settings, 'DIRECT_UPLOAD_EXPIRES', DEFAULT_EXPIRES)
+
+
+def checksum_header(sha256):
+    """The base64 ``x-amz-checksum-sha256`` value of a hex digest."""
+    return base64.b64encode(bytes.fromhex(sha256)).decode()
+
+
+class LocalObjectStorage:
+
+    def __init__(self):
+        location = getattr(settings, 'DIRECT_UPLOAD_LOCAL_ROOT', None) or os.path.join(settings.MEDIA_ROOT, 'direct')
+        self.storage = FileSystemStorage(location=location)
+
+    def presign_put(self, key, content_type, size, sha256):
+        token = signing.dumps({'key': key, 'size': size, 'sha256': sha256}, salt=LOCAL_SALT)
+        headers = {'Content-Type': content_type, 'x-amz-checksum-sha256': checksum_header(sha256)}
+        return reverse('direct-upload-put', kwargs={'token': token}), headers
+
+    def receive(self, token, stream, length):
+        """Stores the body of a PUT to a presigned URL, the way the object store would."""
+        try:
+            claims = signing.loads(token, salt=LOCAL_SALT, max_age=get_expires())
+        except signing.BadSignature as exc:
+            raise ObjectRejected('The upload URL is invalid or has expired.') from exc
+        if length != claims['size']:
+            raise ObjectRejected(f'Content-Length must be {claims["size"]}.')
+
+        path = self.storage.path(claims['key'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        read_size = getattr(settings, 'UPLOAD_READ_SIZE', 64 * 1024)
+        hasher = hashlib.sha256()
+        received = 0
+        with open(f'{path}.incoming', 'wb') as file:
+            while received < length:
+                piece = stream.read(min(read_size, length - received))
+                if not piece:
+                    break
+                hasher.update(piece)
+                file.write(piece)
+                received += len(piece)
+        if (received, hasher.hexdigest()) != (claims['size'], claims['sha256']):
+            os.remove(f'{path}.incoming')
+            raise ObjectRejected('The body does not match the signed size and checksum.')
+        os.replace(f'{path}.incoming', path)
+
+    def head(self, key):
+        """``(size, sha256)`` of a stored object, or None."""
+        if not self.storage.exists(key):
+            return None
+        with self.storage.open(key, 'rb') as file:
+            sha256, size = hash_file(file)
+        return size, sha256
+
+    def promote(self, key, name):
+        with self.storage.open(key, 'rb') as file:
+            return default_storage.save(name, File(file))
+
+    def delete(self, key):
+        self.storage.delete(key)
+
+
+def direct_upload_storage_error():
+    """
+    Why the configured backend cannot work, or None. Objects promoted by the
+    S3 backend keep their key as the blob's name, which only resolves when
+    the default storage serves ``DIRECT_UPLOAD_BUCKET`` (an S3 storage has a
+    ``bucket_name``; the local ``FileSystemStorage`` has none).
+    """
+    if getattr(settings, 'DIRECT_UPLOAD_BACKEND', 'local') != 's3':
+        return None
+    bucket = getattr(settings, 'DIRECT_UPLOAD_BUCKET', '')
+    if not bucket:
+        return 'DIRECT_UPLOAD_BACKEND is "s3" but DIRECT_UPLOAD_BUCKET is not set.'
+    if getattr(default_storage, 'bucket_name', None) != bucket:
+        return f'DIRECT_UPLOAD_BACKEND is "s3" but the default storage is not backed by the bucket {bucket!r}.'
+    return None
+
+
+class S3ObjectStorage:
+
+    def __init__(self):
+        error = direct_upload_storage_error()
+        if error is not None:
+            raise ImproperlyConfigured(error)
+        # boto3 is only loaded where direct uploads go to S3
+        import boto3
+        from botocore.config import Config
+
+        endpoint_url = getattr(settings, 'DIRECT_UPLOAD_ENDPOINT_URL', None) or None
+        self.bucket = settings.DIRECT_UPLOAD_BUCKET
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=getattr(settings, 'DIRECT_UPLOAD_REGION', None) or None,
+            # MinIO and most other S3 stand-ins only serve path style
+            config=Config(signature_version='s3v4', s3={'addressing_style': 'path' if endpoint_url else 'auto'}),
+        )
+
+    def presign_put(self, key, content_type, size, sha256):
+        checksum = checksum_header(sha256)
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': self.bucket, 'Key': key, 'ContentType': content_type, 'ChecksumSHA256': checksum},
+            ExpiresIn=get_expires(),
+            HttpMethod='PUT',
+        )
+        return url, {'Content-Type': content_type, 'x-amz-checksum-sha256': checksum}
+
+    def head(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key, ChecksumMode='ENABLED')
+        except ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        checksum = response.get('ChecksumSHA256') or ''
+        return response['ContentLength'], base64.b64decode(checksum).hex() if checksum else ''
+
+    def promote(self, key, name):
+        # copied inside the bucket; the bytes never pass through the app
+        self.client.copy_object(Bucket=self.bucket, Key=name, CopySource={'Bucket': self.bucket, 'Key': key})
+        return name
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+BACKENDS = {
+    'local': LocalObjectStorage,
+    's3': S3ObjectStorage,
+}
+
+
+def get_object_storage():
+    return BACKENDS[getattr(settings, 'DIRECT_UPLOAD_BACKEND', 'local')]()
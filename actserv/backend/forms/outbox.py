@@ -0,0 +1,117 @@
+"""
+Transactional outbox for Celery tasks.
+
+A request that should trigger a task writes an ``OutboxMessage`` with
+``enqueue`` inside its own transaction instead of calling ``.delay()``. The
+message commits or rolls back with the submission, and the request never
+waits on the broker.
+
+The relay (the ``relay_outbox`` task, run by beat every
+``OUTBOX_RELAY_INTERVAL`` seconds, or ``manage.py relay_outbox``) locks up to
+``OUTBOX_BATCH_SIZE`` undispatched messages with ``SKIP LOCKED``, so several
+relays never pick the same ones. It sends each to its task, with the message
+id in the task id, and marks the batch dispatched. A relay that dies between
+sending and marking sends the batch again, so a task claims its message
+(``claim``) before doing its work and skips messages that are already claimed.
+A task that gives up hands its message back (``unclaim``) to the next relay
+run. Together this delivers each message's effect once.
+"""
+import datetime
+
+from celery.exceptions import Retry
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_RETENTION_DAYS = 7
+
+
+def _handlers():
+    from .tasks import notify_admin_of_submission
+
+    return {
+        'submission.created': notify_admin_of_submission,
+    }
+
+
+def enqueue(topic, payload):
+    """Writes a message for the relay; call it inside the transaction of the change it announces."""
+    if topic not in _handlers():
+        raise ValueError(f'No task handles outbox topic {topic!r}.')
+    return OutboxMessage.objects.create(topic=topic, payload=payload)
+
+
+def relay(batch_size=None):
+    """
+    Hands one batch of undispatched messages to the broker and returns how
+    many were sent. Stops at the first message the broker refuses; that one
+    keeps its place, with the error recorded, for the next run.
+    """
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    handlers = _handlers()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(dispatched_at__isnull=True).order_by('pk')[:batch_size]
+        )
+        sent = []
+        for message in messages:
+            try:
+                handlers[message.topic].apply_async(
+                    kwargs={**message.payload, 'outbox_id': message.pk}, task_id=f'outbox-{message.pk}'
+                )
+            except Retry:
+                # an eager task scheduling its own retry: it was delivered, the task owns it now
+                pass
+            except Exception as exc:
+                OutboxMessage.objects.filter(pk=message.pk).update(attempts=F('attempts') + 1, last_error=str(exc))
+                break
+            sent.append(message.pk)
+        if sent:
+            OutboxMessage.objects.filter(pk__in=sent).update(dispatched_at=timezone.now())
+    return len(sent)
+
+
+def drain(batch_size=None):
+    """Relays batches until the outbox is empty or the broker refuses a message; returns how many were sent."""
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    total = 0
+    while True:
+        sent = relay(batch_size)
+        total += sent
+        if sent < batch_size:
+            return total
+
+
+def claim(outbox_id):
+    """True for the first worker to take the message; False when it was already handled."""
+    return bool(
+        OutboxMessage.objects.filter(pk=outbox_id, processed_at__isnull=True).update(processed_at=timezone.now())
+    )
+
+
+def unclaim(outbox_id, error=None):
+    """
+    Gives a message back after its task failed, so a retry can claim it.
+    With the ``error`` that ended the task's own retries, the message is also
+    marked undispatched, and the next relay run sends it again.
+    """
+    if error is None:
+        OutboxMessage.objects.filter(pk=outbox_id).update(processed_at=None)
+        return
+    OutboxMessage.objects.filter(pk=outbox_id).update(
+        processed_at=None, dispatched_at=None, attempts=F('attempts') + 1, last_error=str(error)
+    )
+
+
+def purge(days=None):
+    """Deletes messages processed more than ``days`` (``OUTBOX_RETENTION_DAYS``) ago."""
+    days = getattr(settings, 'OUTBOX_RETENTION_DAYS', DEFAULT_RETENTION_DAYS) if days is None else days
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    deleted, _ = OutboxMessage.objects.filter(processed_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,41 @@
+"""
+Request body parsers.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class InvalidRecord:
+    """Stands in for an NDJSON line that is not valid JSON, so the other lines still go through."""
+
+    def __init__(self, line, message):
+        self.line = line
+        self.message = message
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON into a list with one item per non-blank line.
+    Lines that do not decode become ``InvalidRecord`` items.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        records = []
+        try:
+            for number, line in enumerate(stream, start=1):
+                line = line.decode(encoding).strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError as exc:
+                    records.append(InvalidRecord(number, f'Line {number} is not valid JSON: {exc}'))
+        except UnicodeDecodeError as exc:
+            raise ParseError(f'NDJSON parse error - {exc}')
+        return records
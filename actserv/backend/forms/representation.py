@@ -0,0 +1,62 @@
+"""
+Sparse fieldsets and summary projections.
+
+List and detail endpoints accept three query parameters:
+
+* ``?view=summary`` renders nested objects compactly: a submission's form
+  becomes ``{id, name, version}``, its user an id, and its documents are left
+  out; a form's creator becomes an id and its fields are left out.
+* ``?fields=id,form,status`` keeps only the listed top-level keys.
+* ``?expand=form,documents`` renders the listed nested objects in full even in
+  the summary view.
+
+The same ``Representation`` is handed to the queryset (``for_serialization``)
+and to the serializer, so columns and relations that are not rendered are not
+loaded either.
+"""
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from rest_framework.exceptions import ValidationError
+
+
+VIEWS = ('full', 'summary')
+
+
+def _names(raw):
+    return frozenset(name.strip() for name in (raw or '').split(',') if name.strip())
+
+
+@dataclass(frozen=True)
+class Representation:
+    summary: bool = False
+    fields: Optional[FrozenSet[str]] = None
+    expand: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        view = params.get('view') or 'full'
+        if view not in VIEWS:
+            raise ValidationError({'view': f'Must be one of: {", ".join(VIEWS)}.'})
+        fields = _names(params.get('fields'))
+        return cls(
+            summary=view == 'summary',
+            fields=fields or None,
+            expand=_names(params.get('expand')),
+        )
+
+    @property
+    def is_default(self):
+        return not self.summary and self.fields is None
+
+    def wants(self, name):
+        """Whether the top-level key ``name`` is rendered at all."""
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        """Whether the nested object ``name`` is rendered in full."""
+        return self.wants(name) and (not self.summary or name in self.expand)
+
+
+FULL = Representation()
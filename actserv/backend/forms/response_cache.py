@@ -0,0 +1,170 @@
+"""
+Shared cache of rendered responses for the public form and field reads.
+
+Those responses are the same for every caller, so the rendered body (with its
+ETag / Last-Modified headers) is stored in the Django cache named by
+``RESPONSE_CACHE_ALIAS``: Redis when ``REDIS_URL`` is set, or any other
+backend (tests can swap in their own). It is only on by default with
+``REDIS_URL``: the invalidations below reach one process's local memory
+cache only, so with several workers the others would keep serving stale
+responses. ``RESPONSE_CACHE_ENABLED=True`` turns it on anyway, e.g. on a
+single process.
+
+Entries are keyed by path, query string, negotiated media type and the
+generation tokens of what the response depends on: ``forms`` for the lists,
+``form:<id>`` and ``field:<id>`` for details. ``Form`` and ``Field`` signals
+replace the tokens they affect (see signals.py), so a change makes exactly
+those keys unreachable and nothing else.
+
+On a miss, only one request per key renders the response; the others wait
+for it for up to ``RESPONSE_CACHE_LOCK_WAIT`` seconds instead of piling onto
+the database, and render it themselves only if it never shows up.
+"""
+import hashlib
+import random
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.response import SimpleTemplateResponse
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_http_date_safe
+
+
+GENERATION_KEY = 'forms:response:generation:{dependency}'
+RESPONSE_KEY = 'forms:response:{digest}'
+LOCK_KEY = 'forms:response:lock:{digest}'
+
+REPLAYED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+
+class ResponseCache:
+
+    def __init__(self, cache_alias=None):
+        self._cache_alias = cache_alias
+
+    @property
+    def backend(self):
+        return caches[self._cache_alias or getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        # jittered so entries written together do not all expire together
+        timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 3600)
+        return int(timeout * random.uniform(0.9, 1.1))
+
+    def generations(self, dependencies):
+        keys = [GENERATION_KEY.format(dependency=dependency) for dependency in dependencies]
+        tokens = self.backend.get_many(keys)
+        for key in keys:
+            if key not in tokens:
+                self.backend.add(key, uuid.uuid4().hex, None)
+                tokens[key] = self.backend.get(key)
+        return [tokens[key] for key in keys]
+
+    def bump(self, *dependencies):
+        """Makes every response depending on one of ``dependencies`` unreachable."""
+        self.backend.set_many(
+            {GENERATION_KEY.format(dependency=dependency): uuid.uuid4().hex for dependency in dependencies}, None
+        )
+
+    def digest(self, request, dependencies):
+        query = '&'.join(sorted(f'{key}={value}' for key, values in request.GET.lists() for value in values))
+        media_type = getattr(request, 'accepted_media_type', '')
+        parts = [request.path, query, media_type, *self.generations(dependencies)]
+        return hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()
+
+    def get(self, digest):
+        return self.backend.get(RESPONSE_KEY.format(digest=digest))
+
+    def store(self, digest, response):
+        entry = {
+            'body': response.content,
+            'content_type': response['Content-Type'],
+            'headers': {header: response[header] for header in REPLAYED_HEADERS if response.has_header(header)},
+        }
+        self.backend.set(RESPONSE_KEY.format(digest=digest), entry, self.timeout)
+
+    def acquire(self, digest):
+        lock_timeout = getattr(settings, 'RESPONSE_CACHE_LOCK_TIMEOUT', 10)
+        return self.backend.add(LOCK_KEY.format(digest=digest), 1, lock_timeout)
+
+    def release(self, digest):
+        self.backend.delete(LOCK_KEY.format(digest=digest))
+
+    def wait(self, digest):
+        """Polls for the entry another request is rendering; None if it does not arrive in time."""
+        deadline = time.monotonic() + getattr(settings, 'RESPONSE_CACHE_LOCK_WAIT', 2.0)
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = self.get(digest)
+            if entry is not None:
+                return entry
+        return None
+
+    def replay(self, request, entry):
+        response = HttpResponse(entry['body'], content_type=entry['content_type'])
+        for header, value in entry['headers'].items():
+            response[header] = value
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(response.get('Last-Modified')),
+            response=response,
+        )
+
+
+response_cache = ResponseCache()
+
+
+def invalidate_form_responses(form_id, field_ids=()):
+    response_cache.bump('forms', f'form:{form_id}', *[f'field:{field_id}' for field_id in field_ids])
+
+
+def invalidate_field_responses(field_id, form_id):
+    response_cache.bump('forms', f'form:{form_id}', f'field:{field_id}')
+
+
+def cached_response(dependencies):
+    """
+    Decorates an ``APIView`` ``get`` whose response is the same for every
+    caller. ``dependencies(**url_kwargs)`` names the generations it depends
+    on. Only 200 responses are stored; streamed ones are never cached.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, **kwargs):
+            if not getattr(settings, 'RESPONSE_CACHE_ENABLED', False) or request.query_params.get('stream'):
+                return view(request, **kwargs)
+
+            digest = response_cache.digest(request, dependencies(**kwargs))
+            entry = response_cache.get(digest)
+            if entry is None and not response_cache.acquire(digest):
+                entry = response_cache.wait(digest)
+                if entry is None:
+                    return view(request, **kwargs)
+            if entry is not None:
+                return response_cache.replay(request, entry)
+
+            try:
+                response = view(request, **kwargs)
+            except Exception:
+                response_cache.release(digest)
+                raise
+            if response.status_code == 200 and isinstance(response, SimpleTemplateResponse):
+                def store(rendered):
+                    response_cache.store(digest, rendered)
+                    response_cache.release(digest)
+                response.add_post_render_callback(store)
+            else:
+                response_cache.release(digest)
+            return response
+
+        return wrapped
+
+    return method_decorator(decorator)
@@ -0,0 +1,321 @@
+"""
+Compiled, immutable form schemas.
+
+Every form is compiled once into a ``FormSchema`` (ordered fields, parsed
+options, typed constraints, conditional rules and the serialized API
+representation) and kept in a bounded in-process LRU keyed by
+``(form_id, version)``.
+
+Each process keeps its own LRU, so invalidation goes through the shared
+Django cache: every form has a revision token there, ``Form``/``Field``
+signals replace the token, and a local entry is only served while its
+token still matches. Reading a hot form therefore costs one cache lookup
+and zero database queries.
+
+When that cache is not shared (local memory, the default without
+``REDIS_URL``), a rotated token only reaches the process that rotated it.
+Entries are then also recompiled once they are ``FORM_SCHEMA_LOCAL_TTL``
+seconds old, which bounds how long other processes serve an edited form.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field as dataclass_field
+from functools import cached_property
+from types import MappingProxyType, SimpleNamespace
+from typing import Any, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import Form
+from .values import parse_date, parse_number
+
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_LOCAL_TTL = 5
+REVISION_KEY = 'forms:schema:revision:{form_id}'
+
+
+def _freeze(value):
+    """Returns a read-only copy of a JSON value (dicts become mapping proxies, lists tuples)."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class ConditionRule:
+    """Visibility rule: show the owning field when ``<field_name> <operator> <value>``."""
+    field_id: int
+    field_name: str
+    operator: str
+    value: Optional[str]
+
+
+@dataclass(frozen=True)
+class FieldSchema:
+    id: int
+    name: str
+    type: str
+    is_required: bool
+    order: int
+    options: Any
+    condition: Optional[ConditionRule] = None
+    choices: Optional[Tuple[Any, ...]] = None
+    minimum: Any = None
+    maximum: Any = None
+    min_length: Optional[int] = None
+    max_length: Optional[int] = None
+    pattern: Optional[str] = None
+
+    @classmethod
+    def from_field(cls, field, controller=None):
+        """
+        Builds the schema of a single ``Field``. ``controller`` is the field named by
+        ``conditional_field`` (passed in so no extra query is needed).
+        """
+        options = field.options if field.options is not None else {}
+        rules = options if isinstance(options, dict) else {}
+
+        choices = None
+        if isinstance(options, list):
+            choices = tuple(options)
+        elif isinstance(rules.get('choices', rules.get('options')), list):
+            choices = tuple(rules.get('choices', rules.get('options')))
+
+        if field.type == 'date':
+            minimum, maximum = parse_date(rules.get('min')), parse_date(rules.get('max'))
+        else:
+            minimum, maximum = parse_number(rules.get('min')), parse_number(rules.get('max'))
+
+        condition = None
+        if field.is_conditional and controller is not None and field.conditional_operator:
+            condition = ConditionRule(
+                field_id=controller.id,
+                field_name=controller.name,
+                operator=field.conditional_operator,
+                value=field.conditional_value,
+            )
+
+        return cls(
+            id=field.id,
+            name=field.name,
+            type=field.type,
+            is_required=field.is_required,
+            order=field.order,
+            options=_freeze(options),
+            condition=condition,
+            choices=choices,
+            minimum=minimum,
+            maximum=maximum,
+            min_length=_to_int(rules.get('min_length')),
+            max_length=_to_int(rules.get('max_length')),
+            pattern=rules.get('pattern'),
+        )
+
+
+@dataclass(frozen=True)
+class FormSchema:
+    id: int
+    version: int
+    name: str
+    is_active: bool
+    revision: str
+    fields: Tuple[FieldSchema, ...]
+    representation: Any = dataclass_field(default=None, compare=False, repr=False)
+
+    @property
+    def key(self):
+        return (self.id, self.version)
+
+    @property
+    def fields_by_name(self):
+        return {field.name: field for field in self.fields}
+
+    @property
+    def fields_by_id(self):
+        return {field.id: field for field in self.fields}
+
+    def field(self, name):
+        for field in self.fields:
+            if field.name == name:
+                return field
+        return None
+
+    @cached_property
+    def graph(self):
+        """Conditional dependency graph, built on first use. Raises ``ConditionCycleError``."""
+        from .conditions import ConditionGraph
+        return ConditionGraph(self.fields)
+
+    @cached_property
+    def validator(self):
+        """Submission validator compiled from this schema, built on first use."""
+        from .validation import compile_validator
+        return compile_validator(self)
+
+
+def compile_form_schema(form_id, revision=''):
+    """
+    Loads a form and all of its fields (two queries) and compiles them into a
+    ``FormSchema``. Raises ``Form.DoesNotExist`` for unknown ids.
+    """
+    from .serializers import FormSerializer
+
+    form = Form.objects.for_serialization().get(pk=form_id)
+    form_fields = list(form.fields.all())
+    by_id = {field.id: field for field in form_fields}
+
+    fields = tuple(
+        FieldSchema.from_field(field, controller=by_id.get(field.conditional_field_id))
+        for field in sorted(form_fields, key=lambda item: (item.order, item.name))
+    )
+    return FormSchema(
+        id=form.id,
+        version=form.version,
+        name=form.name,
+        is_active=form.is_active,
+        revision=revision,
+        fields=fields,
+        representation=dict(FormSerializer(form).data),
+    )
+
+
+def schema_from_representation(representation, version=None, revision=''):
+    """
+    Compiles a ``FormSchema`` from a stored ``FormSerializer`` representation
+    (e.g. a published snapshot) without touching the database.
+    """
+    form_fields = representation.get('form_fields') or []
+    fields = tuple(
+        FieldSchema.from_field(
+            SimpleNamespace(**field),
+            controller=SimpleNamespace(**field['conditional_field']) if field.get('conditional_field') else None,
+        )
+        for field in sorted(form_fields, key=lambda item: (item['order'], item['name']))
+    )
+    return FormSchema(
+        id=representation['id'],
+        version=representation['version'] if version is None else version,
+        name=representation['name'],
+        is_active=representation['is_active'],
+        revision=revision,
+        fields=fields,
+        representation=representation,
+    )
+
+
+class FormSchemaCache:
+    """
+    Bounded LRU of compiled schemas keyed by ``(form_id, version)``. Entries
+    expire after ``local_ttl`` seconds when the revision tokens live in a
+    per-process cache.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, cache_alias='default', local_ttl=DEFAULT_LOCAL_TTL):
+        self.maxsize = maxsize
+        self.cache_alias = cache_alias
+        self.local_ttl = local_ttl
+        self._entries = OrderedDict()
+        self._compiled_at = {}
+        self._versions = {}
+        self._lock = threading.RLock()
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    @property
+    def process_local(self):
+        """True when other processes never see the revision tokens (so never see invalidations)."""
+        return isinstance(self.shared, (LocMemCache, DummyCache))
+
+    def _fresh(self, key):
+        if not self.local_ttl or not self.process_local:
+            return True
+        return time.monotonic() - self._compiled_at.get(key, 0) < self.local_ttl
+
+    def revision(self, form_id):
+        """Current revision token of a form, as seen by every process."""
+        key = REVISION_KEY.format(form_id=form_id)
+        token = self.shared.get(key)
+        if token is None:
+            self.shared.add(key, uuid.uuid4().hex, None)
+            token = self.shared.get(key)
+        return token
+
+    def get(self, form_id):
+        """
+        Returns the compiled schema of ``form_id``, compiling it if it is missing
+        or stale. Raises ``Form.DoesNotExist`` for unknown ids.
+        """
+        form_id = int(form_id)
+        revision = self.revision(form_id)
+        with self._lock:
+            key = (form_id, self._versions.get(form_id))
+            schema = self._entries.get(key)
+            if schema is not None and schema.revision == revision and self._fresh(key):
+                self._entries.move_to_end(key)
+                return schema
+
+        schema = compile_form_schema(form_id, revision=revision)
+        with self._lock:
+            self._discard(form_id)
+            self._entries[schema.key] = schema
+            self._compiled_at[schema.key] = time.monotonic()
+            self._versions[form_id] = schema.version
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._compiled_at.pop(evicted, None)
+                self._versions.pop(evicted[0], None)
+        return schema
+
+    def invalidate(self, form_id):
+        """Drops the local entry and rotates the shared token so other processes drop theirs."""
+        form_id = int(form_id)
+        self.shared.set(REVISION_KEY.format(form_id=form_id), uuid.uuid4().hex, None)
+        with self._lock:
+            self._discard(form_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._compiled_at.clear()
+            self._versions.clear()
+
+    def _discard(self, form_id):
+        for key in [key for key in self._entries if key[0] == form_id]:
+            del self._entries[key]
+            self._compiled_at.pop(key, None)
+        self._versions.pop(form_id, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+schema_cache = FormSchemaCache(
+    maxsize=getattr(settings, 'FORM_SCHEMA_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+    cache_alias=getattr(settings, 'FORM_SCHEMA_CACHE_ALIAS', 'default'),
+    local_ttl=getattr(settings, 'FORM_SCHEMA_LOCAL_TTL', DEFAULT_LOCAL_TTL),
+)
+
+
+def get_form_schema(form_id):
+    return schema_cache.get(form_id)
+
+
+def invalidate_form_schema(form_id):
+    schema_cache.invalidate(form_id)
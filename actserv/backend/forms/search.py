@@ -0,0 +1,128 @@
+"""
+Expressions and indexes for querying ``Submission.data``.
+
+On Postgres ``data`` is JSONB with a GIN (``jsonb_path_ops``) index, which
+serves every equality filter written as containment (``data @> '{"city": "Nairobi"}'``).
+Range filters read one answer with ``->>`` and cast it; for fields an admin
+marks ``is_searchable`` a partial expression index per field,
+``ON forms_submission ((<expression>)) WHERE form_id = <form>``, makes them
+index scans. Those indexes are built from the very expressions the filters
+use, so the planner can always match them.
+
+Other databases (sqlite in development) get the same filters without the
+indexes.
+"""
+import hashlib
+
+from django.db import connection, models
+from django.db.models import ExpressionWrapper, Func, Q, TextField
+from django.db.models.fields.json import KeyTextTransform
+
+
+GIN_INDEX_NAME = 'submission_data_gin'
+SEARCH_INDEX_PREFIX = 'sub_f'
+NUMBER_PATTERN = r'^\s*-?[0-9]+(\.[0-9]+)?\s*$'
+INDEXED_TYPES = ('number', 'date', 'text', 'dropdown')
+
+
+class SafeNumeric(Func):
+    """
+    Casts a JSON text value to a number, or NULL when it is not one, so a stray
+    string in old data cannot make the whole query fail.
+    """
+    output_field = models.DecimalField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        template = 'CASE WHEN ({value}) GLOB \'*[0-9]*\' AND NOT ({value}) GLOB \'*[^0-9. -]*\' THEN CAST(({value}) AS NUMERIC) END'
+        return template.format(value=sql), params * 3
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        pattern = NUMBER_PATTERN.replace('%', '%%')
+        return f"CASE WHEN ({sql}) ~ '{pattern}' THEN ({sql})::numeric END", params * 2
+
+
+def answer_text(name):
+    # ``->>``, compared as plain text rather than through the JSON key lookups
+    return ExpressionWrapper(KeyTextTransform(name, 'data'), output_field=TextField())
+
+
+def answer_expression(field_type, name):
+    """The expression range filters compare for an answer of the given type."""
+    if field_type == 'number':
+        return SafeNumeric(answer_text(name))
+    # ISO dates order correctly as text
+    return answer_text(name)
+
+
+def search_index_name(field):
+    # the hash changes with anything the expression depends on, so stale indexes are recognisable
+    signature = hashlib.sha1(f'{field.form_id}:{field.name}:{field.type}'.encode()).hexdigest()[:8]
+    return f'{SEARCH_INDEX_PREFIX}{field.id}_{signature}'
+
+
+def search_index(field):
+    return models.Index(
+        answer_expression(field.type, field.name),
+        name=search_index_name(field),
+        condition=Q(form_id=field.form_id),
+    )
+
+
+def _existing_indexes(field_id=None):
+    from .models import Submission
+
+    with connection.cursor() as cursor:
+        names = connection.introspection.get_constraints(cursor, Submission._meta.db_table)
+    prefix = SEARCH_INDEX_PREFIX if field_id is None else f'{SEARCH_INDEX_PREFIX}{field_id}_'
+    return {name for name in names if name.startswith(prefix)}
+
+
+def sync_field_index(field_id):
+    """
+    Creates the expression index of a searchable field and drops stale ones
+    (field renamed, retyped, unmarked or deleted). Postgres only; runs
+    ``CONCURRENTLY`` so writes to submissions are never blocked.
+    Returns ``(created, dropped)`` index names.
+    """
+    from .models import Field, Submission
+
+    if connection.vendor != 'postgresql':
+        return [], []
+    field = Field.objects.filter(pk=field_id).first()
+    wanted = None
+    if field is not None and field.is_searchable and field.type in INDEXED_TYPES:
+        wanted = search_index(field)
+
+    existing = _existing_indexes(field_id)
+    dropped = sorted(existing - {wanted.name} if wanted else existing)
+    with connection.cursor() as cursor:
+        for name in dropped:
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {connection.ops.quote_name(name)}')
+    created = []
+    if wanted is not None and wanted.name not in existing:
+        with connection.schema_editor(atomic=False) as editor:
+            editor.add_index(Submission, wanted, concurrently=True)
+        created.append(wanted.name)
+    return created, dropped
+
+
+def sync_search_indexes():
+    """Brings every field's index in line with its definition; returns ``(created, dropped)``."""
+    from .models import Field
+
+    if connection.vendor != 'postgresql':
+        return [], []
+    field_ids = set(Field.objects.filter(is_searchable=True).values_list('id', flat=True))
+    for name in _existing_indexes():
+        field_id = name[len(SEARCH_INDEX_PREFIX):].split('_', 1)[0]
+        if field_id.isdigit():
+            field_ids.add(int(field_id))
+
+    created, dropped = [], []
+    for field_id in sorted(field_ids):
+        field_created, field_dropped = sync_field_index(field_id)
+        created += field_created
+        dropped += field_dropped
+    return created, dropped
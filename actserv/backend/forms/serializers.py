@@ -1,6 +1,18 @@
+import json
+
 from rest_framework import serializers
 from .models import *
 from authentication.models import CustomUser
+from .schema import get_form_schema
+from .conditions import validate_conditional_link
+from .validation import pattern_error
+from .transfer import find_definition_errors, import_form
+from .snapshots import current_snapshot_id, get_snapshot_schema, get_snapshot_schemas
+from .blobs import store_documents
+from django.core.exceptions import ValidationError as DjangoValidationError
+from drf_spectacular.utils import extend_schema_field
+from django.db.models import Prefetch, prefetch_related_objects
+from django.urls import reverse
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -17,6 +29,38 @@ class MinimalFormSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'version']    
 
 
+class RepresentationMixin:
+    """
+    Applies the ``Representation`` passed in the serializer context: drops the
+    keys left out by ``?fields=`` and, in the summary view, swaps the nested
+    serializers listed in ``summary_fields`` for their compact form (or drops
+    them when the compact form is None) unless they are expanded.
+    """
+    summary_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        representation = self.context.get('representation')
+        if representation is None or representation.is_default:
+            return
+        for name in list(self.fields):
+            if self.fields[name].write_only:
+                continue
+            if not representation.wants(name):
+                self.fields.pop(name)
+            elif name in self.summary_fields and not representation.expands(name):
+                compact = self.summary_fields[name]
+                if compact is None:
+                    self.fields.pop(name)
+                else:
+                    self.fields[name] = compact()
+
+    @property
+    def nested_context(self):
+        """Context for nested serializers, which always render in full."""
+        return {**self.context, 'representation': None}
+
+
 class MinimalFieldSerializer(serializers.ModelSerializer):
     class Meta:
         model = Field
@@ -25,18 +69,45 @@ class MinimalFieldSerializer(serializers.ModelSerializer):
 class FieldSerializer(serializers.ModelSerializer):
     form = serializers.SerializerMethodField(read_only=True) 
     conditional_field = MinimalFieldSerializer(read_only=True) 
+    conditional_field_id = serializers.PrimaryKeyRelatedField(
+        source='conditional_field', queryset=Field.objects.all(),
+        write_only=True, required=False, allow_null=True
+    )
     
     class Meta:
         model = Field
         fields = [
             'id','form','name','type',
-            'options','is_required','order','created_at',
+            'options','is_required','is_searchable','order','created_at',
             'is_conditional', 
             'conditional_field', 
+            'conditional_field_id',
             'conditional_operator', 
             'conditional_value',
         ]
         read_only_fields = ['created_at']
+
+    def validate(self, attrs):
+        """
+        Rejects invalid ``pattern`` options, conditional links to other forms
+        and links that would close a cycle.
+        """
+        options = attrs.get('options')
+        if hasattr(options, 'get'):
+            error = pattern_error(options.get('pattern'))
+            if error:
+                raise serializers.ValidationError({'options': {'pattern': [error]}})
+        if 'conditional_field' in attrs:
+            if self.instance is not None:
+                candidate = Field(pk=self.instance.pk, form_id=self.instance.form_id)
+            else:
+                candidate = Field(form_id=self.initial_data.get('form'))
+            candidate.conditional_field = attrs['conditional_field']
+            try:
+                validate_conditional_link(candidate)
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError(exc.message_dict)
+        return attrs
     
     def get_form(self, obj):
         """
@@ -45,7 +116,7 @@ class FieldSerializer(serializers.ModelSerializer):
         form_instance = obj.form
         return MinimalFormSerializer(form_instance, context=self.context).data
 
-class FormSerializer(serializers.ModelSerializer):
+class FormSerializer(RepresentationMixin, serializers.ModelSerializer):
     created_by = CustomUserSerializer(read_only=True) 
     form_fields = serializers.SerializerMethodField()
     class Meta:
@@ -53,30 +124,200 @@ class FormSerializer(serializers.ModelSerializer):
         fields = ['id','name','description','created_by','version',
                   'is_active','created_at','updated_at','form_fields']
         read_only_fields = ['created_at','updated_at']
+
+    summary_fields = {
+        'created_by': lambda: serializers.PrimaryKeyRelatedField(read_only=True),
+        'form_fields': None,
+    }
         
     def get_form_fields(self, obj):
         fields = obj.fields.all()
-        return FieldSerializer(fields, many=True, context=self.context).data
+        return FieldSerializer(fields, many=True, context=self.nested_context).data
+
+class FieldDefinitionSerializer(serializers.ModelSerializer):
+    """A field inside an import/export document; the controlling field is named, not referenced by id."""
+    conditional_field = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+    class Meta:
+        model = Field
+        fields = [
+            'name', 'type', 'options', 'is_required', 'is_searchable', 'order',
+            'is_conditional', 'conditional_field', 'conditional_operator', 'conditional_value',
+        ]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['conditional_field'] = instance.conditional_field.name if instance.conditional_field_id else None
+        return data
+
+
+class FormDefinitionSerializer(serializers.ModelSerializer):
+    """A complete form definition, used by the import/export endpoints and commands."""
+    form_fields = FieldDefinitionSerializer(many=True, source='fields')
+
+    class Meta:
+        model = Form
+        fields = ['name', 'description', 'version', 'is_active', 'form_fields']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['form_fields'].sort(key=lambda field: (field['order'], field['name']))
+        return data
+
+    def validate_form_fields(self, value):
+        errors = find_definition_errors(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return value
+
+    def create(self, validated_data):
+        field_definitions = validated_data.pop('fields')
+        created_by = validated_data.pop('created_by', None)
+        form = import_form(validated_data, field_definitions, created_by=created_by)
+        # the response renders the fields and their controllers: one query, not one per link
+        prefetch_related_objects([form], Prefetch('fields', queryset=Field.objects.select_related('conditional_field')))
+        return form
+
+
+class PartialValidationSerializer(serializers.Serializer):
+    """Input of the autosave / partial validation endpoint."""
+    data = serializers.DictField()
+    changed = serializers.ListField(child=serializers.CharField(), required=False)
+
 
 class DocumentSerializer(serializers.ModelSerializer):
    
     field_id = serializers.IntegerField(write_only = True)
+    digest = serializers.CharField(source='blob.digest', read_only=True, default=None)
+    size = serializers.IntegerField(source='blob.size', read_only=True, default=None)
     class Meta:
         model = Document
-        fields = ['id','submission','field','field_id','file','uploaded_at']
-        read_only_fields = ['uploaded_at']
+        fields = ['id','submission','field','field_id','file','filename','digest','size','uploaded_at']
+        read_only_fields = ['filename','uploaded_at']
   
-class SubmissionSerializer(serializers.ModelSerializer):
-    form = FormSerializer(read_only=True)
+class SubmissionExportSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SubmissionExport
+        fields = ['id', 'form', 'format', 'status', 'state', 'total_rows', 'rows_written', 'progress',
+                  'download', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = ['form', 'state', 'total_rows', 'rows_written', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def get_progress(self, obj):
+        """Share of the expected rows written so far, between 0 and 1."""
+        if obj.state == 'done':
+            return 1.0
+        if not obj.total_rows:
+            return 0.0
+        return round(min(obj.rows_written / obj.total_rows, 1.0), 4)
+
+    def get_download(self, obj):
+        if obj.state != 'done' or not obj.file:
+            return None
+        url = reverse('submission-export-download', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class UploadSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Upload
+        fields = ['id', 'filename', 'content_type', 'size', 'offset', 'state', 'created_at', 'updated_at']
+        read_only_fields = ['offset', 'state', 'created_at', 'updated_at']
+
+    def validate_filename(self, value):
+        # a name, never a path into storage
+        name = value.replace('\\', '/').rsplit('/', 1)[-1].strip()
+        if not name:
+            raise serializers.ValidationError('Must be a file name.')
+        return name
+
+
+class DirectUploadSerializer(UploadSerializer):
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', help_text='Hex sha256 of the file; the object store rejects any other content.')
+
+    class Meta(UploadSerializer.Meta):
+        fields = UploadSerializer.Meta.fields + ['sha256']
+
+    def validate_sha256(self, value):
+        return value.lower()
+
+
+class DocumentAttachSerializer(serializers.Serializer):
+    upload_id = serializers.UUIDField()
+    field_id = serializers.IntegerField()
+
+
+class SubmissionListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        rows = data.all() if hasattr(data, 'all') else data
+        # loads the snapshots of the whole page at once instead of one per row
+        get_snapshot_schemas({row.snapshot_id for row in rows if row.snapshot_id})
+        return super().to_representation(rows)
+
+
+class SubmissionSerializer(RepresentationMixin, serializers.ModelSerializer):
+    form = serializers.SerializerMethodField()
     user = CustomUserSerializer(read_only = True)
     documents = DocumentSerializer(many=True, required = False)
     form_id = serializers.IntegerField(write_only=True)
    
     class Meta:
         model = Submission
-        fields = ['id','form','user','form_id','data',
+        fields = ['id','form','snapshot','user','form_id','data',
                   'status','submitted_at','updated_at','documents']
-        read_only_fields = ['submitted_at','updated_at']
+        read_only_fields = ['snapshot','submitted_at','updated_at']
+        list_serializer_class = SubmissionListSerializer
+
+    summary_fields = {
+        'form': lambda: MinimalFormSerializer(read_only=True),
+        'user': lambda: serializers.PrimaryKeyRelatedField(read_only=True),
+        'documents': None,
+    }
+
+    @extend_schema_field(FormSerializer)
+    def get_form(self, obj):
+        """
+        Renders the snapshot the submission was validated against. Older
+        submissions without one fall back to the live form, serialized once per
+        request so a page of submissions to the same form reuses it.
+        """
+        if obj.snapshot_id:
+            return get_snapshot_schema(obj.snapshot_id).representation
+        forms = self.context.setdefault('_serialized_forms', {})
+        if obj.form_id not in forms:
+            forms[obj.form_id] = FormSerializer(obj.form, context=self.nested_context).data
+        return forms[obj.form_id]
+
+    def validate_form_id(self, value):
+        try:
+            get_form_schema(value)
+        except Form.DoesNotExist:
+            raise serializers.ValidationError('Form does not exist.')
+        return value
+
+    def validate_data(self, value):
+        # multipart submissions send the answers as a JSON encoded string
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise serializers.ValidationError('Must be a valid JSON object.')
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Must be a JSON object.')
+        return value
+
+    def validate(self, attrs):
+        form_id = attrs.get('form_id')
+        if form_id is not None:
+            errors = get_form_schema(form_id).validator.validate(attrs.get('data', {}))
+            if errors:
+                raise serializers.ValidationError({'data': errors})
+        return attrs
         
     def create(self, validated_data):
         
@@ -86,16 +327,11 @@ class SubmissionSerializer(serializers.ModelSerializer):
         
         submission = Submission.objects.create(
             form_id=form_id,
+            snapshot_id=current_snapshot_id(get_form_schema(form_id)),
             user=user_instance,
             **validated_data
         )
         
-        for docs in document_data:
-            field_id = docs.pop('field_id')
-            Document.objects.create(
-                submission=submission, 
-                field_id=field_id,
-                **docs
-            )
+        store_documents(submission, [(docs['field_id'], docs['file']) for docs in document_data])
             
         return submission
\ No newline at end of file
@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Form, Field, Submission, Document, Upload
+from .schema import invalidate_form_schema
+from .response_cache import invalidate_field_responses, invalidate_form_responses
+from .tasks import sync_search_index
+from .projection import is_enabled as projection_enabled, project_submissions
+from .counters import count_submissions, move_status
+from .analytics import invalidate_form_statistics
+from .blobs import release_blob
+
+
+def _now_and_on_commit(invalidate):
+    # Drop cached copies right away for this process, and again once the
+    # transaction commits so no other process keeps a copy built from
+    # uncommitted rows.
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def _deleted_with_form(origin):
+    return isinstance(origin, Form) or getattr(origin, 'model', None) is Form
+
+
+def _invalidate_schema(form_id):
+    _now_and_on_commit(lambda: invalidate_form_schema(form_id))
+
+
+@receiver([post_save, post_delete], sender=Form)
+def form_changed(sender, instance, **kwargs):
+    form_id = instance.pk
+    _invalidate_schema(form_id)
+    # field details embed their form, so they go too
+    field_ids = list(Field.objects.filter(form_id=form_id).values_list('id', flat=True))
+    _now_and_on_commit(lambda: invalidate_form_responses(form_id, field_ids))
+
+
+@receiver([post_save, post_delete], sender=Field)
+def field_changed(sender, instance, **kwargs):
+    # moves the form's ETag and Last-Modified along with its fields
+    Form.objects.filter(pk=instance.form_id).update(
+        fields_revision=F('fields_revision') + 1, updated_at=timezone.now()
+    )
+    field_id, form_id = instance.pk, instance.form_id
+    _invalidate_schema(form_id)
+    _now_and_on_commit(lambda: invalidate_field_responses(field_id, form_id))
+    if instance.is_searchable or getattr(instance, '_was_searchable', False):
+        # index builds can take minutes on a large table, so they run in the worker
+        transaction.on_commit(lambda: sync_search_index.delay(field_id))
+    instance._was_searchable = instance.is_searchable
+
+
+@receiver(post_save, sender=Submission)
+def submission_saved(sender, instance, update_fields=None, **kwargs):
+    # status-only updates leave the answers, and so the projection, unchanged
+    if not projection_enabled() or (update_fields is not None and 'data' not in update_fields):
+        return
+    project_submissions([instance])
+
+
+@receiver(post_save, sender=Submission)
+def submission_counted(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        count_submissions([instance])
+    elif update_fields is not None and 'status' not in update_fields:
+        return
+    elif getattr(instance, '_loaded_status', None) is not None:
+        move_status(instance, instance._loaded_status)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Submission)
+def submission_uncounted(sender, instance, origin=None, **kwargs):
+    # a deleted form takes its counters with it
+    if _deleted_with_form(origin):
+        return
+    count_submissions([instance], delta=-1)
+
+
+@receiver(post_save, sender=Submission)
+def submission_edited(sender, instance, created, update_fields=None, **kwargs):
+    # new submissions are folded into the statistics by id; edits are not
+    if not created and (update_fields is None or {'status', 'data'} & set(update_fields)):
+        form_id = instance.form_id
+        _now_and_on_commit(lambda: invalidate_form_statistics(form_id))
+
+
+@receiver(post_delete, sender=Submission)
+def submission_deleted(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_form(origin):
+        form_id = instance.form_id
+        _now_and_on_commit(lambda: invalidate_form_statistics(form_id))
+
+
+@receiver(post_delete, sender=Document)
+def document_deleted(sender, instance, **kwargs):
+    if instance.blob_id is not None:
+        release_blob(instance.blob_id)
+
+
+@receiver(post_delete, sender=Upload)
+def upload_deleted(sender, instance, **kwargs):
+    # an attached upload's reference belongs to its document
+    if instance.blob_id is not None and instance.state != 'attached':
+        release_blob(instance.blob_id)
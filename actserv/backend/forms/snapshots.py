@@ -0,0 +1,195 @@
+"""
+Immutable, versioned form snapshots.
+
+Publishing a form freezes its rendered definition into a ``FormSnapshot`` row
+with the next version number, and every new submission points at the snapshot
+of the definition it was validated against. A snapshot is published
+automatically when a submission arrives for a definition that has changed since
+the last one, so the stored answers always match a frozen definition.
+
+Snapshot rows are never edited, so once loaded they are cached forever by id,
+in a per-process LRU and in the shared Django cache. Rendering or validating a
+historical submission therefore never reads or re-serializes ``Field`` rows.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Form, FormSnapshot
+from .schema import get_form_schema, invalidate_form_schema, schema_from_representation
+from .response_cache import invalidate_form_responses
+
+
+DEFAULT_CACHE_SIZE = 1024
+SNAPSHOT_KEY = 'forms:snapshot:{snapshot_id}'
+DIGEST_KEY = 'forms:snapshot:{form_id}:{digest}'
+
+# what makes two definitions the same; version, dates and the creator do not count
+DEFINITION_KEYS = ('name', 'description')
+FIELD_DEFINITION_KEYS = (
+    'id', 'name', 'type', 'options', 'is_required', 'order', 'is_conditional',
+    'conditional_field', 'conditional_operator', 'conditional_value',
+)
+
+
+def definition_digest(representation):
+    definition = {key: representation.get(key) for key in DEFINITION_KEYS}
+    definition['form_fields'] = sorted(
+        ({key: field.get(key) for key in FIELD_DEFINITION_KEYS} for field in representation.get('form_fields') or []),
+        key=lambda field: field['id'],
+    )
+    encoded = json.dumps(definition, sort_keys=True, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _with_version(representation, version):
+    """Copy of a form representation stamped with the snapshot version, nested fields included."""
+    frozen = json.loads(json.dumps(representation, cls=DjangoJSONEncoder))
+    frozen['version'] = version
+    for field in frozen.get('form_fields') or []:
+        if isinstance(field.get('form'), dict):
+            field['form']['version'] = version
+    return frozen
+
+
+def _shared():
+    return caches[getattr(settings, 'FORM_SCHEMA_CACHE_ALIAS', 'default')]
+
+
+def publish_schema(schema, published_by=None):
+    """
+    Freezes a compiled schema. Returns ``(snapshot, created)``; an unchanged
+    definition returns its existing snapshot instead of a new version.
+    """
+    digest = definition_digest(schema.representation)
+    with transaction.atomic():
+        # serializes concurrent publishes of the same form
+        Form.objects.select_for_update().only('id').get(pk=schema.id)
+        snapshot = FormSnapshot.objects.filter(form_id=schema.id, digest=digest).first()
+        created = snapshot is None
+        if created:
+            latest = FormSnapshot.objects.filter(form_id=schema.id).aggregate(latest=Max('version'))['latest']
+            version = max(latest + 1, schema.version) if latest else schema.version
+            snapshot = FormSnapshot.objects.create(
+                form_id=schema.id,
+                version=version,
+                digest=digest,
+                schema=_with_version(schema.representation, version),
+                published_by=published_by,
+            )
+            if version != schema.version:
+                Form.objects.filter(pk=schema.id).update(version=version, updated_at=timezone.now())
+                # update() sends no signals; drop the schema and responses that still show the old version
+                field_ids = [field.id for field in schema.fields]
+                for invalidate in (
+                    lambda: invalidate_form_schema(schema.id),
+                    lambda: invalidate_form_responses(schema.id, field_ids),
+                ):
+                    invalidate()
+                    transaction.on_commit(invalidate)
+
+    key = DIGEST_KEY.format(form_id=schema.id, digest=digest)
+    transaction.on_commit(lambda: _shared().set(key, snapshot.id, None))
+    return snapshot, created
+
+
+def publish_form(form_id, published_by=None):
+    """Publishes the current definition of a form. Raises ``Form.DoesNotExist``."""
+    return publish_schema(get_form_schema(form_id), published_by=published_by)
+
+
+def current_snapshot_id(schema):
+    """
+    Id of the snapshot matching a compiled schema, publishing one if the
+    definition changed since the last publish. No queries once known.
+    """
+    digest = definition_digest(schema.representation)
+    snapshot_id = _shared().get(DIGEST_KEY.format(form_id=schema.id, digest=digest))
+    if snapshot_id is None:
+        snapshot, _ = publish_schema(schema)
+        snapshot_id = snapshot.id
+    return snapshot_id
+
+
+class SnapshotCache:
+    """
+    Bounded LRU of compiled snapshot schemas keyed by snapshot id, backed by the
+    shared cache. Entries never go stale because snapshots never change.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, cache_alias='default'):
+        self.maxsize = maxsize
+        self.cache_alias = cache_alias
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    def get(self, snapshot_id):
+        """Returns the compiled schema of a snapshot. Raises ``FormSnapshot.DoesNotExist``."""
+        schema = self.get_many([snapshot_id]).get(int(snapshot_id))
+        if schema is None:
+            raise FormSnapshot.DoesNotExist(f'Snapshot {snapshot_id} does not exist.')
+        return schema
+
+    def get_many(self, snapshot_ids):
+        """Returns ``{id: schema}``, loading every id missing from both caches in one query."""
+        found = {}
+        with self._lock:
+            for snapshot_id in {int(snapshot_id) for snapshot_id in snapshot_ids}:
+                if snapshot_id in self._entries:
+                    self._entries.move_to_end(snapshot_id)
+                    found[snapshot_id] = self._entries[snapshot_id]
+        missing = {int(snapshot_id) for snapshot_id in snapshot_ids} - set(found)
+        if not missing:
+            return found
+
+        keys = {SNAPSHOT_KEY.format(snapshot_id=snapshot_id): snapshot_id for snapshot_id in missing}
+        rows = {keys[key]: row for key, row in self.shared.get_many(list(keys)).items()}
+        unknown = missing - set(rows)
+        if unknown:
+            loaded = {
+                row['id']: row
+                for row in FormSnapshot.objects.filter(pk__in=unknown).values('id', 'form_id', 'version', 'schema')
+            }
+            self.shared.set_many({SNAPSHOT_KEY.format(snapshot_id=key): row for key, row in loaded.items()}, None)
+            rows.update(loaded)
+
+        with self._lock:
+            for snapshot_id, row in rows.items():
+                schema = schema_from_representation(row['schema'], version=row['version'], revision=f'snapshot:{snapshot_id}')
+                self._entries[snapshot_id] = found[snapshot_id] = schema
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+snapshot_cache = SnapshotCache(
+    maxsize=getattr(settings, 'FORM_SNAPSHOT_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+    cache_alias=getattr(settings, 'FORM_SCHEMA_CACHE_ALIAS', 'default'),
+)
+
+
+def get_snapshot_schema(snapshot_id):
+    return snapshot_cache.get(snapshot_id)
+
+
+def get_snapshot_schemas(snapshot_ids):
+    return snapshot_cache.get_many(snapshot_ids)
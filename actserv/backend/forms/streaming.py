@@ -0,0 +1,70 @@
+"""
+Streaming list responses.
+
+With ``?stream=json`` (or ``?stream=ndjson``) a list view skips pagination and
+streams every matching row: the queryset is read with
+``iterator(chunk_size=STREAM_CHUNK_SIZE)`` and each row is serialized and
+encoded on its own, so a worker holds one chunk of model instances at a time
+whatever the size of the result.
+
+``json`` keeps the usual envelope, ``{"message": "Success", "data": [...]}``;
+``ndjson`` writes one JSON object per line. The status code is sent before the
+first row, so an error halfway through truncates the body instead of turning
+into a 500.
+"""
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def get_stream_format(request):
+    """The requested stream format, or None when the response is not streamed."""
+    stream = request.query_params.get('stream')
+    if not stream:
+        return None
+    if stream not in STREAM_FORMATS:
+        raise ValidationError({'stream': f'Must be one of: {", ".join(STREAM_FORMATS)}.'})
+    return stream
+
+
+def _dumps(value):
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def iter_json(rows, serialize, message='Success'):
+    yield '{"message":%s,"data":[' % _dumps(message)
+    separator = ''
+    for row in rows:
+        yield separator + _dumps(serialize(row))
+        separator = ','
+    yield ']}'
+
+
+def iter_ndjson(rows, serialize):
+    for row in rows:
+        yield _dumps(serialize(row)) + '\n'
+
+
+def stream_queryset(queryset, serializer, stream_format, chunk_size=None):
+    """
+    Streams ``queryset`` through ``serializer`` (an unbound serializer instance,
+    reused for every row so per-request context such as memoized forms is kept).
+    """
+    chunk_size = chunk_size or getattr(settings, 'STREAM_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    rows = queryset.iterator(chunk_size=chunk_size)
+    if stream_format == 'ndjson':
+        content = iter_ndjson(rows, serializer.to_representation)
+    else:
+        content = iter_json(rows, serializer.to_representation)
+    return StreamingHttpResponse(content, content_type=STREAM_FORMATS[stream_format])
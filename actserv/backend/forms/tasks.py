@@ -1,17 +1,34 @@
+from smtplib import SMTPException
+
 from celery import shared_task
 from django.core.mail import EmailMultiAlternatives
-from django.urls import reverse
-from django.conf import settings
+from django.db import transaction
 
 
-@shared_task
-def notify_admin_of_submission(submission_id: int, form_name: str, client_email: str):
+# transient SMTP and network failures are retried with exponential backoff (2s, 4s, ... up to 10 minutes)
+@shared_task(bind=True, autoretry_for=(SMTPException, OSError), retry_backoff=True, retry_backoff_max=600, max_retries=5)
+def notify_admin_of_submission(self, submission_id: int, form_name: str, client_email: str, outbox_id: int = None):
     """
-    Sends an email notification to the site administrators.
+    Sends an email notification to the site administrators, or in digest
+    mode queues it for the next digest (see notifications.py). Sent through
+    the outbox (see outbox.py), it runs once per message even when redelivered.
+    A send that still fails after the last retry hands its message back to
+    the relay.
     """
+    from .notifications import admin_recipients, admin_url, from_email, get_mode, queue_admin_notification
+    from .outbox import claim, unclaim
+
+    if get_mode() == 'digest':
+        with transaction.atomic():
+            if outbox_id is not None and not claim(outbox_id):
+                return f"Admin notification for Submission ID {submission_id} already queued"
+            queue_admin_notification(submission_id, form_name, client_email)
+        return f"Admin notification for Submission ID {submission_id} queued for the digest"
+
+    if outbox_id is not None and not claim(outbox_id):
+        return f"Admin notification for Submission ID {submission_id} already sent"
 
-    admin_url_path = reverse('admin:forms_submission_change', args=[submission_id])
-    admin_full_url = f"http://127.0.0.1:8001{admin_url_path}" 
+    admin_full_url = admin_url(submission_id)
 
     subject = f"New Form Submission: {form_name}"
 
@@ -43,11 +60,63 @@ def notify_admin_of_submission(submission_id: int, form_name: str, client_email:
     </html>
     """
 
-    from_email = f"Onboarding Form System <{settings.DEFAULT_FROM_EMAIL}>"
-    to_emails = [email for _, email in settings.ADMINS]
-
-    msg = EmailMultiAlternatives(subject, text_content, from_email, to_emails)
+    msg = EmailMultiAlternatives(subject, text_content, from_email(), admin_recipients())
     msg.attach_alternative(html_content, "text/html")
-    msg.send()
+    try:
+        msg.send()
+    except Exception as exc:
+        if outbox_id is not None:
+            retried = isinstance(exc, self.autoretry_for) and self.request.retries < self.max_retries
+            unclaim(outbox_id, error=None if retried else exc)
+        raise
 
     return f"Admin notification sent for Submission ID: {submission_id}"
+
+
+@shared_task
+def sync_search_index(field_id: int):
+    """
+    Creates or drops the expression index on a field's answers after it is
+    marked or unmarked searchable, renamed or deleted (see search.py).
+    """
+    from .search import sync_field_index
+
+    created, dropped = sync_field_index(field_id)
+    return f"Search index for Field ID {field_id}: {len(created)} created, {len(dropped)} dropped"
+
+
+@shared_task
+def export_submissions(export_id: int):
+    """
+    Writes the CSV or Parquet file of a SubmissionExport in chunks, reporting
+    progress on the export as it goes (see exports.py).
+    """
+    from .exports import run_export
+
+    export = run_export(export_id)
+    return f"Export ID {export_id}: {export.rows_written} rows written to {export.file.name}"
+
+
+@shared_task
+def send_admin_digests():
+    """
+    Sends every admin one email listing the submissions queued for them
+    since the last digest, over one SMTP connection (see notifications.py).
+    """
+    from .notifications import send_admin_digests as send_digests
+
+    emails = send_digests()
+    return f"Admin digests: {emails} emails sent"
+
+
+@shared_task
+def relay_outbox():
+    """
+    Hands the messages written to the outbox to their tasks, in batches, and
+    deletes processed ones past their retention (see outbox.py).
+    """
+    from .outbox import drain, purge
+
+    sent = drain()
+    purged = purge()
+    return f"Outbox: {sent} messages relayed, {purged} purged"
@@ -2,15 +2,38 @@ from django.test import TestCase
 from django.db import IntegrityError
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Form, Field, Submission, Document 
+from .models import Form, Field, Submission, Document, FormSnapshot, SubmissionValue, SubmissionCount, SubmissionDailyCount, OutboxMessage
 import datetime 
+import importlib.util
+import os
+from decimal import Decimal
+import json
 from unittest import mock
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+from django.core.cache import cache, caches
+from django.db import connection
+from unittest import skipUnless
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from django.conf import settings
+from django.utils import timezone
+from core.query_budget import QueryBudgetTestMixin, QueryBudgetExceeded
+from core.celery_harness import CeleryHarnessMixin
+
 from .tasks import notify_admin_of_submission 
+from .views import FormCreateListAPIView
+from .schema import schema_cache, get_form_schema, FormSchemaCache, REVISION_KEY, FieldSchema, ConditionRule
+from .conditions import ConditionGraph, ConditionCycleError
+from .snapshots import snapshot_cache, get_snapshot_schema, get_snapshot_schemas
+from .response_cache import response_cache
+from .search import GIN_INDEX_NAME, search_index
+from .filters import SubmissionFilter
+from django.http import QueryDict
+from django.core.exceptions import ValidationError as DjangoValidationError
 
 CustomUser = get_user_model()
 
@@ -410,18 +433,16 @@ class SubmissionAPITest(BaseAPITestSetup):
         self.assertEqual(len(response.data['data']), 1)
         self.assertEqual(response.data['data'][0]['user']['id'], self.regular_user.id)
    
-    @mock.patch('forms.views.notify_admin_of_submission')
-    def test_create_submission_with_data(self, mock_celery_task):
+    def test_create_submission_with_data(self):
         """Authenticated user can submit a form with only data."""
         response = self.client.post(self.submission_list_url, self.submission_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Submission.objects.count(), 1)
         self.assertEqual(Submission.objects.first().user, self.regular_user)
       
-        mock_celery_task.delay.assert_called_once()
+        self.assertEqual(OutboxMessage.objects.filter(topic='submission.created').count(), 1)
         
-    @mock.patch('forms.views.notify_admin_of_submission')
-    def test_create_submission_with_file_upload(self, mock_celery_task):
+    def test_create_submission_with_file_upload(self):
         """Authenticated user can submit a form with data and a file."""
         
         mock_file = SimpleUploadedFile(
@@ -443,7 +464,7 @@ class SubmissionAPITest(BaseAPITestSetup):
         self.assertEqual(Document.objects.count(), 1)
         self.assertIn('uploads', Document.objects.first().file.name)
        
-        mock_celery_task.delay.assert_called_once()
+        self.assertEqual(OutboxMessage.objects.filter(topic='submission.created').count(), 1)
 
     def test_create_submission_unauthenticated_denied(self):
         """Unauthenticated user cannot submit a form (IsAuthenticated check)."""
@@ -458,4 +479,2258 @@ class SubmissionAPITest(BaseAPITestSetup):
         invalid_data['form_id'] = 9999 
         response = self.client.post(self.submission_list_url, invalid_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn('form_id', response.data['data'])
\ No newline at end of file
+        self.assertIn('form_id', response.data['data'])
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# SCHEMA CACHE TESTS
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class FormSchemaCacheTest(BaseAPITestSetup):
+    """Tests for the compiled form schema cache."""
+
+    def setUp(self):
+        super().setUp()
+        schema_cache.clear()
+        self.detail_url = reverse('form-retrieve-update-destroy', kwargs={'pk': self.form.id})
+
+    def test_schema_compiles_ordered_fields_and_rules(self):
+        """Fields come back ordered with parsed options and conditional rules."""
+        amount = Field.objects.create(form=self.form, name='amount', type='number', order=1, options={'min': 10, 'max': 20})
+        Field.objects.create(
+            form=self.form, name='collateral', type='text', order=2,
+            is_conditional=True, conditional_field=amount,
+            conditional_operator='greater_than', conditional_value='15'
+        )
+        schema = get_form_schema(self.form.id)
+
+        self.assertEqual(schema.key, (self.form.id, 1))
+        self.assertEqual([f.name for f in schema.fields], ['Image', 'name_field', 'amount', 'collateral'])
+        self.assertEqual(schema.field('amount').minimum, 10)
+        self.assertEqual(schema.field('amount').maximum, 20)
+        self.assertEqual(schema.field('collateral').condition.field_name, 'amount')
+        with self.assertRaises(TypeError):
+            schema.field('amount').options['min'] = 0
+
+    def test_detail_served_without_queries_when_warm(self):
+        """A warm form detail only costs its ETag lookup."""
+        self.client.get(self.detail_url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['data']['form_fields']), 2)
+
+    def test_field_change_invalidates_schema(self):
+        """Saving or deleting a field recompiles the schema on the next read."""
+        self.client.get(self.detail_url)
+        Field.objects.create(form=self.form, name='age', type='number')
+        response = self.client.get(self.detail_url)
+        self.assertEqual(len(response.data['data']['form_fields']), 3)
+
+        self.field_text.delete()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(len(response.data['data']['form_fields']), 2)
+
+    def test_rotated_shared_token_invalidates_local_copy(self):
+        """Another process rotating the shared revision token makes the local entry stale."""
+        first = get_form_schema(self.form.id)
+        cache.delete(REVISION_KEY.format(form_id=self.form.id))
+        self.assertIsNot(get_form_schema(self.form.id), first)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_unshared_revisions_expire_local_copies(self):
+        """With tokens in local memory, other processes only catch up once the entry is old enough."""
+        local = FormSchemaCache(local_ttl=5)
+        first = local.get(self.form.id)
+        self.assertTrue(local.process_local)
+        self.assertIs(local.get(self.form.id), first)
+        with mock.patch('forms.schema.time') as clock:
+            clock.monotonic.return_value = local._compiled_at[first.key] + 5
+            self.assertIsNot(local.get(self.form.id), first)
+
+    def test_lru_is_bounded(self):
+        """The cache never holds more than maxsize schemas."""
+        small_cache = FormSchemaCache(maxsize=2)
+        forms = [self.form] + [Form.objects.create(name=f'Form {i}') for i in range(3)]
+        for form in forms:
+            small_cache.get(form.id)
+        self.assertEqual(len(small_cache), 2)
+
+    def test_missing_form_is_404(self):
+        """Unknown form ids still 404."""
+        url = reverse('form-retrieve-update-destroy', kwargs={'pk': 9999})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# VALIDATION ENGINE TESTS
+
+class SubmissionValidationTest(BaseAPITestSetup):
+    """Tests for the compiled submission validator."""
+
+    def setUp(self):
+        super().setUp()
+        schema_cache.clear()
+        self.income = Field.objects.create(
+            form=self.form, name='income', type='number', is_required=True, options={'min': 1000, 'max': 100000}
+        )
+        Field.objects.create(form=self.form, name='dob', type='date', options={'max': '2007-01-01'})
+        Field.objects.create(form=self.form, name='plan', type='dropdown', options=['basic', 'premium'])
+        Field.objects.create(form=self.form, name='terms', type='checkbox', is_required=True)
+        Field.objects.create(
+            form=self.form, name='employer', type='text', is_required=True,
+            is_conditional=True, conditional_field=self.income,
+            conditional_operator='greater_than', conditional_value='50000'
+        )
+        self.validator = get_form_schema(self.form.id).validator
+        self.valid = {'name_field': 'Jane', 'income': 20000, 'dob': '1990-05-01', 'plan': 'basic', 'terms': True}
+
+    def test_valid_payload(self):
+        """A payload matching every rule has no errors."""
+        self.assertEqual(self.validator.validate(self.valid), {})
+
+    def test_all_errors_returned_at_once(self):
+        """Type, range, choice and required errors are reported together."""
+        errors = self.validator.validate({'income': 500, 'dob': '2010-01-01', 'plan': 'gold', 'name_field': 5})
+        self.assertEqual(set(errors), {'income', 'dob', 'plan', 'terms', 'name_field'})
+        self.assertIn('greater than or equal to 1000', errors['income'][0])
+
+    def test_numeric_strings_are_accepted(self):
+        """Numbers posted as strings (multipart forms) are still numbers."""
+        self.assertEqual(self.validator.validate({**self.valid, 'income': '25000'}), {})
+        self.assertIn('income', self.validator.validate({**self.valid, 'income': 'lots'}))
+
+    def test_conditional_field_required_only_when_visible(self):
+        """A required conditional field is only enforced when its condition holds."""
+        self.assertNotIn('employer', self.validator.validate({**self.valid, 'income': 40000}))
+        self.assertIn('employer', self.validator.validate({**self.valid, 'income': 60000}))
+
+    def test_invalid_patterns_are_rejected(self):
+        """A pattern that is not a regular expression is refused when the field is saved."""
+        self.authenticate_user(self.admin_user)
+        field = {'form': self.form.id, 'name': 'iban', 'type': 'text', 'options': {'pattern': '[A-Z'}}
+        response = self.client.post(self.field_list_url, field, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pattern', response.data['data']['options'])
+        self.assertFalse(Field.objects.filter(name='iban').exists())
+
+    def test_stored_invalid_pattern_fails_only_its_field(self):
+        """A bad pattern saved before it was checked reports an error on that field alone."""
+        Field.objects.create(form=self.form, name='iban', type='text', options={'pattern': '[A-Z'})
+        validator = get_form_schema(self.form.id).validator
+        self.assertEqual(set(validator.validate({**self.valid, 'iban': 'DE00'})), {'iban'})
+        self.assertEqual(validator.validate(self.valid), {})
+
+    def test_batch_validation(self):
+        """validate_many returns one result per payload."""
+        results = self.validator.validate_many([self.valid, {}, self.valid])
+        self.assertEqual([bool(errors) for errors in results], [False, True, False])
+
+    def test_api_rejects_invalid_submission(self):
+        """The submission endpoint returns every data error and stores nothing."""
+        self.authenticate_user(self.regular_user)
+        payload = {'form_id': self.form.id, 'data': {'income': 'abc'}}
+        response = self.client.post(self.submission_list_url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['data']['data']), {'income', 'terms'})
+        self.assertEqual(Submission.objects.count(), 0)
+
+    def test_api_parses_json_string_data(self):
+        """Answers posted as a JSON string are stored as an object."""
+        self.authenticate_user(self.regular_user)
+        payload = {'form_id': self.form.id, 'data': json.dumps(self.valid)}
+        response = self.client.post(self.submission_list_url, payload, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Submission.objects.get().data['income'], 20000)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# CONDITIONAL GRAPH TESTS
+
+class ConditionGraphTest(BaseAPITestSetup):
+    """Tests for conditional visibility chains, cycle detection and incremental evaluation."""
+
+    def setUp(self):
+        super().setUp()
+        schema_cache.clear()
+        # has_loan -> loan_amount -> collateral -> collateral_value, plus an unrelated field
+        self.has_loan = Field.objects.create(form=self.form, name='has_loan', type='checkbox', order=1)
+        self.loan_amount = Field.objects.create(
+            form=self.form, name='loan_amount', type='number', order=2, is_required=True,
+            is_conditional=True, conditional_field=self.has_loan,
+            conditional_operator='equal_to', conditional_value='true'
+        )
+        self.collateral = Field.objects.create(
+            form=self.form, name='collateral', type='text', order=3, is_required=True,
+            is_conditional=True, conditional_field=self.loan_amount,
+            conditional_operator='greater_than', conditional_value='50000'
+        )
+        self.collateral_value = Field.objects.create(
+            form=self.form, name='collateral_value', type='number', order=4, is_required=True,
+            is_conditional=True, conditional_field=self.collateral,
+            conditional_operator='equal_to', conditional_value='house'
+        )
+        self.schema = get_form_schema(self.form.id)
+
+    def test_topological_order(self):
+        """Controllers always come before the fields depending on them."""
+        order = self.schema.graph.order
+        self.assertLess(order.index('has_loan'), order.index('loan_amount'))
+        self.assertLess(order.index('loan_amount'), order.index('collateral'))
+        self.assertLess(order.index('collateral'), order.index('collateral_value'))
+
+    def test_deep_chain_visibility(self):
+        """A hidden controller hides the whole chain below it."""
+        states = self.schema.graph.evaluate({'has_loan': False, 'loan_amount': 90000, 'collateral': 'house'})
+        self.assertFalse(states['loan_amount'].visible)
+        self.assertFalse(states['collateral_value'].visible)
+
+        states = self.schema.graph.evaluate({'has_loan': True, 'loan_amount': 90000, 'collateral': 'house'})
+        self.assertTrue(states['collateral_value'].visible)
+        self.assertTrue(states['collateral_value'].required)
+        self.assertIn('collateral_value', self.schema.validator.validate(
+            {'name_field': 'x', 'has_loan': True, 'loan_amount': 90000, 'collateral': 'house'}
+        ))
+
+    def test_incremental_reevaluation_touches_only_subgraph(self):
+        """Changing one answer re-evaluates only that field and its dependents."""
+        payload = {'has_loan': True, 'loan_amount': 10000}
+        states = self.schema.graph.evaluate(payload)
+        self.assertFalse(states['collateral'].visible)
+
+        payload['loan_amount'] = 80000
+        new_states, affected = self.schema.graph.reevaluate(payload, ['loan_amount'], states)
+        self.assertEqual(affected, {'loan_amount', 'collateral', 'collateral_value'})
+        self.assertTrue(new_states['collateral'].visible)
+
+        errors, _, affected = self.schema.validator.validate_partial(payload, ['loan_amount'])
+        self.assertEqual(set(errors), {'collateral'})
+        self.assertNotIn('name_field', affected)
+
+    def test_graph_detects_cycles(self):
+        """A cyclic set of rules cannot be compiled into a graph."""
+        a = FieldSchema(id=1, name='a', type='text', is_required=False, order=0, options={},
+                        condition=ConditionRule(2, 'b', 'equal_to', 'x'))
+        b = FieldSchema(id=2, name='b', type='text', is_required=False, order=1, options={},
+                        condition=ConditionRule(1, 'a', 'equal_to', 'y'))
+        with self.assertRaises(ConditionCycleError):
+            ConditionGraph([a, b])
+
+    def test_cycle_rejected_at_save_time(self):
+        """Updating a field so that it closes a cycle is rejected by the API."""
+        self.authenticate_user(self.admin_user)
+        url = reverse('field-retrieve-update-destroy', kwargs={'pk': self.has_loan.id})
+        response = self.client.put(url, {'conditional_field_id': self.collateral_value.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('conditional_field', response.data['data'])
+
+    def test_cross_form_link_rejected(self):
+        """A field cannot depend on a field of another form."""
+        other = Form.objects.create(name='Other Form')
+        foreign = Field.objects.create(form=other, name='foreign', type='text')
+        self.has_loan.conditional_field = foreign
+        with self.assertRaises(DjangoValidationError):
+            self.has_loan.full_clean()
+
+    def test_partial_validation_endpoint(self):
+        """The validate endpoint reports errors and visibility for the affected fields."""
+        self.authenticate_user(self.regular_user)
+        url = reverse('form-validate', kwargs={'pk': self.form.id})
+        payload = {'data': {'has_loan': True, 'loan_amount': 80000}, 'changed': ['loan_amount']}
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['data']['errors']), {'collateral'})
+        self.assertTrue(response.data['data']['fields']['collateral']['visible'])
+        self.assertNotIn('name_field', response.data['data']['fields'])
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# QUERY COUNT TESTS
+
+class ListQueryCountTest(BaseAPITestSetup):
+    """List endpoints run a constant number of queries however much data there is."""
+
+    def seed(self, forms, fields_per_form, submissions_per_form):
+        for i in range(forms):
+            form = Form.objects.create(name=f'Seeded {Form.objects.count()}-{i}', created_by=self.admin_user)
+            previous = None
+            for j in range(fields_per_form):
+                previous = Field.objects.create(
+                    form=form, name=f'f{j}', type='text', order=j,
+                    is_conditional=previous is not None, conditional_field=previous,
+                    conditional_operator='equal_to' if previous else None, conditional_value='x'
+                )
+            Submission.objects.bulk_create([
+                Submission(form=form, user=self.regular_user, data={'f0': 'x'})
+                for _ in range(submissions_per_form)
+            ])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_list_query_counts_are_constant(self):
+        self.authenticate_user(self.regular_user)
+        urls = [self.form_list_url, self.field_list_url, self.submission_list_url, self.my_submissions_url]
+
+        self.seed(forms=2, fields_per_form=2, submissions_per_form=1)
+        small = [self.count_queries(url) for url in urls]
+        self.seed(forms=10, fields_per_form=6, submissions_per_form=5)
+        large = [self.count_queries(url) for url in urls]
+
+        self.assertEqual(small, large)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# QUERY BUDGET TESTS
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class QueryBudgetTest(QueryBudgetTestMixin, BaseAPITestSetup):
+    """Every forms endpoint stays within its declared query budget as data grows."""
+
+    FORMS = 300
+    FIELDS_PER_FORM = 8
+    SUBMISSIONS = 20000
+
+    def seed(self, forms, fields_per_form, submissions):
+        """Bulk inserts realistic volumes of forms, fields and submissions."""
+        offset = Form.objects.count()
+        created = Form.objects.bulk_create([
+            Form(name=f'Seeded form {offset + i}', created_by=self.admin_user) for i in range(forms)
+        ])
+        Field.objects.bulk_create([
+            Field(form=form, name=f'question_{j}', type='number' if j % 2 else 'text', order=j)
+            for form in created for j in range(fields_per_form)
+        ], batch_size=2000)
+        users = [self.regular_user, self.admin_user]
+        Submission.objects.bulk_create([
+            Submission(form=created[i % forms], user=users[i % 2], data={'question_0': 'answer', 'question_1': i})
+            for i in range(submissions)
+        ], batch_size=2000)
+
+    def measure(self):
+        """Query counts of every read endpoint, checked against their budgets."""
+        submission = Submission.objects.filter(user=self.regular_user).first()
+        requests = [
+            ('get', self.form_list_url, None),
+            ('get', reverse('form-retrieve-update-destroy', kwargs={'pk': self.form.id}), None),
+            ('get', self.field_list_url, None),
+            ('get', reverse('field-retrieve-update-destroy', kwargs={'pk': self.field_text.id}), None),
+            ('get', self.submission_list_url, self.regular_user),
+            ('get', reverse('submission-retrieve-update-destroy', kwargs={'pk': submission.id}), self.regular_user),
+            ('get', self.my_submissions_url, self.regular_user),
+        ]
+        counts = []
+        for method, url, user in requests:
+            schema_cache.clear()
+            self.client.force_authenticate(user=user)
+            response = self.request_within_budget(method, url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(response.query_count)
+        return counts
+
+    def test_read_budgets_constant_as_data_grows(self):
+        self.seed(forms=3, fields_per_form=2, submissions=6)
+        small = self.measure()
+        self.seed(forms=self.FORMS, fields_per_form=self.FIELDS_PER_FORM, submissions=self.SUBMISSIONS)
+        large = self.measure()
+        self.assertEqual(small, large)
+
+    def test_write_budgets(self):
+        self.authenticate_user(self.admin_user)
+        response = self.request_within_budget('post', self.form_list_url, {'name': 'Budget Form'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.request_within_budget(
+            'post', self.field_list_url, {'form': self.form.id, 'name': 'age', 'type': 'number'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.authenticate_user(self.regular_user)
+        response = self.request_within_budget('post', self.submission_list_url, self.submission_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(QUERY_BUDGET_RAISE=True, MIDDLEWARE=['core.query_budget.QueryBudgetMiddleware'] + settings.MIDDLEWARE)
+    def test_middleware_raises_in_test_mode(self):
+        with mock.patch.object(FormCreateListAPIView, 'query_budget', {'GET': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(self.form_list_url)
+
+    @override_settings(QUERY_BUDGET_RAISE=False, MIDDLEWARE=['core.query_budget.QueryBudgetMiddleware'] + settings.MIDDLEWARE)
+    def test_middleware_logs_in_production_mode(self):
+        with mock.patch.object(FormCreateListAPIView, 'query_budget', {'GET': 0}):
+            with self.assertLogs('core.query_budget', level='WARNING') as logs:
+                response = self.client.get(self.form_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('against a budget of 0', logs.output[0])
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# PAGINATION TESTS
+
+class SubmissionPaginationTest(BaseAPITestSetup):
+    """Tests for keyset pagination of the submission listings."""
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_user(self.regular_user)
+        same_time = timezone.now()
+        # several rows share a timestamp so the id tie-breaker is exercised
+        self.submissions = Submission.objects.bulk_create([
+            Submission(form=self.form, user=self.regular_user, data={'n': i}) for i in range(7)
+        ])
+        Submission.objects.update(submitted_at=same_time)
+
+    def collect(self, url, page_size):
+        ids, cursor, pages = [], None, 0
+        while True:
+            params = {'page_size': page_size}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(row['id'] for row in response.data['data'])
+            cursor, pages = response.data['next'], pages + 1
+            if cursor is None:
+                return ids, pages
+
+    def test_pages_cover_every_row_once_in_order(self):
+        ids, pages = self.collect(self.submission_list_url, page_size=3)
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, sorted((s.id for s in self.submissions), reverse=True))
+
+    def test_cursor_stable_under_concurrent_inserts(self):
+        first = self.client.get(self.submission_list_url, {'page_size': 3}).data
+        Submission.objects.create(form=self.form, user=self.regular_user, data={'n': 'new'})
+        second = self.client.get(self.submission_list_url, {'page_size': 3, 'cursor': first['next']}).data
+        first_ids = [row['id'] for row in first['data']]
+        second_ids = [row['id'] for row in second['data']]
+        self.assertFalse(set(first_ids) & set(second_ids))
+        self.assertLess(max(second_ids), min(first_ids))
+
+    def test_page_size_is_capped(self):
+        with override_settings(SUBMISSION_MAX_PAGE_SIZE=2):
+            response = self.client.get(self.my_submissions_url, {'page_size': 500})
+        self.assertEqual(len(response.data['data']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_cursor_rejected(self):
+        response = self.client.get(self.submission_list_url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_later_pages_cost_the_same_queries(self):
+        with CaptureQueriesContext(connection) as first_page:
+            first = self.client.get(self.submission_list_url, {'page_size': 2}).data
+        with CaptureQueriesContext(connection) as later_page:
+            self.client.get(self.submission_list_url, {'page_size': 2, 'cursor': first['next']})
+        self.assertEqual(len(first_page), len(later_page))
+        self.assertFalse(any('OFFSET' in query['sql'].upper() for query in later_page))
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# SPARSE FIELDSET TESTS
+
+class SparseFieldsetTest(BaseAPITestSetup):
+    """Tests for ?view=summary, ?fields= and ?expand= on form and submission payloads."""
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_user(self.regular_user)
+        Submission.objects.bulk_create([
+            Submission(form=self.form, user=self.regular_user, data={'name_field': f'client {i}'}) for i in range(3)
+        ])
+
+    def get_rows(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['data'], queries
+
+    def test_submission_summary_is_compact(self):
+        rows, queries = self.get_rows(self.submission_list_url, {'view': 'summary'})
+        row = rows[0]
+        self.assertEqual(row['form'], {'id': self.form.id, 'name': 'Test Form', 'version': 1})
+        self.assertEqual(row['user'], self.regular_user.id)
+        self.assertNotIn('documents', row)
+        self.assertEqual(row['data'], {'name_field': 'client 2'})
+        # one query for the page (form joined), nothing prefetched
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"forms_form"."description"', queries[0]['sql'])
+
+    def test_fields_drop_data_and_its_column(self):
+        rows, queries = self.get_rows(self.my_submissions_url, {'view': 'summary', 'fields': 'id,form,status'})
+        self.assertEqual(set(rows[0]), {'id', 'form', 'status'})
+        self.assertNotIn('"forms_submission"."data"', queries[-1]['sql'])
+
+    def test_expand_restores_nested_objects(self):
+        rows, _ = self.get_rows(self.submission_list_url, {'view': 'summary', 'expand': 'form,user,documents'})
+        self.assertEqual(rows[0]['user']['email'], self.regular_user.email)
+        self.assertIn('form_fields', rows[0]['form'])
+        self.assertEqual(rows[0]['documents'], [])
+
+    def test_fields_without_summary_keep_full_nesting(self):
+        rows, _ = self.get_rows(self.submission_list_url, {'fields': 'id,form'})
+        self.assertEqual(set(rows[0]), {'id', 'form'})
+        self.assertEqual(len(rows[0]['form']['form_fields']), 2)
+
+    def test_default_representation_unchanged(self):
+        rows, _ = self.get_rows(self.submission_list_url, {})
+        self.assertIn('documents', rows[0])
+        self.assertEqual(rows[0]['user']['email'], self.regular_user.email)
+
+    def test_form_summary(self):
+        rows, queries = self.get_rows(self.form_list_url, {'view': 'summary'})
+        self.assertNotIn('form_fields', rows[0])
+        self.assertEqual(rows[0]['created_by'], self.admin_user.id)
+        # the ETag lookup and the forms themselves, nothing prefetched
+        self.assertEqual(len(queries), 2)
+
+        detail = self.client.get(reverse('form-retrieve-update-destroy', kwargs={'pk': self.form.id}), {'fields': 'id,name'})
+        self.assertEqual(detail.data['data'], {'id': self.form.id, 'name': 'Test Form'})
+
+    def test_unknown_view_rejected(self):
+        response = self.client.get(self.submission_list_url, {'view': 'tiny'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# STREAMING TESTS
+
+class StreamingListTest(BaseAPITestSetup):
+    """Tests for ?stream=json and ?stream=ndjson on the list endpoints."""
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_user(self.admin_user)
+        Submission.objects.bulk_create([
+            Submission(form=self.form, user=self.regular_user, data={'name_field': f'client {i}'}) for i in range(7)
+        ])
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_json_stream_matches_regular_response(self):
+        response = self.client.get(self.submission_list_url, {'stream': 'json'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        body = json.loads(self.read(response))
+        regular = self.client.get(self.submission_list_url).json()
+        self.assertEqual(body['message'], 'Success')
+        self.assertEqual(body['data'], regular['data'])
+
+    def test_ndjson_stream_writes_one_row_per_line(self):
+        response = self.client.get(self.submission_list_url, {'stream': 'ndjson', 'view': 'summary'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.read(response).splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(json.loads(lines[0])['form']['name'], 'Test Form')
+
+    def test_stream_is_not_paginated(self):
+        response = self.client.get(self.submission_list_url, {'stream': 'json', 'page_size': 2})
+        self.assertEqual(len(json.loads(self.read(response))['data']), 7)
+
+    def test_empty_stream_is_valid_json(self):
+        response = self.client.get(self.my_submissions_url, {'stream': 'json'})
+        self.assertEqual(json.loads(self.read(response)), {'message': 'Success', 'data': []})
+
+    def test_rows_are_read_in_chunks(self):
+        def prefetches(chunk_size):
+            with override_settings(STREAM_CHUNK_SIZE=chunk_size):
+                response = self.client.get(self.submission_list_url, {'stream': 'ndjson'})
+                with CaptureQueriesContext(connection) as queries:
+                    self.read(response)
+            return sum('"forms_document"' in query['sql'] for query in queries)
+
+        # related rows are prefetched once per chunk, not once for the whole result
+        self.assertEqual(prefetches(100), 1)
+        self.assertEqual(prefetches(3), 3)
+
+    def test_form_and_field_lists_stream(self):
+        forms = json.loads(self.read(self.client.get(self.form_list_url, {'stream': 'json'})))
+        self.assertEqual(forms['data'][0]['name'], 'Test Form')
+        fields = self.read(self.client.get(self.field_list_url, {'stream': 'ndjson'})).splitlines()
+        self.assertEqual(len(fields), 2)
+
+    def test_unknown_stream_format_rejected(self):
+        response = self.client.get(self.submission_list_url, {'stream': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# BULK INGEST TESTS
+
+class BulkIngestTest(QueryBudgetTestMixin, BaseAPITestSetup):
+    """Tests for POST submissions/bulk/ with NDJSON and JSON array bodies."""
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_user(self.regular_user)
+        self.url = reverse('submission-bulk-ingest')
+        self.field_text.is_required = True
+        self.field_text.save()
+
+    def ndjson(self, lines):
+        return self.client.post(self.url, '\n'.join(lines), content_type='application/x-ndjson')
+
+    def test_json_array_all_created(self):
+        records = [{'form_id': self.form.id, 'data': {'name_field': f'client {i}'}, 'reference': f'r{i}'} for i in range(5)]
+        response = self.client.post(self.url, records, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.data['data']['results']
+        self.assertEqual([result['reference'] for result in results], [f'r{i}' for i in range(5)])
+        self.assertEqual(Submission.objects.filter(user=self.regular_user).count(), 5)
+        self.assertEqual(Submission.objects.get(pk=results[3]['id']).data, {'name_field': 'client 3'})
+
+    def test_ndjson_reports_each_record(self):
+        response = self.ndjson([
+            json.dumps({'form_id': self.form.id, 'data': {'name_field': 'ok'}}),
+            '',
+            '{not json',
+            json.dumps({'form_id': self.form.id, 'data': {}}),
+            json.dumps({'form_id': 999999, 'data': {'name_field': 'x'}}),
+            json.dumps(['not', 'an', 'object']),
+        ])
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data['data']['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'invalid', 'invalid', 'invalid', 'invalid'])
+        self.assertIn('Line 3', results[1]['errors']['non_field_errors'][0])
+        self.assertEqual(results[2]['errors'], {'data': {'name_field': ['This field is required.']}})
+        self.assertEqual(results[3]['errors'], {'form_id': ['Form does not exist.']})
+        self.assertEqual(Submission.objects.count(), 1)
+
+    def test_nothing_valid_is_bad_request(self):
+        response = self.client.post(self.url, [{'form_id': 'x'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['data']['failed'], 1)
+
+    def test_body_must_be_a_list(self):
+        response = self.client.post(self.url, {'form_id': self.form.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BULK_INGEST_MAX_RECORDS=2)
+    def test_record_limit(self):
+        records = [{'form_id': self.form.id, 'data': {'name_field': 'x'}}] * 3
+        response = self.client.post(self.url, records, format='json')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(Submission.objects.exists())
+
+    def test_batches_share_inserts(self):
+        records = [json.dumps({'form_id': self.form.id, 'data': {'name_field': str(i)}}) for i in range(25)]
+        with override_settings(BULK_INGEST_BATCH_SIZE=10):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.ndjson(records)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "forms_submission"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_within_query_budget(self):
+        schema_cache.clear()
+        records = [{'form_id': self.form.id, 'data': {'name_field': str(i)}} for i in range(50)]
+        response = self.request_within_budget('post', self.url, records, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# IMPORT / EXPORT TESTS
+
+class FormTransferTest(QueryBudgetTestMixin, BaseAPITestSetup):
+    """Tests for whole-form import and export."""
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_user(self.admin_user)
+        self.import_url = reverse('form-import')
+
+    def definition(self, name='KYC', fields=60):
+        form_fields = [
+            {'name': f'question_{i}', 'type': 'text', 'order': i, 'is_required': i % 2 == 0}
+            for i in range(fields)
+        ]
+        form_fields[1].update({
+            'is_conditional': True, 'conditional_field': 'question_0',
+            'conditional_operator': 'equal_to', 'conditional_value': 'yes',
+        })
+        form_fields[2].update({
+            'is_conditional': True, 'conditional_field': 'question_1',
+            'conditional_operator': 'not_equal_to', 'conditional_value': 'no',
+        })
+        return {'name': name, 'description': 'Know your customer', 'form_fields': form_fields}
+
+    def test_import_creates_form_fields_and_links(self):
+        response = self.client.post(self.import_url, self.definition(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        form = Form.objects.get(pk=response.data['data']['id'])
+        self.assertEqual(form.created_by, self.admin_user)
+        self.assertEqual(form.fields.count(), 60)
+        dependent = form.fields.get(name='question_2')
+        self.assertEqual(dependent.conditional_field.name, 'question_1')
+        self.assertEqual(dependent.conditional_field.form_id, form.id)
+        schema = get_form_schema(form.id)
+        self.assertEqual(schema.field('question_1').condition.field_name, 'question_0')
+
+    def test_import_query_count_is_constant(self):
+        small = self.request_within_budget('post', self.import_url, self.definition('Small', fields=3), format='json')
+        large = self.request_within_budget('post', self.import_url, self.definition('Large', fields=60), format='json')
+        self.assertEqual(large.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(small.query_count, large.query_count)
+
+    def test_export_round_trips(self):
+        self.client.post(self.import_url, self.definition(), format='json')
+        form = Form.objects.get(name='KYC')
+        response = self.request_within_budget('get', reverse('form-export', kwargs={'pk': form.id}))
+        document = response.data['data']
+        self.assertEqual([field['name'] for field in document['form_fields']][:3], ['question_0', 'question_1', 'question_2'])
+        self.assertEqual(document['form_fields'][2]['conditional_field'], 'question_1')
+
+        document = json.loads(json.dumps(document))
+        document['name'] = 'KYC copy'
+        response = self.client.post(self.import_url, document, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        copy = self.client.get(reverse('form-export', kwargs={'pk': response.data['data']['id']})).data['data']
+        self.assertEqual(copy['form_fields'], document['form_fields'])
+
+    def test_invalid_links_rejected_without_writes(self):
+        document = self.definition(fields=3)
+        document['form_fields'][0].update({'conditional_field': 'question_2', 'conditional_operator': 'equal_to'})
+        response = self.client.post(self.import_url, document, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cycle', response.data['data']['form_fields'][0])
+
+        document = self.definition(fields=3)
+        document['form_fields'][0]['conditional_field'] = 'missing'
+        response = self.client.post(self.import_url, document, format='json')
+        self.assertIn('unknown field', response.data['data']['form_fields'][0])
+
+        document = self.definition(fields=3)
+        document['form_fields'][2]['name'] = 'question_0'
+        response = self.client.post(self.import_url, document, format='json')
+        self.assertIn('Duplicate', response.data['data']['form_fields'][0])
+        self.assertFalse(Form.objects.filter(name='KYC').exists())
+
+    def test_regular_user_cannot_import(self):
+        self.authenticate_user(self.regular_user)
+        response = self.client.post(self.import_url, self.definition(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_management_commands_round_trip(self):
+        from django.core.management import call_command
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'form.json')
+            call_command('export_form', self.form.id, output=path, stdout=mock.MagicMock())
+            call_command('import_form', path, name='Test Form copy', created_by=self.admin_user.email, stdout=mock.MagicMock())
+        copy = Form.objects.get(name='Test Form copy')
+        self.assertEqual(sorted(copy.fields.values_list('name', flat=True)), ['Image', 'name_field'])
+        self.assertEqual(copy.created_by, self.admin_user)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# SNAPSHOT TESTS
+
+class FormSnapshotTest(QueryBudgetTestMixin, BaseAPITestSetup):
+    """Tests for published form snapshots and the submissions pinned to them."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        snapshot_cache.clear()
+        self.publish_url = reverse('form-publish', kwargs={'pk': self.form.id})
+
+    def submit(self, answer='John Doe'):
+        self.authenticate_user(self.regular_user)
+        response = self.client.post(
+            self.submission_list_url, {'form_id': self.form.id, 'data': {'name_field': answer}}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Submission.objects.get(pk=response.data['data']['id'])
+
+    def test_publish_creates_versions_only_on_change(self):
+        self.authenticate_user(self.admin_user)
+        first = self.client.post(self.publish_url)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data['data']['version'], 1)
+
+        again = self.client.post(self.publish_url)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data['data']['id'], first.data['data']['id'])
+
+        Field.objects.create(form=self.form, name='income', type='number')
+        second = self.client.post(self.publish_url)
+        self.assertEqual(second.data['data']['version'], 2)
+        self.form.refresh_from_db()
+        self.assertEqual(self.form.version, 2)
+        self.assertEqual(get_form_schema(self.form.id).version, 2)
+
+    def test_submission_pinned_to_definition_it_was_validated_against(self):
+        old = self.submit()
+        self.assertIsNotNone(old.snapshot_id)
+        self.assertEqual(self.submit('Jane').snapshot_id, old.snapshot_id)
+
+        self.field_text.name = 'full_name'
+        self.field_text.save()
+        Field.objects.create(form=self.form, name='income', type='number')
+
+        detail = self.client.get(reverse('submission-retrieve-update-destroy', kwargs={'pk': old.id})).data['data']
+        self.assertEqual(detail['snapshot'], old.snapshot_id)
+        self.assertEqual(detail['form']['version'], 1)
+        self.assertEqual(sorted(field['name'] for field in detail['form']['form_fields']), ['Image', 'name_field'])
+
+        self.authenticate_user(self.regular_user)
+        response = self.client.post(
+            self.submission_list_url, {'form_id': self.form.id, 'data': {'full_name': 'New'}}, format='json'
+        )
+        new = Submission.objects.get(pk=response.data['data']['id'])
+        self.assertNotEqual(new.snapshot_id, old.snapshot_id)
+        self.assertEqual(new.snapshot.version, 2)
+
+    def test_snapshots_served_without_reading_fields(self):
+        submission = self.submit()
+        schema = get_snapshot_schema(submission.snapshot_id)
+        self.assertEqual(schema.validator.validate({'name_field': 'x'}), {})
+
+        snapshot_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            get_snapshot_schemas([submission.snapshot_id])
+        self.assertEqual(len(queries), 0)  # still in the shared cache
+
+        url = reverse('snapshot-retrieve', kwargs={'pk': submission.snapshot_id})
+        response = self.request_within_budget('get', url)
+        self.assertEqual(response.data['data']['name'], 'Test Form')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('snapshot-retrieve', kwargs={'pk': 999999})).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_loads_page_snapshots_in_one_query(self):
+        self.submit()
+        Field.objects.create(form=self.form, name='income', type='number')
+        self.submit()
+        cache.clear()
+        snapshot_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.client.get(self.my_submissions_url).data['data']
+        self.assertEqual({row['form']['version'] for row in rows}, {1, 2})
+        self.assertEqual(sum('"forms_formsnapshot"' in query['sql'] for query in queries), 1)
+
+    def test_bulk_ingest_pins_snapshot(self):
+        self.authenticate_user(self.regular_user)
+        records = [{'form_id': self.form.id, 'data': {'name_field': str(i)}} for i in range(3)]
+        self.client.post(reverse('submission-bulk-ingest'), records, format='json')
+        self.assertEqual(Submission.objects.filter(snapshot__isnull=True).count(), 0)
+        self.assertEqual(FormSnapshot.objects.filter(form=self.form).count(), 1)
+
+    def test_form_with_snapshots_can_be_deleted(self):
+        self.submit()
+        self.authenticate_user(self.admin_user)
+        response = self.client.delete(reverse('form-retrieve-update-destroy', kwargs={'pk': self.form.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(FormSnapshot.objects.exists())
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# CONDITIONAL GET TESTS
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class ConditionalGetTest(BaseAPITestSetup):
+    """Tests for ETag / Last-Modified handling on form and field reads."""
+
+    def setUp(self):
+        super().setUp()
+        self.form_url = reverse('form-retrieve-update-destroy', kwargs={'pk': self.form.id})
+        self.field_url = reverse('field-retrieve-update-destroy', kwargs={'pk': self.field_text.id})
+
+    def revalidate(self, url, etag, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        return response, queries
+
+    def test_unchanged_form_returns_304_with_one_query(self):
+        for url in (self.form_url, self.form_list_url, self.field_url, self.field_list_url):
+            first = self.client.get(url)
+            self.assertTrue(first.has_header('ETag'))
+            self.assertTrue(first.has_header('Last-Modified'))
+            self.assertIn('no-cache', first['Cache-Control'])
+
+            response, queries = self.revalidate(url, first['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, url)
+            self.assertEqual(len(queries), 1)
+
+    def test_serializer_not_run_on_304(self):
+        etag = self.client.get(self.form_list_url)['ETag']
+        with mock.patch.object(FormCreateListAPIView, 'serializer_class') as serializer:
+            response = self.client.get(self.form_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        serializer.assert_not_called()
+
+    def test_field_change_moves_form_etag(self):
+        etags = [self.client.get(url)['ETag'] for url in (self.form_url, self.form_list_url, self.field_url)]
+        revision = Form.objects.get(pk=self.form.id).fields_revision
+        self.field_text.is_required = True
+        self.field_text.save()
+        self.assertEqual(Form.objects.get(pk=self.form.id).fields_revision, revision + 1)
+        for url, etag in zip((self.form_url, self.form_list_url, self.field_url), etags):
+            response, _ = self.revalidate(url, etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+
+    def test_form_deletion_moves_list_etag(self):
+        other = Form.objects.create(name='Other')
+        etag = self.client.get(self.form_list_url)['ETag']
+        Form.objects.filter(pk=other.pk).delete()
+        response, _ = self.revalidate(self.form_list_url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_representations_have_their_own_etags(self):
+        full = self.client.get(self.form_list_url)['ETag']
+        summary = self.client.get(self.form_list_url, {'view': 'summary'})['ETag']
+        self.assertNotEqual(full, summary)
+        response, _ = self.revalidate(self.form_list_url, full, view='summary')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.form_url)['Last-Modified']
+        response = self.client.get(self.form_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_missing_form_is_404(self):
+        response = self.client.get(reverse('form-retrieve-update-destroy', kwargs={'pk': 999999}), HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# RESPONSE CACHE TESTS
+
+RESPONSE_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default-tests'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'responses-tests'},
+}
+
+
+@override_settings(CACHES=RESPONSE_CACHES, RESPONSE_CACHE_ALIAS='responses', RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTest(BaseAPITestSetup):
+    """Tests for the shared response cache on public form and field reads."""
+
+    def setUp(self):
+        super().setUp()
+        self.form_url = reverse('form-retrieve-update-destroy', kwargs={'pk': self.form.id})
+        self.field_url = reverse('field-retrieve-update-destroy', kwargs={'pk': self.field_text.id})
+        self.urls = (self.form_url, self.form_list_url, self.field_url, self.field_list_url)
+
+    def tearDown(self):
+        caches['responses'].clear()
+        super().tearDown()
+
+    def get(self, url, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **extra)
+        return response, len(queries)
+
+    def test_hits_cost_no_queries(self):
+        for url in self.urls:
+            first, _ = self.get(url)
+            second, queries = self.get(url)
+            self.assertEqual(queries, 0, url)
+            self.assertEqual(second.content, first.content)
+            self.assertEqual(second['ETag'], first['ETag'])
+            self.assertEqual(second['Content-Type'], 'application/json')
+
+            not_modified, queries = self.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(queries, 0)
+
+    def test_field_change_invalidates_only_its_form(self):
+        other = Form.objects.create(name='Other Form')
+        other_url = reverse('form-retrieve-update-destroy', kwargs={'pk': other.id})
+        for url in self.urls + (other_url,):
+            self.get(url)
+
+        self.field_text.is_required = True
+        self.field_text.save()
+
+        for url in self.urls:
+            response, queries = self.get(url)
+            self.assertGreater(queries, 0, url)
+        self.assertTrue(self.client.get(self.form_url).json()['data']['form_fields'][1]['is_required'])
+        self.assertEqual(self.get(other_url)[1], 0)
+
+    def test_form_change_invalidates_its_field_details(self):
+        self.get(self.field_url)
+        self.form.name = 'Renamed Form'
+        self.form.save()
+        response, queries = self.get(self.field_url)
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.json()['data']['form']['name'], 'Renamed Form')
+
+    def test_representations_cached_separately(self):
+        self.get(self.form_list_url)
+        summary, queries = self.get(self.form_list_url + '?view=summary')
+        self.assertGreater(queries, 0)
+        self.assertNotIn('form_fields', summary.json()['data'][0])
+
+    def test_streams_are_not_cached(self):
+        self.client.get(self.form_list_url, {'stream': 'json'})
+        response, queries = self.get(self.form_list_url + '?stream=json')
+        self.assertTrue(response.streaming)
+        b''.join(response.streaming_content)
+        self.assertGreater(queries, 0)
+
+    def test_waits_for_the_request_holding_the_key(self):
+        first, _ = self.get(self.form_url)
+        entry = {'body': first.content, 'content_type': 'application/json', 'headers': {'ETag': first['ETag']}}
+        caches['responses'].clear()
+        with mock.patch.object(response_cache, 'acquire', return_value=False), \
+                mock.patch.object(response_cache, 'wait', return_value=entry) as wait:
+            response, queries = self.get(self.form_url)
+        wait.assert_called_once()
+        self.assertEqual(queries, 0)
+        self.assertEqual(response.content, first.content)
+
+    @override_settings(RESPONSE_CACHE_LOCK_WAIT=0.1)
+    def test_renders_itself_when_the_holder_is_too_slow(self):
+        with mock.patch.object(response_cache, 'acquire', return_value=False):
+            response = self.client.get(self.form_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['name'], 'Test Form')
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# SUBMISSION FILTER TESTS
+
+class SubmissionFilterTest(BaseAPITestSetup):
+    """Tests for the data filters on the submission listings."""
+
+    def setUp(self):
+        super().setUp()
+        self.income = Field.objects.create(form=self.form, name='income', type='number')
+        Field.objects.create(form=self.form, name='city', type='text')
+        Field.objects.create(form=self.form, name='start', type='date')
+        Field.objects.create(form=self.form, name='agree', type='checkbox')
+        self.other_form = Form.objects.create(name='Other Form')
+        answers = [
+            {'income': 50000, 'city': 'Nairobi', 'start': '2025-01-10', 'agree': True},
+            {'income': '50000', 'city': 'Mombasa', 'start': '2025-03-01', 'agree': 'false'},
+            {'income': 120000.5, 'city': 'Nairobi', 'start': '2024-12-31', 'agree': False},
+            {'income': 'n/a', 'city': 'Kisumu'},
+        ]
+        self.submissions = [
+            Submission.objects.create(form=self.form, user=self.regular_user, data=data) for data in answers
+        ]
+        self.other = Submission.objects.create(form=self.other_form, user=self.regular_user, data={'income': 50000})
+        self.authenticate_user(self.admin_user)
+
+    def ids(self, url=None, **params):
+        response = self.client.get(url or self.submission_list_url, {'form': self.form.id, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return {item['id'] for item in response.data['data']}
+
+    def expected(self, *indexes):
+        return {self.submissions[index].id for index in indexes}
+
+    def test_form_and_status(self):
+        Submission.objects.filter(pk=self.submissions[0].pk).update(status='approved')
+        self.assertEqual(self.ids(), self.expected(0, 1, 2, 3))
+        self.assertEqual(self.ids(status='approved'), self.expected(0))
+
+    def test_equality_matches_typed_and_string_answers(self):
+        self.assertEqual(self.ids(**{'data.income': '50000'}), self.expected(0, 1))
+        self.assertEqual(self.ids(**{'data.city__eq': 'Nairobi'}), self.expected(0, 2))
+
+    def test_number_ranges_skip_answers_that_are_not_numbers(self):
+        self.assertEqual(self.ids(**{'data.income__gt': '50000'}), self.expected(2))
+        self.assertEqual(self.ids(**{'data.income__gte': '50000', 'data.income__lt': '100000'}), self.expected(0, 1))
+
+    def test_date_ranges(self):
+        self.assertEqual(self.ids(**{'data.start__gte': '2025-01-01'}), self.expected(0, 1))
+        self.assertEqual(self.ids(**{'data.start__lt': '2025-01-01'}), self.expected(2))
+
+    def test_in_and_ne(self):
+        self.assertEqual(self.ids(**{'data.city__in': 'Mombasa,Kisumu'}), self.expected(1, 3))
+        self.assertEqual(self.ids(**{'data.city__ne': 'Nairobi'}), self.expected(1, 3))
+
+    def test_checkbox(self):
+        self.assertEqual(self.ids(**{'data.agree': 'yes'}), self.expected(0))
+        self.assertEqual(self.ids(**{'data.agree': 'false'}), self.expected(1, 2))
+
+    def test_my_submissions_and_streams_are_filtered(self):
+        self.authenticate_user(self.regular_user)
+        self.assertEqual(self.ids(self.my_submissions_url, **{'data.city': 'Nairobi'}), self.expected(0, 2))
+
+        response = self.client.get(self.submission_list_url, {'form': self.form.id, 'data.city': 'Kisumu', 'stream': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.submissions[3].id])
+
+    def test_invalid_filters_are_rejected(self):
+        cases = [
+            ({'data.income': '1'}, 'form'),
+            ({'form': self.form.id, 'data.salary': '1'}, 'data.salary'),
+            ({'form': self.form.id, 'data.city__gt': 'A'}, 'data.city__gt'),
+            ({'form': self.form.id, 'data.income__gte': 'lots'}, 'data.income__gte'),
+            ({'form': self.form.id, 'data.Image': 'x'}, 'data.Image'),
+            ({'form': 'abc'}, 'form'),
+            ({'status': 'lost'}, 'status'),
+        ]
+        for params, key in cases:
+            with self.subTest(params=params):
+                response = self.client.get(self.submission_list_url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(key, response.data)
+
+    def test_unknown_form(self):
+        response = self.client.get(self.submission_list_url, {'form': 999999, 'data.income': '1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('form', response.data)
+
+    def test_search_index_follows_the_field(self):
+        with mock.patch('forms.signals.sync_search_index') as task:
+            with self.captureOnCommitCallbacks(execute=True):
+                Field.objects.filter(pk=self.field_text.pk).get().save()
+            task.delay.assert_not_called()
+
+            field = Field.objects.get(pk=self.income.pk)
+            field.is_searchable = True
+            with self.captureOnCommitCallbacks(execute=True):
+                field.save()
+            task.delay.assert_called_once_with(self.income.id)
+
+            field = Field.objects.get(pk=self.income.pk)
+            field.is_searchable = False
+            with self.captureOnCommitCallbacks(execute=True):
+                field.save()
+            self.assertEqual(task.delay.call_count, 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'JSONB indexes need Postgres')
+class SubmissionFilterIndexTest(SubmissionFilterTest):
+    """Checks with EXPLAIN that the filters are answered from the JSONB indexes."""
+
+    def setUp(self):
+        super().setUp()
+        self.income.is_searchable = True
+        self.income.save()
+        with connection.schema_editor() as editor:
+            editor.add_index(Submission, search_index(self.income))
+
+    def plan(self, **params):
+        request = mock.Mock(query_params=QueryDict(mutable=True))
+        request.query_params.update({'form': str(self.form.id), **params})
+        queryset = SubmissionFilter.from_request(request).apply(Submission.objects.order_by())
+        with connection.cursor() as cursor:
+            # a handful of rows would always be read sequentially
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_equality_uses_the_gin_index(self):
+        self.assertIn(GIN_INDEX_NAME, self.plan(**{'data.city': 'Nairobi'}))
+
+    def test_range_uses_the_expression_index(self):
+        self.assertIn(search_index(self.income).name, self.plan(**{'data.income__gte': '60000'}))
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# SUBMISSION VALUE PROJECTION TESTS
+
+@override_settings(SUBMISSION_PROJECTION_ENABLED=True)
+class ProjectedSubmissionFilterTest(SubmissionFilterTest):
+    """The data filters again, with ranges answered from the typed projection."""
+
+
+@override_settings(SUBMISSION_PROJECTION_ENABLED=True)
+class SubmissionProjectionTest(BaseAPITestSetup):
+    """Tests for the typed SubmissionValue projection and sorting on answers."""
+
+    def setUp(self):
+        super().setUp()
+        self.income = Field.objects.create(form=self.form, name='income', type='number')
+        self.start = Field.objects.create(form=self.form, name='start', type='date')
+        self.agree = Field.objects.create(form=self.form, name='agree', type='checkbox')
+        self.submissions = [
+            Submission.objects.create(form=self.form, user=self.regular_user, data={'income': income})
+            for income in [30000, '120000', 'n/a', 75000.25]
+        ]
+        self.authenticate_user(self.admin_user)
+
+    def values(self, submission):
+        return {
+            value.field_id: (value.num_value, value.date_value, value.text_value, value.bool_value)
+            for value in SubmissionValue.objects.filter(submission=submission)
+        }
+
+    def test_answers_are_projected_by_type(self):
+        submission = Submission.objects.create(form=self.form, data={
+            'name_field': 'Jane', 'income': '5000.5', 'start': '2025-02-01', 'agree': 'yes', 'Image': 'a.png', 'other': 1,
+        })
+        self.assertEqual(self.values(submission), {
+            self.field_text.id: (None, None, 'Jane', None),
+            self.income.id: (Decimal('5000.5'), None, None, None),
+            self.start.id: (None, datetime.date(2025, 2, 1), None, None),
+            self.agree.id: (None, None, None, True),
+        })
+        self.assertEqual(self.values(self.submissions[2]), {})
+
+    def test_projection_follows_saves(self):
+        submission = self.submissions[0]
+        submission.data = {'income': 31000}
+        submission.save()
+        self.assertEqual(self.values(submission), {self.income.id: (Decimal('31000'), None, None, None)})
+
+        submission.data = {'income': 1}
+        submission.status = 'approved'
+        submission.save(update_fields=['status'])
+        self.assertEqual(self.values(submission), {self.income.id: (Decimal('31000'), None, None, None)})
+
+        submission.delete()
+        self.assertFalse(SubmissionValue.objects.filter(submission_id=self.submissions[0].id).exists())
+
+    def test_bulk_ingest_projects_rows(self):
+        self.authenticate_user(self.regular_user)
+        records = [{'form_id': self.form.id, 'data': {'income': income}} for income in (10, 20)]
+        response = self.client.post(reverse('submission-bulk-ingest'), records, format='json')
+        ids = [result['id'] for result in response.data['data']['results']]
+        self.assertEqual(
+            sorted(SubmissionValue.objects.filter(submission_id__in=ids).values_list('num_value', flat=True)),
+            [Decimal('10'), Decimal('20')],
+        )
+
+    def test_backfill_rebuilds_in_chunks(self):
+        from django.core.management import call_command
+
+        SubmissionValue.objects.all().delete()
+        output = mock.MagicMock()
+        call_command('backfill_submission_values', form_id=self.form.id, chunk_size=3, stdout=output)
+        self.assertEqual(SubmissionValue.objects.filter(field=self.income).count(), 3)
+        self.assertIn('Done: 4 submissions, 3 values', ''.join(str(call.args[0]) for call in output.write.call_args_list))
+
+    def test_order_by_answer(self):
+        def page(**params):
+            response = self.client.get(self.submission_list_url, {'form': self.form.id, 'page_size': 2, **params})
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+            return [item['id'] for item in response.data['data']], response.data['next']
+
+        ids, cursor = page(order_by='data.income')
+        self.assertEqual(ids, [self.submissions[0].id, self.submissions[3].id])
+        ids, cursor = page(order_by='data.income', cursor=cursor)
+        self.assertEqual((ids, cursor), ([self.submissions[1].id], None))
+
+        ids, _ = page(order_by='-data.income', page_size=3)
+        self.assertEqual(ids, [self.submissions[1].id, self.submissions[3].id, self.submissions[0].id])
+
+    def test_order_by_errors(self):
+        cases = [
+            ({'order_by': 'data.income'}, 'form'),
+            ({'form': self.form.id, 'order_by': 'submitted'}, 'order_by'),
+            ({'form': self.form.id, 'order_by': 'data.salary'}, 'order_by'),
+            ({'form': self.form.id, 'order_by': 'data.Image'}, 'order_by'),
+        ]
+        for params, key in cases:
+            with self.subTest(params=params):
+                response = self.client.get(self.submission_list_url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(key, response.data)
+
+        with override_settings(SUBMISSION_PROJECTION_ENABLED=False):
+            response = self.client.get(self.submission_list_url, {'form': self.form.id, 'order_by': 'data.income'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == 'postgresql', 'plans differ on sqlite')
+    def test_sort_walks_the_value_index(self):
+        request = mock.Mock(query_params=QueryDict(f'form={self.form.id}&order_by=data.income'))
+        queryset = SubmissionFilter.from_request(request).apply(Submission.objects.all())[:20]
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assertIn('submission_value_num_idx', queryset.explain())
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# SUBMISSION COUNTER TESTS
+
+class SubmissionCounterTest(QueryBudgetTestMixin, BaseAPITestSetup):
+    """Tests for the submission counters and the dashboard reading them."""
+
+    def setUp(self):
+        super().setUp()
+        self.other_form = Form.objects.create(name='Other Form')
+        self.submissions = [
+            Submission.objects.create(form=self.form, user=self.regular_user, data={'name_field': str(i)})
+            for i in range(3)
+        ]
+        Submission.objects.create(form=self.other_form, data={})
+        self.url = reverse('submission-dashboard')
+
+    def counts(self):
+        return {(row.form_id, row.status): row.count for row in SubmissionCount.objects.exclude(count=0)}
+
+    def daily(self):
+        return {(row.form_id, row.day): row.count for row in SubmissionDailyCount.objects.exclude(count=0)}
+
+    def test_creates_and_deletes_are_counted(self):
+        today = timezone.localdate()
+        self.assertEqual(self.counts(), {(self.form.id, 'pending'): 3, (self.other_form.id, 'pending'): 1})
+        self.assertEqual(self.daily(), {(self.form.id, today): 3, (self.other_form.id, today): 1})
+
+        Submission.objects.get(pk=self.submissions[0].pk).delete()
+        self.assertEqual(self.counts()[self.form.id, 'pending'], 2)
+        self.assertEqual(self.daily()[self.form.id, today], 2)
+
+    def test_status_changes_move_counts(self):
+        submission = Submission.objects.get(pk=self.submissions[0].pk)
+        submission.status = 'approved'
+        submission.save(update_fields=['status'])
+        submission.data = {'name_field': 'changed'}
+        submission.save(update_fields=['data'])
+        submission.status = 'rejected'
+        submission.save()
+        self.assertEqual(self.counts(), {
+            (self.form.id, 'pending'): 2, (self.form.id, 'rejected'): 1, (self.other_form.id, 'pending'): 1,
+        })
+
+    def test_deleting_a_form_drops_its_counters(self):
+        self.other_form.delete()
+        self.assertFalse(SubmissionCount.objects.filter(form_id=self.other_form.id).exists())
+        self.assertFalse(SubmissionDailyCount.objects.filter(form_id=self.other_form.id).exists())
+
+    def test_bulk_ingest_is_counted(self):
+        self.authenticate_user(self.regular_user)
+        records = [{'form_id': self.form.id, 'data': {'name_field': str(i)}} for i in range(5)]
+        response = self.client.post(reverse('submission-bulk-ingest'), records, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.counts()[self.form.id, 'pending'], 8)
+
+    def test_repair_recomputes_in_chunks(self):
+        from django.core.management import call_command
+
+        Submission.objects.filter(pk=self.submissions[1].pk).update(status='approved')
+        Submission.objects.filter(pk=self.submissions[2].pk).delete()
+        SubmissionCount.objects.filter(form=self.other_form).update(count=7)
+        output = mock.MagicMock()
+        call_command('repair_submission_counts', chunk_size=2, stdout=output)
+        self.assertEqual(self.counts(), {
+            (self.form.id, 'pending'): 1, (self.form.id, 'approved'): 1, (self.other_form.id, 'pending'): 1,
+        })
+        self.assertEqual(sum(self.daily().values()), 3)
+        self.assertIn('Done: 3 submissions', ''.join(str(call.args[0]) for call in output.write.call_args_list))
+
+    def test_dashboard(self):
+        self.authenticate_user(self.admin_user)
+        response = self.request_within_budget('get', self.url, {'days': 7})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        forms = {form['id']: form for form in response.data['data']['forms']}
+        self.assertEqual(forms[self.form.id]['total'], 3)
+        self.assertEqual(forms[self.form.id]['statuses'], {'pending': 3, 'approved': 0, 'rejected': 0})
+        daily = response.data['data']['daily']
+        self.assertEqual(len(daily), 7)
+        self.assertEqual(daily[-1], {'day': timezone.localdate(), 'count': 4})
+
+        response = self.client.get(self.url, {'form': self.other_form.id})
+        self.assertEqual([form['total'] for form in response.data['data']['forms']], [1])
+
+    def test_dashboard_reads_counters_only(self):
+        self.authenticate_user(self.admin_user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertFalse([query for query in queries if 'forms_submission"' in query['sql']])
+
+    def test_dashboard_errors(self):
+        self.authenticate_user(self.admin_user)
+        for params in ({'days': 0}, {'days': 'week'}, {'days': 1000}, {'form': 'x'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+        self.authenticate_user(self.regular_user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# FIELD STATISTICS TESTS
+
+class FieldStatisticsTest(QueryBudgetTestMixin, BaseAPITestSetup):
+    """Tests for the per-field statistics of forms/<id>/statistics/."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.income = Field.objects.create(form=self.form, name='income', type='number')
+        self.start = Field.objects.create(form=self.form, name='start', type='date')
+        for income, start in [(10, '2025-01-01'), ('30', '2025-01-03'), (20, None), ('n/a', '2025-01-05'), (None, 'soon')]:
+            Submission.objects.create(form=self.form, data={'income': income, 'start': start})
+        self.url = reverse('form-statistics', kwargs={'pk': self.form.id})
+        self.authenticate_user(self.admin_user)
+
+    def statistics(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data['data']
+
+    def test_number_and_date_distributions(self):
+        data = self.statistics(bins=2)
+        self.assertEqual(data['submissions'], 5)
+        self.assertEqual(set(data['fields']), {'income', 'start'})
+
+        income = data['fields']['income']
+        self.assertEqual((income['count'], income['answered'], income['null_ratio']), (5, 3, 0.4))
+        self.assertEqual((income['min'], income['max'], income['mean']), (10.0, 30.0, 20.0))
+        self.assertEqual(income['percentiles']['p50'], 20.0)
+        self.assertEqual([bucket['count'] for bucket in income['histogram']], [1, 2])
+
+        start = data['fields']['start']
+        self.assertEqual((start['min'], start['max'], start['mean']), ('2025-01-01', '2025-01-05', '2025-01-03'))
+
+    def test_filters(self):
+        submission = Submission.objects.filter(form=self.form).order_by('pk').first()
+        submission.status = 'approved'
+        submission.save()
+        data = self.statistics(status='approved', field='income')
+        self.assertEqual(data['submissions'], 1)
+        self.assertEqual(list(data['fields']), ['income'])
+        self.assertEqual(data['fields']['income']['max'], 10.0)
+
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+        self.assertEqual(self.statistics(since=tomorrow.isoformat())['submissions'], 0)
+        self.assertEqual(self.statistics(until=tomorrow.isoformat())['submissions'], 5)
+
+    def test_later_calls_only_read_new_submissions(self):
+        self.statistics()
+        Submission.objects.create(form=self.form, data={'income': 1000})
+        with CaptureQueriesContext(connection) as queries:
+            data = self.statistics()
+        self.assertEqual(data['fields']['income']['max'], 1000.0)
+        reads = [query['sql'] for query in queries if 'FROM "forms_submission"' in query['sql']]
+        # the new rows, and a count of the ones already read
+        self.assertEqual(len(reads), 2)
+        self.assertIn('"forms_submission"."id" >', reads[0])
+        self.assertIn('COUNT(', reads[1])
+
+    def test_rows_committed_below_the_high_water_mark_are_not_skipped(self):
+        last = Submission.objects.filter(form=self.form).order_by('pk').last()
+        Submission.objects.create(pk=last.pk + 10, form=self.form, data={'income': 40})
+        self.assertEqual(self.statistics()['high_water_mark'], last.pk + 10)
+        # its id was taken before the one above, its commit came after
+        Submission.objects.create(pk=last.pk + 5, form=self.form, data={'income': 5000})
+        data = self.statistics()
+        self.assertEqual((data['submissions'], data['fields']['income']['max']), (7, 5000.0))
+
+    def test_entry_expires_from_its_first_build(self):
+        from .analytics import get_columns
+
+        columns = get_columns(self.form.id)
+        Submission.objects.create(form=self.form, data={'income': 1000})
+        self.assertEqual(get_columns(self.form.id).built_at, columns.built_at)
+        with mock.patch('forms.analytics.time') as clock:
+            clock.time.return_value = columns.built_at + settings.ANALYTICS_CACHE_TIMEOUT + 1
+            self.assertEqual(get_columns(self.form.id).built_at, clock.time.return_value)
+
+    def test_answers_too_large_for_a_float_are_ignored(self):
+        Submission.objects.create(form=self.form, data={'income': '1e400'})
+        income = self.statistics(bins=2)['fields']['income']
+        self.assertEqual((income['count'], income['answered'], income['max']), (6, 3, 30.0))
+
+    def test_edits_deletes_and_field_changes_rebuild(self):
+        self.statistics()
+        Submission.objects.filter(form=self.form, data__income=10).get().delete()
+        self.assertEqual(self.statistics()['fields']['income']['min'], 20.0)
+
+        Field.objects.create(form=self.form, name='amount', type='number')
+        self.assertIn('amount', self.statistics()['fields'])
+
+    def test_within_query_budget(self):
+        schema_cache.clear()
+        response = self.request_within_budget('get', self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_errors(self):
+        for params in ({'status': 'lost'}, {'since': 'yesterday'}, {'bins': 0}, {'bins': 'many'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+        missing = reverse('form-statistics', kwargs={'pk': 999999})
+        self.assertEqual(self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND)
+        self.authenticate_user(self.regular_user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# SUBMISSION EXPORT TESTS
+
+class SubmissionExportTest(BaseAPITestSetup):
+    """Tests for the chunked CSV / Parquet submission exports."""
+
+    def setUp(self):
+        super().setUp()
+        import shutil
+        import tempfile
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.income = Field.objects.create(form=self.form, name='income', type='number')
+        self.submissions = [
+            Submission.objects.create(form=self.form, user=self.regular_user, data={'name_field': name, 'income': income})
+            for name, income in [('Jane', 100), ('Doe, John', 'n/a'), ('Ann', 250.5)]
+        ]
+        self.submissions[1].status = 'approved'
+        self.submissions[1].save()
+        self.authenticate_user(self.admin_user)
+
+    def create_export(self, **kwargs):
+        from .models import SubmissionExport
+        return SubmissionExport.objects.create(form=self.form, requested_by=self.admin_user, **kwargs)
+
+    def test_post_queues_the_job(self):
+        url = reverse('submission-export-create', kwargs={'pk': self.form.id})
+        with mock.patch('forms.views.export_submissions') as task:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {'format': 'csv', 'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['data']['state'], 'pending')
+        task.delay.assert_called_once_with(response.data['data']['id'])
+
+        response = self.client.post(url, {'format': 'xlsx'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.authenticate_user(self.regular_user)
+        self.assertEqual(self.client.post(url, {'format': 'csv'}, format='json').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_csv_is_written_in_chunks(self):
+        import csv
+        from .exports import run_export
+
+        export = self.create_export()
+        with CaptureQueriesContext(connection) as queries:
+            export = run_export(export.id, chunk_size=2)
+        progress = [query for query in queries if query['sql'].startswith('UPDATE "forms_submissionexport" SET "rows_written"')]
+        self.assertEqual(len(progress), 2)
+
+        self.assertEqual((export.state, export.total_rows, export.rows_written), ('done', 3, 3))
+        with export.file.open('r') as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(rows[0], ['submission_id', 'submitted_at', 'status', 'user_email', 'data.Image', 'data.income', 'data.name_field'])
+        self.assertEqual([row[6] for row in rows[1:]], ['Jane', 'Doe, John', 'Ann'])
+        self.assertEqual([row[5] for row in rows[1:]], ['100', 'n/a', '250.5'])
+        self.assertEqual(rows[2][2:4], ['approved', 'regular@test.com'])
+
+    def test_status_filter(self):
+        from .exports import run_export
+
+        export = run_export(self.create_export(status='approved').id)
+        with export.file.open('r') as file:
+            self.assertEqual(len(file.read().splitlines()), 2)
+        self.assertEqual(export.total_rows, 1)
+
+    @skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_parquet_row_groups_are_typed(self):
+        import pyarrow.parquet as pq
+        from .exports import run_export
+
+        export = run_export(self.create_export(format='parquet').id, chunk_size=2)
+        with export.file.open('rb') as file:
+            parquet = pq.ParquetFile(file)
+            self.assertEqual(parquet.metadata.num_row_groups, 2)
+            table = parquet.read()
+        self.assertEqual(table.column('data.income').to_pylist(), [100.0, None, 250.5])
+        self.assertEqual(table.column('submission_id').to_pylist(), [submission.id for submission in self.submissions])
+
+    def test_progress_and_download(self):
+        from .exports import run_export
+
+        export = self.create_export()
+        url = reverse('submission-export-retrieve', kwargs={'pk': export.id})
+        response = self.client.get(url)
+        self.assertEqual((response.data['data']['progress'], response.data['data']['download']), (0.0, None))
+        download = reverse('submission-export-download', kwargs={'pk': export.id})
+        self.assertEqual(self.client.get(download).status_code, status.HTTP_404_NOT_FOUND)
+
+        run_export(export.id)
+        response = self.client.get(url)
+        self.assertEqual(response.data['data']['progress'], 1.0)
+        self.assertTrue(response.data['data']['download'].endswith(download))
+        response = self.client.get(download)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'submission_id,'))
+
+    def test_failure_is_recorded(self):
+        from .exports import run_export
+
+        export = self.create_export()
+        with mock.patch('forms.exports.CSVExportWriter.write', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                run_export(export.id)
+        export.refresh_from_db()
+        self.assertEqual((export.state, export.error), ('failed', 'disk full'))
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# RESUMABLE UPLOAD TESTS
+
+class ResumableUploadTest(QueryBudgetTestMixin, BaseAPITestSetup):
+    """Tests for chunked, resumable uploads and attaching them as documents."""
+
+    CONTENT = b'%PDF-scanned passport'
+
+    def setUp(self):
+        super().setUp()
+        import shutil
+        import tempfile
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.submission = Submission.objects.create(form=self.form, user=self.regular_user, data={})
+        self.authenticate_user(self.regular_user)
+
+    def create(self, size=None):
+        response = self.request_within_budget(
+            'post', reverse('upload-create'),
+            {'filename': '../passport.pdf', 'content_type': 'application/pdf', 'size': len(self.CONTENT) if size is None else size},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response
+
+    def patch(self, url, offset, body):
+        return self.request_within_budget(
+            'patch', url, body, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_upload_resume_finalize_and_attach(self):
+        from .uploads import staging_path
+        from .models import Upload
+
+        response = self.create()
+        url = response['Location']
+        self.assertEqual((response.data['data']['filename'], response['Upload-Offset']), ('passport.pdf', '0'))
+
+        self.assertEqual(self.patch(url, 0, self.CONTENT[:5])['Upload-Offset'], '5')
+        # the client lost the response and asks where to resume
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '5')
+        response = self.patch(url, 0, self.CONTENT[:5])
+        self.assertEqual((response.status_code, response['Upload-Offset']), (status.HTTP_409_CONFLICT, '5'))
+        self.assertEqual(self.patch(url, 5, self.CONTENT[5:])['Upload-Offset'], str(len(self.CONTENT)))
+
+        upload = Upload.objects.get()
+        response = self.request_within_budget('post', reverse('upload-finalize', kwargs={'pk': upload.pk}))
+        self.assertEqual(response.data['data']['state'], 'complete')
+        upload.refresh_from_db()
+        with upload.file.open('rb') as file:
+            self.assertEqual(file.read(), self.CONTENT)
+        self.assertFalse(os.path.exists(staging_path(upload)))
+
+        attach_url = reverse('submission-document-create', kwargs={'pk': self.submission.id})
+        payload = {'upload_id': str(upload.pk), 'field_id': self.field_file.id}
+        response = self.request_within_budget('post', attach_url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        document = Document.objects.get(submission=self.submission)
+        self.assertEqual(document.file.name, upload.file.name)
+        self.assertEqual(self.client.post(attach_url, payload, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejected_chunks_and_early_finalize(self):
+        url = self.create()['Location']
+        self.assertEqual(self.patch(url, 0, self.CONTENT + b'extra').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.patch(url, self.CONTENT, content_type='application/offset+octet-stream').status_code, status.HTTP_400_BAD_REQUEST)
+        self.patch(url, 0, self.CONTENT[:3])
+        pk = url.rstrip('/').rsplit('/', 1)[-1]
+        self.assertEqual(self.client.post(reverse('upload-finalize', kwargs={'pk': pk})).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_uploads_are_private_and_bounded(self):
+        url = self.create()['Location']
+        self.authenticate_user(self.admin_user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        with override_settings(UPLOAD_MAX_SIZE=10):
+            response = self.client.post(reverse('upload-create'), {'filename': 'big.pdf', 'size': 11}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_only_file_fields_of_the_submission_form(self):
+        from .uploads import create_upload, finalize_upload, write_chunk
+        import io
+
+        upload = create_upload(self.regular_user, 'id.png', 3)
+        write_chunk(upload, 0, io.BytesIO(b'png'), 3)
+        finalize_upload(upload)
+        attach_url = reverse('submission-document-create', kwargs={'pk': self.submission.id})
+        response = self.client.post(attach_url, {'upload_id': str(upload.pk), 'field_id': self.field_text.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_attach_applies_the_field_limits(self):
+        from .uploads import create_upload, finalize_upload, write_chunk
+        import io
+
+        def finished(content_type):
+            upload = create_upload(self.regular_user, 'id.pdf', len(self.CONTENT), content_type)
+            write_chunk(upload, 0, io.BytesIO(self.CONTENT), len(self.CONTENT))
+            return finalize_upload(upload)
+
+        self.field_file.options = {'content_types': ['application/pdf'], 'max_files': 1}
+        self.field_file.save()
+        attach_url = reverse('submission-document-create', kwargs={'pk': self.submission.id})
+
+        response = self.client.post(attach_url, {'upload_id': str(finished('image/png').pk), 'field_id': self.field_file.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['data']['upload_id'], ['id.pdf: must be one of application/pdf.'])
+
+        response = self.request_within_budget('post', attach_url, {'upload_id': str(finished('application/pdf').pk), 'field_id': self.field_file.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        response = self.client.post(attach_url, {'upload_id': str(finished('application/pdf').pk), 'field_id': self.field_file.id}, format='json')
+        self.assertEqual(response.data['data']['upload_id'], ['At most 1 files.'])
+        self.assertEqual(Document.objects.filter(submission=self.submission).count(), 1)
+
+    @override_settings(UPLOAD_READ_SIZE=4)
+    def test_chunks_are_streamed_in_pieces(self):
+        from .uploads import create_upload, write_chunk
+        import io
+
+        upload = create_upload(self.regular_user, 'statement.pdf', len(self.CONTENT))
+        stream = io.BytesIO(self.CONTENT)
+        with mock.patch.object(stream, 'read', wraps=stream.read) as read:
+            self.assertEqual(write_chunk(upload, 0, stream, len(self.CONTENT)), len(self.CONTENT))
+        self.assertTrue(all(call.args[0] <= 4 for call in read.call_args_list))
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# DOCUMENT BLOB TESTS
+
+class DocumentBlobTest(QueryBudgetTestMixin, BaseAPITestSetup):
+    """Tests for content-addressed document storage and document downloads."""
+
+    CONTENT = b'%PDF-certificate of incorporation'
+
+    def setUp(self):
+        super().setUp()
+        import shutil
+        import tempfile
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.submission = Submission.objects.create(form=self.form, user=self.regular_user, data={})
+        self.other_submission = Submission.objects.create(form=self.form, user=self.regular_user, data={})
+
+    def store(self, submission, content=None, name='certificate.pdf'):
+        from .blobs import store_documents
+        return store_documents(submission, [(self.field_file.id, SimpleUploadedFile(name, content or self.CONTENT))])[0]
+
+    def test_duplicate_content_is_stored_once(self):
+        import hashlib
+        from .models import Blob
+
+        first = self.store(self.submission)
+        second = self.store(self.other_submission, name='copy.pdf')
+        self.assertEqual(Blob.objects.count(), 1)
+        blob = Blob.objects.get()
+        self.assertEqual((blob.digest, blob.size, blob.ref_count), (hashlib.sha256(self.CONTENT).hexdigest(), len(self.CONTENT), 2))
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual((first.filename, second.filename), ('certificate.pdf', 'copy.pdf'))
+        self.assertEqual(len(os.listdir(os.path.dirname(blob.file.path))), 1)
+
+        self.store(self.submission, b'another scan')
+        self.assertEqual(Blob.objects.count(), 2)
+
+    def test_deletes_release_references_and_prune_removes_unused_blobs(self):
+        from .blobs import prune_blobs
+        from .models import Blob
+
+        self.store(self.submission)
+        self.store(self.other_submission)
+        path = Blob.objects.get().file.path
+        self.submission.delete()
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertEqual(prune_blobs(grace=0), 0)
+
+        self.other_submission.delete()
+        self.assertEqual(Blob.objects.get().ref_count, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(prune_blobs(grace=0), 1)
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_finalized_upload_holds_a_reference_until_attached(self):
+        from .models import Blob
+        from .uploads import attach_upload, create_upload, discard_upload, finalize_upload, write_chunk
+        import io
+
+        self.store(self.submission)
+        upload = create_upload(self.regular_user, 'scan.pdf', len(self.CONTENT))
+        write_chunk(upload, 0, io.BytesIO(self.CONTENT), len(self.CONTENT))
+        finalize_upload(upload)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        document = attach_upload(upload, self.other_submission, self.field_file)
+        self.assertEqual((document.blob_id, document.filename), (upload.blob_id, 'scan.pdf'))
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+
+        spare = create_upload(self.regular_user, 'scan.pdf', len(self.CONTENT))
+        write_chunk(spare, 0, io.BytesIO(self.CONTENT), len(self.CONTENT))
+        finalize_upload(spare)
+        discard_upload(spare)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+
+    def test_download_uses_the_digest_as_etag(self):
+        document = self.store(self.submission)
+        url = reverse('document-download', kwargs={'pk': document.id})
+        self.authenticate_user(self.regular_user)
+
+        response = self.request_within_budget('get', url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+        self.assertEqual(response['ETag'], f'"{document.blob.digest}"')
+        self.assertIn('certificate.pdf', response['Content-Disposition'])
+
+        response = self.request_within_budget('get', url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        stranger = CustomUser.objects.create_user(username='stranger_test', email='stranger@test.com', password='testpassword')
+        self.authenticate_user(stranger)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_verify_detects_damaged_blobs(self):
+        from .blobs import verify_blob
+
+        document = self.store(self.submission)
+        self.assertTrue(verify_blob(document.blob))
+        with open(document.blob.file.path, 'wb') as file:
+            file.write(b'tampered')
+        self.assertFalse(verify_blob(document.blob))
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# SUBMISSION FILE TESTS
+
+class SubmissionFileTest(QueryBudgetTestMixin, BaseAPITestSetup):
+    """Tests for matching multipart uploads to the form's file fields."""
+
+    def setUp(self):
+        super().setUp()
+        import shutil
+        import tempfile
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.authenticate_user(self.regular_user)
+
+    def submit(self, files):
+        payload = {'form_id': self.form.id, 'data': '{"name_field": "Jane"}', **files}
+        return self.client.post(self.submission_list_url, payload, format='multipart')
+
+    def scan(self, number, content_type='application/pdf', content=None):
+        return SimpleUploadedFile(f'scan-{number}.pdf', content or f'scan {number}'.encode(), content_type=content_type)
+
+    def test_files_are_matched_by_field_name_or_id(self):
+        response = self.submit({'Image': [self.scan(1), self.scan(2)], str(self.field_file.id): self.scan(3)})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        documents = Document.objects.filter(submission__form=self.form)
+        self.assertEqual(sorted(documents.values_list('filename', flat=True)), ['scan-1.pdf', 'scan-2.pdf', 'scan-3.pdf'])
+        self.assertEqual(set(documents.values_list('field_id', flat=True)), {self.field_file.id})
+
+    def test_unknown_and_non_file_fields_are_rejected(self):
+        response = self.submit({'name_field': self.scan(1), 'Passport': self.scan(2)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['data']['files']), {'name_field', 'Passport'})
+        self.assertFalse(Submission.objects.exists())
+
+    def test_limits_come_from_field_options(self):
+        self.field_file.options = {'max_size': 10, 'content_types': ['image/*'], 'max_files': 1}
+        self.field_file.save()
+        response = self.submit({'Image': [self.scan(1, content=b'a' * 11), self.scan(2, content_type='image/png')]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['data']['files']['Image'], [
+            'scan-1.pdf: must be at most 10 bytes.',
+            'scan-1.pdf: must be one of image/*.',
+            'At most 1 files.',
+        ])
+        self.assertFalse(Document.objects.exists())
+
+        response = self.submit({'Image': self.scan(3, content_type='image/png')})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+    def test_required_file_fields_need_a_file(self):
+        self.field_file.is_required = True
+        self.field_file.save()
+        response = self.submit({})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['data']['files'], {'Image': ['This field is required.']})
+        self.assertFalse(Submission.objects.exists())
+
+        response = self.submit({'Image': self.scan(1)})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+    def test_queries_do_not_grow_with_the_number_of_files(self):
+        self.submit({'Image': self.scan(0)})
+
+        def queries(count, start):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.submit({'Image': [self.scan(start + number) for number in range(count)]})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+            return len(captured)
+
+        self.assertEqual(queries(1, 100), queries(10, 200))
+        self.assertEqual(Document.objects.count(), 12)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# DIRECT UPLOAD TESTS
+
+class DirectUploadTest(QueryBudgetTestMixin, BaseAPITestSetup):
+    """Tests for presigned uploads, against the local object store stand-in."""
+
+    CONTENT = b'%PDF-proof of income'
+
+    def setUp(self):
+        super().setUp()
+        import shutil
+        import tempfile
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root, DIRECT_UPLOAD_BACKEND='local', DIRECT_UPLOAD_LOCAL_ROOT='')
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.submission = Submission.objects.create(form=self.form, user=self.regular_user, data={})
+        self.authenticate_user(self.regular_user)
+
+    def create(self, content=None):
+        import hashlib
+        content = self.CONTENT if content is None else content
+        response = self.request_within_budget('post', reverse('direct-upload-create'), {
+            'filename': 'income.pdf', 'content_type': 'application/pdf',
+            'size': len(content), 'sha256': hashlib.sha256(content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data['data']
+
+    def put(self, upload, body):
+        from urllib.parse import urlsplit
+        headers = {f'HTTP_{name.upper().replace("-", "_")}': value for name, value in upload['headers'].items() if name != 'Content-Type'}
+        # the object store is not the API: no credentials on this request
+        self.client.force_authenticate(user=None)
+        try:
+            return self.request_within_budget(
+                'put', urlsplit(upload['upload_url']).path, body, content_type=upload['headers']['Content-Type'], **headers
+            )
+        finally:
+            self.authenticate_user(self.regular_user)
+
+    def test_presigned_put_finalize_and_attach(self):
+        import base64
+        import hashlib
+        from .models import Blob
+
+        upload = self.create()
+        self.assertEqual((upload['method'], upload['state']), ('PUT', 'uploading'))
+        checksum = base64.b64encode(hashlib.sha256(self.CONTENT).digest()).decode()
+        self.assertEqual(upload['headers']['x-amz-checksum-sha256'], checksum)
+        self.assertEqual(self.put(upload, self.CONTENT).status_code, status.HTTP_200_OK)
+
+        response = self.request_within_budget('post', reverse('upload-finalize', kwargs={'pk': upload['id']}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['data']['state'], 'complete')
+        blob = Blob.objects.get()
+        with blob.file.open('rb') as file:
+            self.assertEqual(file.read(), self.CONTENT)
+
+        response = self.client.post(
+            reverse('submission-document-create', kwargs={'pk': self.submission.id}),
+            {'upload_id': upload['id'], 'field_id': self.field_file.id}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['data']['digest'], blob.digest)
+
+    def test_store_rejects_other_content_and_bad_tokens(self):
+        upload = self.create()
+        response = self.put(upload, b'%PDF-something else!')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('upload-finalize', kwargs={'pk': upload['id']}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        upload['upload_url'] = upload['upload_url'].replace('/local/', '/local/x')
+        self.assertEqual(self.put(upload, self.CONTENT).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_direct_uploads_do_not_take_chunks(self):
+        upload = self.create()
+        response = self.client.patch(
+            reverse('upload-detail', kwargs={'pk': upload['id']}), self.CONTENT,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_declared_digest_must_be_sha256(self):
+        response = self.client.post(reverse('direct-upload-create'), {
+            'filename': 'income.pdf', 'size': 3, 'sha256': 'not-a-digest',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('sha256', response.data['data'])
+
+    @skipUnless(importlib.util.find_spec('boto3'), 'boto3 is not installed')
+    def test_s3_urls_sign_the_checksum(self):
+        from .object_storage import S3ObjectStorage
+
+        with override_settings(DIRECT_UPLOAD_BUCKET='documents', DIRECT_UPLOAD_ENDPOINT_URL='http://minio:9000',
+                               DIRECT_UPLOAD_REGION='us-east-1'), \
+                mock.patch.dict(os.environ, {'AWS_ACCESS_KEY_ID': 'minio', 'AWS_SECRET_ACCESS_KEY': 'minio123'}):
+            url, headers = S3ObjectStorage().presign_put('incoming/abc', 'application/pdf', 3, 'ab' * 32)
+        self.assertTrue(url.startswith('http://minio:9000/documents/incoming/abc?'))
+        # signed, either as a header the PUT must send or as a query parameter
+        self.assertIn('x-amz-checksum-sha256', url.lower())
+        self.assertEqual(headers['Content-Type'], 'application/pdf')
+
+    def test_s3_backend_needs_its_bucket_behind_the_default_storage(self):
+        from types import SimpleNamespace
+        from .checks import check_direct_upload_storage
+
+        self.assertEqual(check_direct_upload_storage(None), [])
+        with override_settings(DIRECT_UPLOAD_BACKEND='s3', DIRECT_UPLOAD_BUCKET='documents'):
+            # the default storage here is the local FileSystemStorage
+            self.assertEqual([error.id for error in check_direct_upload_storage(None)], ['forms.E001'])
+            with mock.patch('forms.object_storage.default_storage', SimpleNamespace(bucket_name='documents')):
+                self.assertEqual(check_direct_upload_storage(None), [])
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# OUTBOX TESTS
+
+class OutboxTest(CeleryHarnessMixin, BaseAPITestSetup):
+    """Tests for the transactional outbox and its relay."""
+
+    def submit(self):
+        self.authenticate_user(self.regular_user)
+        response = self.client.post(self.submission_list_url, self.submission_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return Submission.objects.latest('pk')
+
+    def test_message_is_written_with_the_submission(self):
+        with mock.patch.object(notify_admin_of_submission, 'apply_async') as apply_async, \
+                mock.patch.object(notify_admin_of_submission, 'delay') as delay:
+            submission = self.submit()
+        apply_async.assert_not_called()
+        delay.assert_not_called()
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.payload, {
+            'submission_id': submission.id, 'form_name': self.form.name, 'client_email': self.regular_user.email,
+        })
+        self.assertIsNone(message.dispatched_at)
+
+    def test_rolled_back_submissions_leave_no_message(self):
+        from django.db import transaction
+        from .outbox import enqueue
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            enqueue('submission.created', {'submission_id': 1, 'form_name': 'KYC', 'client_email': 'a@b.c'})
+            raise RuntimeError
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_relay_sends_in_batches_and_marks_dispatched(self):
+        from .outbox import drain
+
+        for _ in range(3):
+            self.submit()
+        with mock.patch.object(notify_admin_of_submission, 'apply_async') as apply_async:
+            self.assertEqual(drain(batch_size=2), 3)
+            self.assertEqual(drain(batch_size=2), 0)
+        self.assertEqual(apply_async.call_count, 3)
+        first = OutboxMessage.objects.order_by('pk').first()
+        self.assertEqual(apply_async.call_args_list[0].kwargs['task_id'], f'outbox-{first.pk}')
+        self.assertEqual(apply_async.call_args_list[0].kwargs['kwargs']['outbox_id'], first.pk)
+        self.assertFalse(OutboxMessage.objects.filter(dispatched_at__isnull=True).exists())
+
+    def test_broker_failure_keeps_the_message_for_the_next_run(self):
+        from .outbox import relay
+
+        self.submit()
+        with mock.patch.object(notify_admin_of_submission, 'apply_async', side_effect=ConnectionError('broker down')):
+            self.assertEqual(relay(), 0)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.dispatched_at, message.attempts, message.last_error), (None, 1, 'broker down'))
+
+    def test_redelivered_message_is_handled_once(self):
+        from django.core import mail
+
+        submission = self.submit()
+        message = OutboxMessage.objects.get()
+        with override_settings(ADMIN_NOTIFICATION_MODE='immediate'):
+            notify_admin_of_submission(**message.payload, outbox_id=message.pk)
+            notify_admin_of_submission(**message.payload, outbox_id=message.pk)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(str(submission.id), mail.outbox[0].body)
+        message.refresh_from_db()
+        self.assertIsNotNone(message.processed_at)
+
+    @override_settings(ADMIN_NOTIFICATION_MODE='immediate')
+    def test_failed_send_is_retried_until_delivered(self):
+        from smtplib import SMTPServerDisconnected
+        from django.core.mail import EmailMultiAlternatives
+        from .tasks import relay_outbox
+
+        self.submit()
+        # propagated, the first attempt's Retry would end the call before the retry runs
+        with mock.patch.object(EmailMultiAlternatives, 'send', side_effect=[SMTPServerDisconnected('gone'), 1]) as send, \
+                self.eager(propagate=False):
+            relay_outbox.delay()
+        self.assertEqual(send.call_count, 2)
+        message = OutboxMessage.objects.get()
+        self.assertIsNotNone(message.processed_at)
+        self.assertIsNotNone(message.dispatched_at)
+        self.assertEqual((message.attempts, message.last_error), (0, ''))
+
+    @override_settings(ADMIN_NOTIFICATION_MODE='immediate')
+    def test_relay_counts_a_retrying_task_as_dispatched(self):
+        from celery.exceptions import Retry
+        from .outbox import relay
+
+        self.submit()
+        with mock.patch.object(notify_admin_of_submission, 'apply_async', side_effect=Retry('Retry in 2s')):
+            self.assertEqual(relay(), 1)
+        message = OutboxMessage.objects.get()
+        self.assertIsNotNone(message.dispatched_at)
+        self.assertEqual(message.attempts, 0)
+
+    @override_settings(ADMIN_NOTIFICATION_MODE='immediate')
+    def test_exhausted_retries_hand_the_message_back_to_the_relay(self):
+        from smtplib import SMTPServerDisconnected
+        from django.core.mail import EmailMultiAlternatives
+        from .outbox import relay
+
+        self.submit()
+        message = OutboxMessage.objects.get()
+        OutboxMessage.objects.filter(pk=message.pk).update(dispatched_at=timezone.now())
+        with mock.patch.object(EmailMultiAlternatives, 'send', side_effect=SMTPServerDisconnected('gone')):
+            result = notify_admin_of_submission.apply(
+                kwargs={**message.payload, 'outbox_id': message.pk}, retries=notify_admin_of_submission.max_retries
+            )
+        self.assertTrue(result.failed())
+        message.refresh_from_db()
+        self.assertEqual((message.processed_at, message.dispatched_at, message.attempts, message.last_error), (None, None, 1, 'gone'))
+
+        with mock.patch.object(notify_admin_of_submission, 'apply_async') as apply_async:
+            self.assertEqual(relay(), 1)
+        self.assertEqual(apply_async.call_args.kwargs['kwargs']['outbox_id'], message.pk)
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# ADMIN DIGEST TESTS
+
+@override_settings(
+    ADMIN_NOTIFICATION_MODE='digest',
+    ADMINS=[('Ops', 'ops@test.com'), ('Compliance', 'compliance@test.com')],
+)
+class AdminDigestTest(BaseAPITestSetup):
+    """Tests for coalescing admin notifications into digests."""
+
+    def notify(self, count):
+        for number in range(count):
+            submission = Submission.objects.create(form=self.form, user=self.regular_user, data={})
+            notify_admin_of_submission(submission.id, self.form.name, f'client{number}@test.com')
+
+    def test_digest_mode_queues_one_line_per_admin(self):
+        from django.core import mail
+        from .models import AdminNotification
+
+        self.notify(3)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(AdminNotification.objects.filter(sent_at__isnull=True).count(), 6)
+
+    def test_one_email_per_admin_over_one_connection(self):
+        from django.core import mail
+        from django.core.mail import get_connection
+        from .models import AdminNotification
+        from .notifications import send_admin_digests
+
+        self.notify(3)
+        connection = get_connection()
+        with mock.patch.object(connection, 'open', wraps=connection.open) as opened:
+            self.assertEqual(send_admin_digests(connection=connection), 2)
+        opened.assert_called_once()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['compliance@test.com', 'ops@test.com'])
+        self.assertEqual(mail.outbox[0].subject, '3 New Form Submissions')
+        self.assertIn('client2@test.com', mail.outbox[0].body)
+        self.assertIn('Review Submission', mail.outbox[0].alternatives[0][0])
+        self.assertFalse(AdminNotification.objects.filter(sent_at__isnull=True).exists())
+        self.assertEqual(send_admin_digests(), 0)
+
+    def test_failed_digest_stays_pending(self):
+        from django.core.mail import get_connection
+        from .models import AdminNotification
+        from .notifications import send_admin_digests
+
+        self.notify(1)
+        connection = get_connection()
+        sent = connection.send_messages
+        calls = []
+
+        def fail_second(messages):
+            calls.append(messages)
+            if len(calls) == 2:
+                raise ConnectionError('smtp down')
+            return sent(messages)
+
+        with mock.patch.object(connection, 'send_messages', side_effect=fail_second), self.assertRaises(ConnectionError):
+            send_admin_digests(connection=connection)
+        self.assertEqual(list(AdminNotification.objects.filter(sent_at__isnull=True).values_list('recipient', flat=True)), ['ops@test.com'])
+
+    @override_settings(ADMIN_NOTIFICATION_MODE='immediate')
+    def test_immediate_mode_sends_per_submission(self):
+        from django.core import mail
+
+        self.notify(2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ['ops@test.com', 'compliance@test.com'])
+
+
+#--------------------------------------------------------------------------------------------------------------------------------
+# CELERY TOPOLOGY TESTS
+
+class CeleryTopologyTest(CeleryHarnessMixin, BaseAPITestSetup):
+    """Tests for task routing, priorities, rate limits and worker profiles."""
+
+    def test_tasks_are_routed_to_their_queues(self):
+        self.assertEqual(self.route_of('forms.tasks.notify_admin_of_submission'), {'queue': 'notifications', 'priority': 0})
+        self.assertEqual(self.route_of('forms.tasks.relay_outbox')['queue'], 'notifications')
+        self.assertEqual(self.route_of('forms.tasks.export_submissions')['queue'], 'exports')
+        self.assertEqual(self.route_of('forms.tasks.sync_search_index')['queue'], 'maintenance')
+        self.assertEqual(self.route_of('core.celery.debug_task')['queue'], 'default')
+
+    def test_no_task_priority_overrides_its_route(self):
+        from core.celery import app
+
+        # apply_async would send this instead of the route's priority
+        self.assertIsNone(app.conf.task_default_priority)
+        self.assertIsNone(app.tasks['forms.tasks.notify_admin_of_submission'].priority)
+
+    def test_notifications_are_served_before_digests_and_never_behind_exports(self):
+        from .tasks import export_submissions, send_admin_digests
+
+        with self.memory_broker() as (send, received):
+            send(export_submissions, 1)
+            send(send_admin_digests)
+            send(notify_admin_of_submission, 1, 'KYC', 'client@test.com')
+            self.assertEqual(received('notifications'), [
+                ('forms.tasks.notify_admin_of_submission', 0),
+                ('forms.tasks.send_admin_digests', 3),
+            ])
+            self.assertEqual(received('exports'), [('forms.tasks.export_submissions', 5)])
+
+    def test_rate_limits_and_worker_profiles(self):
+        from core.celery import app, worker_argv
+
+        self.assertEqual(app.tasks['forms.tasks.export_submissions'].rate_limit, settings.CELERY_TASK_ANNOTATIONS['forms.tasks.export_submissions']['rate_limit'])
+        argv = worker_argv('exports')
+        self.assertIn('--queues=exports', argv)
+        self.assertIn('--prefetch-multiplier=1', argv)
+        self.assertIn(f"--concurrency={settings.QUEUE_WORKER_PROFILES['exports']['concurrency']}", argv)
+
+    @override_settings(ADMIN_NOTIFICATION_MODE='digest', ADMINS=[('Ops', 'ops@test.com')])
+    def test_eager_relay_runs_the_notification(self):
+        from .models import AdminNotification
+        from .tasks import relay_outbox
+
+        self.authenticate_user(self.regular_user)
+        response = self.client.post(self.submission_list_url, self.submission_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.eager():
+            relay_outbox.delay()
+        self.assertEqual(AdminNotification.objects.get().recipient, 'ops@test.com')
+        self.assertIsNotNone(OutboxMessage.objects.get().processed_at)
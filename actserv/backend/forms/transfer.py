@@ -0,0 +1,109 @@
+"""
+Whole-form import and export.
+
+A form definition is a single document: the form's own attributes plus a
+``form_fields`` list in which conditional links name their controlling field
+(ids are not portable between databases)::
+
+    {"name": "KYC", "description": "", "version": 1, "is_active": true,
+     "form_fields": [{"name": "employed", "type": "checkbox", ...},
+                     {"name": "employer", "type": "text", "is_conditional": true,
+                      "conditional_field": "employed", "conditional_operator": "equal_to",
+                      "conditional_value": "true", ...}]}
+
+Importing runs a constant number of queries whatever the number of fields: one
+insert for the form, one ``bulk_create`` for the fields and one ``bulk_update``
+resolving the conditional links, all in one transaction.
+"""
+from types import SimpleNamespace
+
+from django.db import transaction
+
+from .conditions import ConditionCycleError, ConditionGraph
+from .models import Field, Form
+from .schema import ConditionRule, invalidate_form_schema
+from .response_cache import invalidate_form_responses
+from .tasks import sync_search_index
+from .validation import pattern_error
+
+
+def find_definition_errors(field_definitions):
+    """
+    Checks the fields of a definition as a whole: unique names, valid
+    ``pattern`` options, links to fields of the same definition and no
+    cycles. Returns a list of messages.
+    """
+    names = [definition['name'] for definition in field_definitions]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        return [f'Duplicate field names: {", ".join(duplicates)}.']
+
+    errors = []
+    nodes = []
+    for definition in field_definitions:
+        options = definition.get('options')
+        error = pattern_error(options.get('pattern')) if hasattr(options, 'get') else None
+        if error:
+            errors.append(f"Field '{definition['name']}' pattern: {error}")
+        controller = definition.get('conditional_field')
+        condition = None
+        if controller:
+            if controller not in names:
+                errors.append(f"Field '{definition['name']}' depends on unknown field '{controller}'.")
+            elif controller == definition['name']:
+                errors.append(f"Field '{definition['name']}' cannot depend on itself.")
+            else:
+                condition = ConditionRule(None, controller, definition.get('conditional_operator'), definition.get('conditional_value'))
+        nodes.append(SimpleNamespace(name=definition['name'], is_required=False, condition=condition))
+    if errors:
+        return errors
+
+    try:
+        ConditionGraph(nodes)
+    except ConditionCycleError as exc:
+        return [str(exc)]
+    return []
+
+
+def export_form(form_id):
+    """Returns the definition document of a form (two queries)."""
+    from .serializers import FormDefinitionSerializer
+
+    form = Form.objects.for_serialization().get(pk=form_id)
+    return FormDefinitionSerializer(form).data
+
+
+@transaction.atomic
+def import_form(form_data, field_definitions, created_by=None):
+    """
+    Creates a form and all of its fields from validated definition data and
+    returns the form. Links are stored in a second pass once every field has
+    a primary key.
+    """
+    form = Form.objects.create(created_by=created_by, **form_data)
+
+    links = {}
+    fields = []
+    for definition in field_definitions:
+        definition = dict(definition)
+        controller = definition.pop('conditional_field', None)
+        if controller:
+            links[definition['name']] = controller
+        fields.append(Field(form=form, **definition))
+    fields = Field.objects.bulk_create(fields)
+
+    by_name = {field.name: field for field in fields}
+    linked = []
+    for name, controller in links.items():
+        by_name[name].conditional_field = by_name[controller]
+        linked.append(by_name[name])
+    if linked:
+        Field.objects.bulk_update(linked, ['conditional_field'])
+
+    # bulk writes send no signals, so the compiled schema and cached responses are dropped here
+    transaction.on_commit(lambda: invalidate_form_schema(form.id))
+    transaction.on_commit(lambda: invalidate_form_responses(form.id, [field.id for field in fields]))
+    for field in fields:
+        if field.is_searchable:
+            transaction.on_commit(lambda field_id=field.id: sync_search_index.delay(field_id))
+    return form
@@ -0,0 +1,211 @@
+"""
+Resumable, chunked file uploads.
+
+Instead of sending a whole scan in the multipart submission, a client:
+
+1. creates an ``Upload`` with the file's name, type and size (``POST uploads/``);
+2. sends the bytes in any number of ``PATCH uploads/<id>/`` requests, each
+   with an ``Upload-Offset`` header saying where its body starts. ``HEAD`` (or
+   ``GET``) returns the offset reached so far, so after a dropped connection
+   the client resumes from there instead of starting over;
+3. finalizes it (``POST uploads/<id>/finalize/``) once every byte is in, which
+   moves the file into document storage (a ``Blob``, see blobs.py, so a file
+   that is already stored is not written again);
+4. attaches it to a submission as a ``Document``
+   (``POST submissions/<id>/documents/``), without copying the bytes again.
+
+Clients that can reach the object store create a direct upload instead
+(``POST direct-uploads/`` with the file's sha256), PUT the file to the
+returned presigned URL (see object_storage.py) and finalize it the same way.
+The web workers then only see those small JSON calls: finalizing checks the
+object's size and checksum with the store and copies it into document storage
+there.
+
+Chunks are written to a staging file under ``UPLOAD_STAGING_ROOT`` as they
+are read from the request, ``UPLOAD_READ_SIZE`` bytes at a time, so neither a
+chunk nor the file is ever held in memory. Each chunk is written at its
+declared offset, which must be the offset reached so far, and the offset only
+moves forward with a compare-and-set update, so a retried chunk rewrites the
+same bytes instead of duplicating them.
+"""
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+from .attachments import check_upload
+from .blobs import adopt_blob, store_blob
+from .object_storage import get_object_storage
+from .models import Document, Upload
+
+
+DEFAULT_MAX_SIZE = 50 * 1024 * 1024
+DEFAULT_READ_SIZE = 64 * 1024
+
+
+class UploadOffsetConflict(Exception):
+    """A chunk does not start where the upload stands; ``offset`` is where it does."""
+
+    def __init__(self, offset):
+        super().__init__(f'Upload is at offset {offset}.')
+        self.offset = offset
+
+
+class UploadError(ValueError):
+    pass
+
+
+def get_max_size():
+    return getattr(settings, 'UPLOAD_MAX_SIZE', DEFAULT_MAX_SIZE)
+
+
+def staging_storage():
+    location = getattr(settings, 'UPLOAD_STAGING_ROOT', None) or os.path.join(settings.MEDIA_ROOT, 'partial')
+    return FileSystemStorage(location=location)
+
+
+def staging_path(upload):
+    return staging_storage().path(f'{upload.pk}.part')
+
+
+def create_upload(user, filename, size, content_type=''):
+    """Records a new upload and creates its empty staging file."""
+    if size > get_max_size():
+        raise UploadError(f'Files may be at most {get_max_size()} bytes.')
+    upload = Upload.objects.create(user=user, filename=filename, size=size, content_type=content_type)
+    path = staging_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Writes ``length`` bytes read from ``stream`` at ``offset`` of the upload
+    and returns the new offset. Raises ``UploadOffsetConflict`` when ``offset``
+    is not where the upload stands and ``UploadError`` when the chunk would
+    run past the declared size.
+    """
+    if upload.state != 'uploading':
+        raise UploadError('Upload is already complete.')
+    if upload.object_key:
+        raise UploadError('Direct uploads are sent to their upload URL.')
+    if offset != upload.offset:
+        raise UploadOffsetConflict(upload.offset)
+    if offset + length > upload.size:
+        raise UploadError(f'Chunk runs past the declared size of {upload.size} bytes.')
+
+    read_size = getattr(settings, 'UPLOAD_READ_SIZE', DEFAULT_READ_SIZE)
+    written = 0
+    with open(staging_path(upload), 'r+b') as file:
+        file.seek(offset)
+        # a dropped connection keeps what was written; the client resumes from there
+        while written < length:
+            piece = stream.read(min(read_size, length - written))
+            if not piece:
+                break
+            file.write(piece)
+            written += len(piece)
+
+    moved = Upload.objects.filter(pk=upload.pk, offset=offset).update(offset=offset + written)
+    if not moved:
+        # another request for the same chunk got there first
+        upload.refresh_from_db(fields=['offset'])
+        raise UploadOffsetConflict(upload.offset)
+    upload.offset = offset + written
+    return upload.offset
+
+
+def create_direct_upload(user, filename, size, sha256, content_type=''):
+    """
+    Records an upload the client sends straight to the object store and
+    returns it with the presigned URL and the headers the PUT must carry.
+    """
+    if size > get_max_size():
+        raise UploadError(f'Files may be at most {get_max_size()} bytes.')
+    upload = Upload(user=user, filename=filename, size=size, content_type=content_type, sha256=sha256)
+    upload.object_key = f'incoming/{upload.pk}'
+    upload.save()
+    url, headers = get_object_storage().presign_put(
+        upload.object_key, content_type or 'application/octet-stream', size, sha256
+    )
+    return upload, url, headers
+
+
+def _finalize_direct_upload(upload):
+    storage = get_object_storage()
+    stored = storage.head(upload.object_key)
+    if stored is None:
+        raise UploadError('The file has not been uploaded yet.')
+    if stored != (upload.size, upload.sha256):
+        storage.delete(upload.object_key)
+        raise UploadError('The uploaded file does not match the declared size and checksum.')
+
+    blob = adopt_blob(upload.sha256, upload.size, lambda name: storage.promote(upload.object_key, name))
+    upload.blob, upload.file, upload.offset, upload.state = blob, blob.file.name, upload.size, 'complete'
+    upload.save(update_fields=['blob', 'file', 'offset', 'state', 'updated_at'])
+    storage.delete(upload.object_key)
+    return upload
+
+
+def finalize_upload(upload):
+    """Moves a fully received upload from staging into document storage, taking a blob reference."""
+    if upload.state != 'uploading':
+        return upload
+    if upload.object_key:
+        return _finalize_direct_upload(upload)
+    if upload.offset != upload.size:
+        raise UploadError(f'Upload has {upload.offset} of {upload.size} bytes.')
+
+    path = staging_path(upload)
+    with open(path, 'rb') as file:
+        blob = store_blob(file)
+    upload.blob, upload.file, upload.state = blob, blob.file.name, 'complete'
+    upload.save(update_fields=['blob', 'file', 'state', 'updated_at'])
+    os.remove(path)
+    return upload
+
+
+def attach_upload(upload, submission, field):
+    """
+    Creates the ``Document`` of a completed upload; the stored file is shared,
+    not copied, and the upload's blob reference passes to the document. The
+    field's limits on size, type and number of files apply, as they do to
+    files sent with the submission (see attachments.py).
+    """
+    with transaction.atomic():
+        attached = Document.objects.filter(submission=submission, field=field).count()
+        errors = check_upload(field, upload, attached)
+        if errors:
+            raise UploadError(' '.join(errors))
+        # one document per upload, even with two attach requests in flight
+        claimed = Upload.objects.filter(pk=upload.pk, state='complete').update(state='attached')
+        if not claimed:
+            raise UploadError('Only a complete upload that is not attached yet can be attached.')
+        upload.state = 'attached'
+        return Document.objects.create(
+            submission=submission,
+            field=field,
+            blob=upload.blob,
+            file=upload.file.name,
+            filename=upload.filename,
+        )
+
+
+def discard_upload(upload):
+    """
+    Deletes an upload that is not attached, with its staging file. Its blob
+    reference is released by the ``post_delete`` signal.
+    """
+    if upload.state == 'attached':
+        raise UploadError('Attached uploads belong to their document.')
+    path = staging_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    if upload.object_key and upload.state == 'uploading':
+        get_object_storage().delete(upload.object_key)
+    if upload.file and upload.blob_id is None:
+        # finalized before blobs: the file is the upload's own
+        upload.file.delete(save=False)
+    upload.delete()
@@ -3,10 +3,28 @@ from .views import *
 
 urlpatterns = [
     path('forms/', FormCreateListAPIView.as_view(), name='form-list-create'),
+    path('forms/import/', FormImportAPIView.as_view(), name='form-import'),
+    path('forms/<int:pk>/export/', FormExportAPIView.as_view(), name='form-export'),
     path('forms/<int:pk>/', FormRetrieveUpdateDestroyAPIView.as_view(), name='form-retrieve-update-destroy'),
+    path('forms/<int:pk>/publish/', FormPublishAPIView.as_view(), name='form-publish'),
+    path('forms/<int:pk>/statistics/', FormStatisticsAPIView.as_view(), name='form-statistics'),
+    path('forms/<int:pk>/submissions/export/', SubmissionExportCreateAPIView.as_view(), name='submission-export-create'),
+    path('snapshots/<int:pk>/', FormSnapshotRetrieveAPIView.as_view(), name='snapshot-retrieve'),
+    path('forms/<int:pk>/validate/', FormValidateAPIView.as_view(), name='form-validate'),
     path('fields/', FieldCreateListAPIView.as_view(), name='field-list-create'),
     path('fields/<int:pk>/', FieldRetrieveUpdateDestroyAPIView.as_view(), name='field-retrieve-update-destroy'), 
     path('submissions/', SubmissionCreateListAPIView.as_view(), name='submission-list-create'),
+    path('submissions/bulk/', SubmissionBulkIngestAPIView.as_view(), name='submission-bulk-ingest'),
+    path('submissions/dashboard/', SubmissionDashboardAPIView.as_view(), name='submission-dashboard'),
     path('submissions/<int:pk>/', SubmissionRetrieveUpdateDestroyAPIView.as_view(), name='submission-retrieve-update-destroy'),   
+    path('submissions/<int:pk>/documents/', SubmissionDocumentCreateAPIView.as_view(), name='submission-document-create'),
+    path('documents/<int:pk>/download/', DocumentDownloadAPIView.as_view(), name='document-download'),
+    path('uploads/', UploadCreateAPIView.as_view(), name='upload-create'),
+    path('uploads/<uuid:pk>/', UploadAPIView.as_view(), name='upload-detail'),
+    path('direct-uploads/', DirectUploadCreateAPIView.as_view(), name='direct-upload-create'),
+    path('direct-uploads/local/<str:token>/', DirectUploadPutAPIView.as_view(), name='direct-upload-put'),
+    path('uploads/<uuid:pk>/finalize/', UploadFinalizeAPIView.as_view(), name='upload-finalize'),
+    path('submission-exports/<int:pk>/', SubmissionExportRetrieveAPIView.as_view(), name='submission-export-retrieve'),
+    path('submission-exports/<int:pk>/download/', SubmissionExportDownloadAPIView.as_view(), name='submission-export-download'),
     path('my_submissions/', MySubmissions.as_view(), name='my-submissions'),
 ]
\ No newline at end of file
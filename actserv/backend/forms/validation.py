@@ -0,0 +1,236 @@
+"""
+Server-side validation of submission payloads.
+
+A form schema is compiled once into a flat list of type-specialised check
+closures. Validating a payload is then a single pass over that list, and every
+error is collected so the client gets all of them in one response.
+"""
+import re
+
+from .conditions import ConditionCycleError, condition_holds
+from .values import is_empty, parse_bool, parse_date, parse_number
+
+
+REQUIRED_MESSAGE = 'This field is required.'
+BROKEN_PATTERN_MESSAGE = 'Cannot be checked: the format rule of this field is invalid.'
+
+
+def pattern_error(pattern):
+    """Message for a ``pattern`` option that is not a valid regular expression, or None."""
+    if pattern is None:
+        return None
+    if not isinstance(pattern, str):
+        return 'Must be a regular expression string.'
+    try:
+        re.compile(pattern)
+    except re.error as exc:
+        return f'Invalid regular expression: {exc}.'
+    return None
+
+
+def _text_check(field):
+    min_length, max_length = field.min_length, field.max_length
+    try:
+        pattern = re.compile(field.pattern) if field.pattern else None
+        broken = False
+    except (re.error, TypeError):
+        # stored before patterns were checked: fail this field, not the whole form
+        pattern, broken = None, True
+
+    def check(value):
+        if not isinstance(value, str):
+            return ['Must be a string.']
+        if broken:
+            return [BROKEN_PATTERN_MESSAGE]
+        errors = []
+        if min_length is not None and len(value) < min_length:
+            errors.append(f'Must be at least {min_length} characters long.')
+        if max_length is not None and len(value) > max_length:
+            errors.append(f'Must be at most {max_length} characters long.')
+        if pattern is not None and not pattern.fullmatch(value):
+            errors.append('Has an invalid format.')
+        return errors
+
+    return check
+
+
+def _number_check(field):
+    minimum, maximum = field.minimum, field.maximum
+
+    def check(value):
+        number = parse_number(value)
+        if number is None:
+            return ['Must be a number.']
+        errors = []
+        if minimum is not None and number < minimum:
+            errors.append(f'Must be greater than or equal to {minimum}.')
+        if maximum is not None and number > maximum:
+            errors.append(f'Must be less than or equal to {maximum}.')
+        return errors
+
+    return check
+
+
+def _date_check(field):
+    minimum, maximum = field.minimum, field.maximum
+
+    def check(value):
+        date = parse_date(value)
+        if date is None:
+            return ['Must be a date in YYYY-MM-DD format.']
+        errors = []
+        if minimum is not None and date < minimum:
+            errors.append(f'Must be on or after {minimum.isoformat()}.')
+        if maximum is not None and date > maximum:
+            errors.append(f'Must be on or before {maximum.isoformat()}.')
+        return errors
+
+    return check
+
+
+def _dropdown_check(field):
+    allowed = {str(choice) for choice in field.choices or ()}
+    listing = ', '.join(str(choice) for choice in field.choices or ())
+
+    def check(value):
+        if allowed and (isinstance(value, (list, dict)) or str(value) not in allowed):
+            return [f'Must be one of: {listing}.']
+        return []
+
+    return check
+
+
+def _checkbox_check(field):
+    if field.choices:
+        allowed = {str(choice) for choice in field.choices}
+
+        def check(value):
+            values = value if isinstance(value, list) else [value]
+            invalid = [str(item) for item in values if str(item) not in allowed]
+            if invalid:
+                return [f'Invalid choice(s): {", ".join(invalid)}.']
+            return []
+
+        return check
+
+    required = field.is_required
+
+    def check(value):
+        checked = parse_bool(value)
+        if checked is None:
+            return ['Must be true or false.']
+        if required and not checked:
+            return ['This box must be checked.']
+        return []
+
+    return check
+
+
+CHECK_BUILDERS = {
+    'text': _text_check,
+    'number': _number_check,
+    'date': _date_check,
+    'dropdown': _dropdown_check,
+    'checkbox': _checkbox_check,
+}
+
+
+class CompiledValidator:
+    """
+    Flat list of ``(name, required, controller, condition, check)`` entries compiled
+    from a ``FormSchema`` in topological order, so a field's controller is always
+    resolved before the field itself. File fields take part in visibility but
+    their uploads are checked separately.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.cycle_error = None
+        try:
+            self.graph = schema.graph
+        except ConditionCycleError as exc:
+            self.graph, self.cycle_error, self.checks = None, exc, []
+            return
+        fields = schema.fields_by_name
+        self.checks = [
+            (
+                name,
+                fields[name].is_required,
+                self.graph.controllers.get(name),
+                fields[name].condition,
+                CHECK_BUILDERS[fields[name].type](fields[name]) if fields[name].type in CHECK_BUILDERS else None,
+            )
+            for name in self.graph.order
+        ]
+
+    def _invalid_payload(self, payload):
+        if self.cycle_error is not None:
+            return {'non_field_errors': [str(self.cycle_error)]}
+        if not isinstance(payload, dict):
+            return {'non_field_errors': ['Submission data must be a JSON object.']}
+        return None
+
+    def validate(self, payload):
+        """Returns ``{field_name: [messages]}`` for every invalid answer (empty when valid)."""
+        invalid = self._invalid_payload(payload)
+        if invalid:
+            return invalid
+
+        errors = {}
+        visible = {}
+        get = payload.get
+        for name, required, controller, condition, check in self.checks:
+            shown = controller is None or (visible[controller] and condition_holds(condition, get(controller)))
+            visible[name] = shown
+            if not shown or check is None:
+                continue
+            value = get(name)
+            if is_empty(value):
+                if required:
+                    errors[name] = [REQUIRED_MESSAGE]
+                continue
+            messages = check(value)
+            if messages:
+                errors[name] = messages
+        return errors
+
+    def validate_partial(self, payload, changed, states=None):
+        """
+        Validates only the fields affected by the ``changed`` answers (the changed
+        fields and everything depending on them), e.g. for autosave. Returns
+        ``(errors, states, affected)`` where ``states`` maps names to ``FieldState``.
+        """
+        invalid = self._invalid_payload(payload)
+        if invalid:
+            return invalid, {}, set()
+
+        states, affected = self.graph.reevaluate(payload, changed, states)
+        errors = {}
+        for name, _, _, _, check in self.checks:
+            if name not in affected or check is None or not states[name].visible:
+                continue
+            value = payload.get(name)
+            if is_empty(value):
+                if states[name].required:
+                    errors[name] = [REQUIRED_MESSAGE]
+                continue
+            messages = check(value)
+            if messages:
+                errors[name] = messages
+        return errors, states, affected
+
+    def visibility(self, payload):
+        """Returns ``{field_name: FieldState}`` for the whole form."""
+        return self.graph.evaluate(payload)
+
+    def is_valid(self, payload):
+        return not self.validate(payload)
+
+    def validate_many(self, payloads):
+        """Validates a batch of payloads against this schema; returns one error dict per payload."""
+        validate = self.validate
+        return [validate(payload) for payload in payloads]
+
+
+def compile_validator(schema):
+    return CompiledValidator(schema)
@@ -0,0 +1,57 @@
+"""
+Coercion helpers for submitted answers and option values.
+"""
+import datetime
+import math
+from decimal import Decimal, InvalidOperation
+
+
+TRUE_STRINGS = {'true', 'on', 'yes', '1'}
+FALSE_STRINGS = {'false', 'off', 'no', '0'}
+
+
+def is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+
+def parse_number(value):
+    """Returns ``value`` as a finite Decimal, or None when it is not a number."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, Decimal)):
+        return Decimal(value)
+    if isinstance(value, float):
+        return Decimal(str(value)) if math.isfinite(value) else None
+    if isinstance(value, str):
+        try:
+            number = Decimal(value.strip())
+        except InvalidOperation:
+            return None
+        return number if number.is_finite() else None
+    return None
+
+
+def parse_date(value):
+    """Returns ``value`` as a date (ISO ``YYYY-MM-DD``, time part ignored), or None."""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.date.fromisoformat(value.strip()[:10])
+    except ValueError:
+        return None
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in TRUE_STRINGS:
+            return True
+        if lowered in FALSE_STRINGS:
+            return False
+    return None
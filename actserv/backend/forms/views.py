@@ -9,25 +9,58 @@ from .serializers import *
 from rest_framework_simplejwt.tokens import RefreshToken,AccessToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
+from django.http import Http404, FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.urls import reverse
 from .tasks import *
+from .schema import get_form_schema
+from .pagination import KeysetPaginator
+from .representation import Representation
+from .filters import SubmissionFilter
+from .streaming import get_stream_format, stream_queryset
+from .parsers import NDJSONParser
+from .ingest import ingest_submissions, get_max_records
+from .transfer import export_form
+from .snapshots import publish_form, get_snapshot_schema
+from .etags import conditional_get, form_list_validators, form_validators, field_validators
+from .response_cache import cached_response
+from .counters import dashboard, DEFAULT_DASHBOARD_DAYS, MAX_DASHBOARD_DAYS
+from .analytics import field_statistics, DEFAULT_BINS, MAX_BINS
+from .values import parse_date
+from .attachments import match_files
+from .blobs import store_documents
+from .uploads import UploadError, UploadOffsetConflict, attach_upload, create_direct_upload, create_upload, discard_upload, finalize_upload, write_chunk
+from .object_storage import ObjectRejected, get_object_storage
+from .outbox import enqueue
+from rest_framework.parsers import JSONParser
 
 class FormCreateListAPIView(APIView):
     """
     FETCHING ALL FORMS 
     """
     serializer_class = FormSerializer
+    query_budget = {'GET': 3, 'POST': 8}
 
     def get_permissions(self):
         if self.request.method == 'GET':
             return [AllowAny()]
         return [IsAdminUser()]
     
+    @cached_response(lambda: ['forms'])
+    @conditional_get(form_list_validators)
     def get(self, request):
 
-        forms = Form.objects.all()
-        serializer = self.serializer_class(forms, many = True)
+        representation = Representation.from_request(request)
+        forms = Form.objects.for_serialization(representation)
+        stream_format = get_stream_format(request)
+        if stream_format:
+            serializer = self.serializer_class(context={'representation': representation})
+            return stream_queryset(forms, serializer, stream_format)
+        serializer = self.serializer_class(forms, many = True, context={'representation': representation})
         return Response({'message':'Success','data':serializer.data},status=status.HTTP_200_OK)
     
     """
@@ -50,6 +83,7 @@ class FormRetrieveUpdateDestroyAPIView(APIView):
     helper method for getting a particular form by id
     """
     serializer_class = FormSerializer
+    query_budget = {'GET': 3, 'PUT': 8, 'DELETE': 18}
     
     def get_permissions(self):
         if self.request.method in ['PUT', 'DELETE']:
@@ -57,12 +91,23 @@ class FormRetrieveUpdateDestroyAPIView(APIView):
         return [AllowAny()] # Allow GET requests (retrieve) for anyone
     
     def get_object(self, pk):
-        return get_object_or_404(Form, pk=pk)
+        return get_object_or_404(Form.objects.for_serialization(), pk=pk)
 
+    @cached_response(lambda pk: [f'form:{pk}'])
+    @conditional_get(form_validators)
     def get(self, request, pk):
-        form = self.get_object(pk)
-        serializer = self.serializer_class(form)
-        return Response({'message':'Success', 'data':serializer.data}, status=status.HTTP_200_OK)
+        representation = Representation.from_request(request)
+        if not representation.is_default:
+            form = get_object_or_404(Form.objects.for_serialization(representation), pk=pk)
+            serializer = self.serializer_class(form, context={'representation': representation})
+            return Response({'message':'Success', 'data':serializer.data}, status=status.HTTP_200_OK)
+
+        # served from the compiled schema cache; once warm only the ETag lookup hits the database
+        try:
+            schema = get_form_schema(pk)
+        except Form.DoesNotExist:
+            raise Http404
+        return Response({'message':'Success', 'data':schema.representation}, status=status.HTTP_200_OK)
     
     def put(self, request, pk):
         form = self.get_object(pk)
@@ -81,19 +126,168 @@ class FormRetrieveUpdateDestroyAPIView(APIView):
         return Response({'message':'Form delete successfully'},status=status.HTTP_204_NO_CONTENT)
 
 
+class FormValidateAPIView(APIView):
+    """
+    Validates a (partial) payload against a form without saving it. With
+    `changed` only those answers and the fields depending on them are checked,
+    which is what autosave calls need.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = PartialValidationSerializer
+    query_budget = {'POST': 4}
+
+    def post(self, request, pk):
+        try:
+            schema = get_form_schema(pk)
+        except Form.DoesNotExist:
+            raise Http404
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response({'message':'Failed to validate', 'data':serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        payload = serializer.validated_data['data']
+        changed = serializer.validated_data.get('changed')
+        validator = schema.validator
+        if changed:
+            errors, states, affected = validator.validate_partial(payload, changed)
+        else:
+            errors = validator.validate(payload)
+            states = validator.visibility(payload) if validator.graph else {}
+            affected = set(states)
+        fields = {
+            name: {'visible': states[name].visible, 'required': states[name].required}
+            for name in affected
+        }
+        return Response({'message':'Success', 'data':{'errors':errors, 'fields':fields}}, status=status.HTTP_200_OK)
+
+
+class FormImportAPIView(APIView):
+    """
+    Creates a form and all of its fields from one definition document, in a
+    single transaction (see forms/transfer.py for the format).
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = FormDefinitionSerializer
+    query_budget = {'POST': 8}
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid():
+            form = serializer.save(created_by=request.user)
+            return Response({'message':'Form imported successfully', 'data':{'id':form.id, **serializer.data}}, status=status.HTTP_201_CREATED)
+        return Response({'message':'Failed to import form', 'data':serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class FormExportAPIView(APIView):
+    """
+    Returns a form and all of its fields as one definition document that
+    `forms/import/` accepts.
+    """
+    permission_classes = [IsAdminUser]
+    query_budget = {'GET': 3}
+
+    def get(self, request, pk):
+        try:
+            definition = export_form(pk)
+        except Form.DoesNotExist:
+            raise Http404
+        return Response({'message':'Success', 'data':definition}, status=status.HTTP_200_OK)
+
+
+class FormPublishAPIView(APIView):
+    """
+    Freezes the current definition of a form as a new snapshot version. An
+    unchanged definition returns the snapshot it was already published as.
+    """
+    permission_classes = [IsAdminUser]
+    query_budget = {'POST': 9}
+
+    def post(self, request, pk):
+        try:
+            snapshot, created = publish_form(pk, published_by=request.user)
+        except Form.DoesNotExist:
+            raise Http404
+        data = {'id':snapshot.id, 'form':snapshot.form_id, 'version':snapshot.version, 'created_at':snapshot.created_at}
+        if created:
+            return Response({'message':'Form published successfully', 'data':data}, status=status.HTTP_201_CREATED)
+        return Response({'message':'Form is already published', 'data':data}, status=status.HTTP_200_OK)
+
+
+class FormStatisticsAPIView(APIView):
+    """
+    Distributions of a form's number and date answers (min, max, mean,
+    percentiles, histogram, null ratio), optionally for one `status` and the
+    submissions made between `since` and `until`. `field` (repeatable) limits
+    the fields, `bins` sets the histogram size. See forms/analytics.py.
+    """
+    permission_classes = [IsAdminUser]
+    # a cold schema plus one streamed read of the new submissions (warm: that read and one count)
+    query_budget = {'GET': 4}
+
+    def get(self, request, pk):
+        params = request.query_params
+        errors = {}
+        status_filter = params.get('status') or None
+        if status_filter is not None and status_filter not in dict(Submission.STATUS_CHOICES):
+            errors['status'] = f'Must be one of: {", ".join(dict(Submission.STATUS_CHOICES))}.'
+        dates = {}
+        for param in ('since', 'until'):
+            raw = params.get(param) or None
+            dates[param] = parse_date(raw) if raw is not None else None
+            if raw is not None and dates[param] is None:
+                errors[param] = 'Must be a date (YYYY-MM-DD).'
+        bins = params.get('bins') or str(DEFAULT_BINS)
+        if not bins.isdigit() or not 1 <= int(bins) <= MAX_BINS:
+            errors['bins'] = f'Must be a number between 1 and {MAX_BINS}.'
+        if errors:
+            raise ValidationError(errors)
+
+        try:
+            data = field_statistics(
+                pk, names=params.getlist('field') or None, status=status_filter, bins=int(bins), **dates
+            )
+        except Form.DoesNotExist:
+            raise Http404
+        return Response({'message':'Success', 'data':data}, status=status.HTTP_200_OK)
+
+
+class FormSnapshotRetrieveAPIView(APIView):
+    """
+    A published form version. Snapshots never change, so responses may be
+    cached by clients and proxies for good.
+    """
+    permission_classes = [AllowAny]
+    query_budget = {'GET': 1}
+
+    def get(self, request, pk):
+        try:
+            schema = get_snapshot_schema(pk)
+        except FormSnapshot.DoesNotExist:
+            raise Http404
+        response = Response({'message':'Success', 'data':schema.representation}, status=status.HTTP_200_OK)
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+
 class FieldCreateListAPIView(APIView):
     """
     API view to create and list all form fields
     """
     serializer_class = FieldSerializer
+    query_budget = {'GET': 2, 'POST': 7}
     
     def get_permissions(self):
         if self.request.method == 'GET':
             return [AllowAny()]
         return [IsAdminUser()]
     
+    @cached_response(lambda: ['forms'])
+    @conditional_get(form_list_validators)
     def get(self, request):
-        fields = Field.objects.all()
+        fields = Field.objects.for_serialization()
+        stream_format = get_stream_format(request)
+        if stream_format:
+            return stream_queryset(fields, self.serializer_class(), stream_format)
         serializer = self.serializer_class(fields, many=True)
         return Response({'message':'Success','data':serializer.data}, status=status.HTTP_200_OK)
     
@@ -113,15 +307,18 @@ class FieldCreateListAPIView(APIView):
 class FieldRetrieveUpdateDestroyAPIView(APIView):
     
     serializer_class = FieldSerializer
+    query_budget = {'GET': 2, 'PUT': 7, 'DELETE': 7}
     
     def get_object(self, pk):
-        return get_object_or_404(Field,pk=pk)
+        return get_object_or_404(Field.objects.for_serialization(), pk=pk)
  
     def get_permissions(self):
         if self.request.method in ['PUT', 'DELETE']:
             return [IsAdminUser()]
         return [AllowAny()] 
     
+    @cached_response(lambda pk: [f'field:{pk}'])
+    @conditional_get(field_validators)
     def get(self, request,pk):
         field = self.get_object(pk)
         serializer = self.serializer_class(field)
@@ -144,12 +341,21 @@ class FieldRetrieveUpdateDestroyAPIView(APIView):
 class SubmissionCreateListAPIView(APIView):
     
     serializer_class = SubmissionSerializer
+    query_budget = {'GET': 5, 'POST': 17}
     permission_classes = [IsAuthenticated]
    
     def get(self, request):
-        submissions = Submission.objects.all()
-        serializer = self.serializer_class(submissions, many = True)
-        return Response({'message':'Success', 'data':serializer.data}, status=status.HTTP_200_OK)
+        representation = Representation.from_request(request)
+        submissions = Submission.objects.for_serialization(representation)
+        submission_filter = SubmissionFilter.from_request(request)
+        submissions = submission_filter.apply(submissions)
+        stream_format = get_stream_format(request)
+        if stream_format:
+            serializer = self.serializer_class(context={'representation': representation})
+            return stream_queryset(submissions, serializer, stream_format)
+        submissions, next_cursor = KeysetPaginator(submission_filter.ordering).paginate(submissions, request)
+        serializer = self.serializer_class(submissions, many = True, context={'representation': representation})
+        return Response({'message':'Success', 'data':serializer.data, 'next':next_cursor}, status=status.HTTP_200_OK)
    
     def post(self, request):
        
@@ -159,35 +365,29 @@ class SubmissionCreateListAPIView(APIView):
             'data': data.get('data') 
         }
         serializer = self.serializer_class(data=serializer_input_data, context={'request': request})
-        file_fields_to_process = {}
-        if 'Image' in data:  
-            file_fields_to_process['Image'] = data.getlist('Image')
         if serializer.is_valid():
+            # files are matched against the form's file fields from the cached schema
+            uploads, file_errors = match_files(
+                get_form_schema(serializer.validated_data['form_id']), request.FILES, serializer.validated_data.get('data')
+            )
+            if file_errors:
+                return Response(
+                    {'message': 'Failed to submit form', 'data': {'files': file_errors}},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             try:
                 with transaction.atomic():
                     submission = serializer.save(user=request.user)
-                    for field_name, uploaded_files in file_fields_to_process.items():
-                        try:
-                            form_field_instance = Field.objects.get(
-                                form_id=submission.form_id, 
-                                name=field_name
-                            )
-                        except Field.DoesNotExist:
-                            print(f"Warning: Field with name '{field_name}' not found for form ID {submission.form_id}")
-                            continue
-
-                        for uploaded_file in uploaded_files:
-                            Document.objects.create(
-                                submission=submission,
-                                field=form_field_instance,
-                                file=uploaded_file
-                            )
-                    # notify_admin_of_submission.delay(
-                    #     submission_id=submission.id,
-                    #     form_name=submission.form.name, 
-                    #     client_email=request.user.email
-                    # )
-                           
+                    store_documents(submission, uploads)
+                    # the response lists the documents with their blobs: one query, whatever the number of files
+                    prefetch_related_objects([submission], Prefetch('documents', queryset=Document.objects.select_related('blob')))
+                    # relayed to notify_admin_of_submission once this commits (see outbox.py)
+                    enqueue('submission.created', {
+                        'submission_id': submission.id,
+                        'form_name': get_form_schema(submission.form_id).name,
+                        'client_email': request.user.email,
+                    })
+
                     return Response(
                         {'message': 'Form submitted successfully', 'data': serializer.data}, 
                         status=status.HTTP_201_CREATED
@@ -205,9 +405,311 @@ class SubmissionCreateListAPIView(APIView):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+class SubmissionBulkIngestAPIView(APIView):
+    """
+    Ingests many submissions in one request, as an NDJSON body
+    (`application/x-ndjson`) or a JSON array. Every record is validated against
+    its form and the valid ones are stored in batches; the response holds one
+    result per record, in input order.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser]
+    # one batch with its counters, one (cold) form schema and its first snapshot
+    query_budget = {'POST': 16}
+
+    def post(self, request):
+        records = request.data
+        if not isinstance(records, list):
+            return Response({'message':'Failed to ingest submissions', 'data':{'non_field_errors':['Expected a list of records.']}}, status=status.HTTP_400_BAD_REQUEST)
+        if len(records) > get_max_records():
+            return Response({'message':'Failed to ingest submissions', 'data':{'non_field_errors':[f'At most {get_max_records()} records per request.']}}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        results = ingest_submissions(records, request.user)
+        created = sum(result['status'] == 'created' for result in results)
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {'message':f'{created} of {len(results)} submissions created', 'data':{'created':created, 'failed':len(results) - created, 'results':results}},
+            status=response_status
+        )
+
+
+class SubmissionDashboardAPIView(APIView):
+    """
+    Submission totals per form and status plus daily intake for the admin
+    dashboard, read from the counters in forms/counters.py (`?days=30`,
+    `?form=<id>`).
+    """
+    permission_classes = [IsAdminUser]
+    query_budget = {'GET': 3}
+
+    def get(self, request):
+        errors = {}
+        days = request.query_params.get('days') or str(DEFAULT_DASHBOARD_DAYS)
+        if not days.isdigit() or not 1 <= int(days) <= MAX_DASHBOARD_DAYS:
+            errors['days'] = f'Must be a number of days between 1 and {MAX_DASHBOARD_DAYS}.'
+        form_id = request.query_params.get('form') or None
+        if form_id is not None and not form_id.isdigit():
+            errors['form'] = 'Must be a form id.'
+        if errors:
+            raise ValidationError(errors)
+        data = dashboard(int(days), int(form_id) if form_id else None)
+        return Response({'message':'Success', 'data':data}, status=status.HTTP_200_OK)
+
+
+class SubmissionDocumentCreateAPIView(APIView):
+    """
+    Attaches a finished resumable upload (see forms/uploads.py) to one of the
+    submission's file fields as a Document.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = DocumentAttachSerializer
+    query_budget = {'POST': 8}
+
+    def post(self, request, pk):
+        submission = get_object_or_404(Submission.objects.only('id', 'form', 'user'), pk=pk)
+        if submission.user_id != request.user.id and not request.user.is_staff:
+            raise Http404
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response({'message':'Failed to attach document', 'data':serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        field = get_object_or_404(Field, pk=serializer.validated_data['field_id'], form_id=submission.form_id, type='file')
+        # the blob comes along for the response's digest and size
+        upload = get_object_or_404(Upload.objects.select_related('blob'), pk=serializer.validated_data['upload_id'], user=request.user)
+        try:
+            document = attach_upload(upload, submission, field)
+        except UploadError as exc:
+            return Response({'message':'Failed to attach document', 'data':{'upload_id':[str(exc)]}}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'message':'Document attached successfully', 'data':DocumentSerializer(document).data}, status=status.HTTP_201_CREATED)
+
+
+class DocumentDownloadAPIView(APIView):
+    """
+    Streams a document's file to the submission's owner or an admin. The
+    ETag is the content digest, so If-None-Match answers 304 without reading
+    the file, and a changed file shows up as a changed tag.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = {'GET': 1}
+
+    def get(self, request, pk):
+        document = get_object_or_404(Document.objects.select_related('blob', 'submission'), pk=pk)
+        if document.submission.user_id != request.user.id and not request.user.is_staff:
+            raise Http404
+        etag = quote_etag(document.blob.digest) if document.blob_id else None
+        if etag:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+        response = FileResponse(document.file.open('rb'), as_attachment=True, filename=document.filename or document.file.name.rsplit('/', 1)[-1])
+        if etag:
+            response['ETag'] = etag
+        # the content behind a document never changes, but who may read it can
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class SubmissionExportCreateAPIView(APIView):
+    """
+    Starts a full export of a form's submissions (`format`: csv or parquet,
+    optionally only one `status`) in the worker. Poll the returned export for
+    its progress and download link.
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = SubmissionExportSerializer
+    query_budget = {'POST': 3}
+
+    def post(self, request, pk):
+        form = get_object_or_404(Form.objects.only('id'), pk=pk)
+        serializer = self.serializer_class(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            export = serializer.save(form=form, requested_by=request.user)
+            transaction.on_commit(lambda: export_submissions.delay(export.id))
+            return Response({'message':'Export started', 'data':serializer.data}, status=status.HTTP_202_ACCEPTED)
+        return Response({'message':'Failed to start export', 'data':serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SubmissionExportRetrieveAPIView(APIView):
+    """
+    State and progress of a submission export, with its download link once done.
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = SubmissionExportSerializer
+    query_budget = {'GET': 1}
+
+    def get(self, request, pk):
+        export = get_object_or_404(SubmissionExport, pk=pk)
+        serializer = self.serializer_class(export, context={'request': request})
+        return Response({'message':'Success', 'data':serializer.data}, status=status.HTTP_200_OK)
+
+
+class SubmissionExportDownloadAPIView(APIView):
+    """
+    Streams the file of a finished submission export from storage.
+    """
+    permission_classes = [IsAdminUser]
+    query_budget = {'GET': 1}
+
+    def get(self, request, pk):
+        export = get_object_or_404(SubmissionExport, pk=pk, state='done')
+        if not export.file:
+            raise Http404
+        return FileResponse(export.file.open('rb'), as_attachment=True, filename=export.file.name.rsplit('/', 1)[-1])
+
+
+class UploadCreateAPIView(APIView):
+    """
+    Starts a resumable upload: the client declares the file's name, type and
+    size, then PATCHes its bytes to the returned upload (see forms/uploads.py).
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = UploadSerializer
+    query_budget = {'POST': 2}
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response({'message':'Failed to create upload', 'data':serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = create_upload(request.user, **serializer.validated_data)
+        except UploadError as exc:
+            return Response({'message':'Failed to create upload', 'data':{'size':[str(exc)]}}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        response = Response({'message':'Upload created', 'data':self.serializer_class(upload).data}, status=status.HTTP_201_CREATED)
+        response['Location'] = reverse('upload-detail', kwargs={'pk': upload.pk})
+        response['Upload-Offset'] = upload.offset
+        return response
+
+
+class DirectUploadCreateAPIView(APIView):
+    """
+    Starts an upload that goes straight to the object store: the client
+    declares the file's name, type, size and sha256 and gets a presigned URL
+    to PUT it to (with the returned headers), then finalizes the upload as
+    usual. The file's bytes never reach the web workers.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = DirectUploadSerializer
+    query_budget = {'POST': 1}
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response({'message':'Failed to create upload', 'data':serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload, url, headers = create_direct_upload(request.user, **serializer.validated_data)
+        except UploadError as exc:
+            return Response({'message':'Failed to create upload', 'data':{'size':[str(exc)]}}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        data = {
+            **self.serializer_class(upload).data,
+            'upload_url': request.build_absolute_uri(url),
+            'method': 'PUT',
+            'headers': headers,
+        }
+        response = Response({'message':'Upload created', 'data':data}, status=status.HTTP_201_CREATED)
+        response['Location'] = reverse('upload-detail', kwargs={'pk': upload.pk})
+        return response
+
+
+class DirectUploadPutAPIView(APIView):
+    """
+    The local stand-in for the object store's presigned PUT
+    (`DIRECT_UPLOAD_BACKEND = 'local'`): the signed token in the URL
+    authorizes the request, and the body must match the signed size and
+    sha256.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    query_budget = {'PUT': 0}
+
+    def put(self, request, token):
+        storage = get_object_storage()
+        if not hasattr(storage, 'receive'):
+            raise Http404
+        length = request.META.get('CONTENT_LENGTH') or ''
+        if not length.isdigit():
+            return Response({'message':'Failed to store object', 'data':{'non_field_errors':['Content-Length is required.']}}, status=status.HTTP_411_LENGTH_REQUIRED)
+        try:
+            storage.receive(token, request.stream, int(length))
+        except ObjectRejected as exc:
+            return Response({'message':'Failed to store object', 'data':{'non_field_errors':[str(exc)]}}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_200_OK)
+
+
+class UploadAPIView(APIView):
+    """
+    GET/HEAD: how far an upload got (also in the `Upload-Offset` header).
+    PATCH: appends the request body, starting at the `Upload-Offset` header,
+    which must equal the upload's current offset (409 with the offset otherwise).
+    DELETE: discards an upload that is not attached.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = UploadSerializer
+    query_budget = {'GET': 1, 'HEAD': 1, 'PATCH': 2, 'DELETE': 3}
+
+    def get_object(self, pk):
+        return get_object_or_404(Upload, pk=pk, user=self.request.user)
+
+    def _response(self, upload, message='Success', response_status=status.HTTP_200_OK):
+        response = Response({'message':message, 'data':self.serializer_class(upload).data}, status=response_status)
+        response['Upload-Offset'] = upload.offset
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    def get(self, request, pk):
+        return self._response(self.get_object(pk))
+
+    def patch(self, request, pk):
+        upload = self.get_object(pk)
+        offset = request.headers.get('Upload-Offset', '')
+        length = request.META.get('CONTENT_LENGTH') or ''
+        if not offset.isdigit() or not length.isdigit():
+            return Response({'message':'Failed to write chunk', 'data':{'non_field_errors':['Upload-Offset and Content-Length headers are required.']}}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            write_chunk(upload, int(offset), request.stream, int(length))
+        except UploadOffsetConflict as exc:
+            upload.offset = exc.offset
+            return self._response(upload, 'Offset does not match the upload', status.HTTP_409_CONFLICT)
+        except UploadError as exc:
+            return Response({'message':'Failed to write chunk', 'data':{'non_field_errors':[str(exc)]}}, status=status.HTTP_400_BAD_REQUEST)
+        return self._response(upload, 'Chunk received')
+
+    def delete(self, request, pk):
+        try:
+            discard_upload(self.get_object(pk))
+        except UploadError as exc:
+            return Response({'message':'Failed to delete upload', 'data':{'non_field_errors':[str(exc)]}}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'message':'Upload deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadFinalizeAPIView(APIView):
+    """
+    Completes an upload whose bytes are all in (for a direct upload: checked
+    with the object store) and moves it into document storage, ready to be
+    attached to a submission.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = UploadSerializer
+    # the upload, its blob looked up and locked or inserted (with savepoints), the upload saved
+    query_budget = {'POST': 8}
+
+    def post(self, request, pk):
+        upload = get_object_or_404(Upload, pk=pk, user=request.user)
+        try:
+            finalize_upload(upload)
+        except UploadError as exc:
+            return Response({'message':'Failed to finalize upload', 'data':{'non_field_errors':[str(exc)]}}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'message':'Upload complete', 'data':self.serializer_class(upload).data}, status=status.HTTP_200_OK)
+
+
 class SubmissionRetrieveUpdateDestroyAPIView(APIView):
     
     serializer_class = SubmissionSerializer
+    query_budget = {'GET': 5, 'DELETE': 9}
     
     
     def get_permissions(self):
@@ -219,8 +721,9 @@ class SubmissionRetrieveUpdateDestroyAPIView(APIView):
         return get_object_or_404(Submission,pk=pk)
     
     def get(self, request, pk):
-        submission = self.get_object(pk)
-        serializer = self.serializer_class(submission)
+        representation = Representation.from_request(request)
+        submission = get_object_or_404(Submission.objects.for_serialization(representation), pk=pk)
+        serializer = self.serializer_class(submission, context={'representation': representation})
         return Response({'message':'Success', 'data':serializer.data}, status = status.HTTP_200_OK)
     
     def delete(self,request,pk):
@@ -235,8 +738,17 @@ class MySubmissions(APIView):
     """
     permission_classes = [IsAuthenticated]
     serializer_class = SubmissionSerializer
+    query_budget = {'GET': 5}
     def get(self,request):
         
-        my_submissions = Submission.objects.filter(user =request.user)
-        serializer = self.serializer_class(my_submissions, many = True)
-        return Response({'message':'Success','data':serializer.data}, status=status.HTTP_200_OK)
\ No newline at end of file
+        representation = Representation.from_request(request)
+        my_submissions = Submission.objects.for_serialization(representation).filter(user =request.user)
+        submission_filter = SubmissionFilter.from_request(request)
+        my_submissions = submission_filter.apply(my_submissions)
+        stream_format = get_stream_format(request)
+        if stream_format:
+            serializer = self.serializer_class(context={'representation': representation})
+            return stream_queryset(my_submissions, serializer, stream_format)
+        my_submissions, next_cursor = KeysetPaginator(submission_filter.ordering).paginate(my_submissions, request)
+        serializer = self.serializer_class(my_submissions, many = True, context={'representation': representation})
+        return Response({'message':'Success','data':serializer.data, 'next':next_cursor}, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -97,7 +97,7 @@ interface ApiSubmissionResponse {
     id: number; 
     form: { id: number, name: string };
     user: { id: number, email: string, first_name: string };
-    data: string;
+    data: string | Record<string, any>;
     status: 'pending' | 'review' | 'approved' | 'rejected'; 
     submitted_at: string; 
     updated_at: string;
@@ -107,6 +107,7 @@ interface ApiSubmissionResponse {
 interface BackendResponseWrapper {
     message: string;
     data: any; 
+    next?: string | null;
 }
 
 interface ClientPortalProps {
@@ -120,6 +121,8 @@ interface ClientPortalProps {
 const FORMS_API_URL = 'http://54.226.123.10:8000/form/api/v1/forms/';
 const SUBMISSIONS_API_URL = 'http://54.226.123.10:8000/form/api/v1/submissions/'; 
 const MY_SUBMISSIONS_API_URL = 'http://54.226.123.10:8000/form/api/v1/my_submissions/';
+// compact rows: form id/name/version only, no documents; the user is still needed in full
+const MY_SUBMISSIONS_QUERY = 'view=summary&expand=user';
 
 // ⭐ New utility function to cast the API field type string to the narrow union type
 const safeCastFieldType = (type: string): FormFieldType => {
@@ -236,22 +239,35 @@ export function ClientPortal({ onLogout, clientName,  accessToken }: ClientPorta
     }, []);
 
     const fetchSubmissions = useCallback(async (headers: Record<string, string>) => {
-        const submissionsResponse = await fetch(MY_SUBMISSIONS_API_URL, { headers });
-        
-        if (!submissionsResponse.ok) {
-            const errorDetails = await submissionsResponse.text();
-            console.error("Submission fetch failed with status:", submissionsResponse.status, "Details:", errorDetails);
-            throw new Error(`Failed to fetch submissions: ${submissionsResponse.status} ${submissionsResponse.statusText}`);
+        // the history is paginated with cursors, follow `next` until the last page
+        const submissionArray: ApiSubmissionResponse[] = [];
+        let pageUrl: string | null = `${MY_SUBMISSIONS_API_URL}?${MY_SUBMISSIONS_QUERY}`;
+        while (pageUrl) {
+            const submissionsResponse = await fetch(pageUrl, { headers });
+            
+            if (!submissionsResponse.ok) {
+                const errorDetails = await submissionsResponse.text();
+                console.error("Submission fetch failed with status:", submissionsResponse.status, "Details:", errorDetails);
+                throw new Error(`Failed to fetch submissions: ${submissionsResponse.status} ${submissionsResponse.statusText}`);
+            }
+            
+            const fullApiResponse: BackendResponseWrapper = await submissionsResponse.json();
+            const apiData = fullApiResponse.data;
+            if (apiData && Array.isArray(apiData)) {
+                submissionArray.push(...apiData);
+            }
+            pageUrl = fullApiResponse.next
+                ? `${MY_SUBMISSIONS_API_URL}?${MY_SUBMISSIONS_QUERY}&cursor=${encodeURIComponent(fullApiResponse.next)}`
+                : null;
         }
         
-        const fullApiResponse: BackendResponseWrapper = await submissionsResponse.json();
-        const apiData = fullApiResponse.data;
-        const submissionArray: ApiSubmissionResponse[] = (apiData && Array.isArray(apiData)) ? apiData : [];
-        
         const remappedSubmissions: FormSubmission[] = submissionArray.map(apiSubmission => {
             let parsedData: Record<string, any> = {};
             try {
-                parsedData = JSON.parse(apiSubmission.data);
+                // older submissions stored the answers as a JSON string
+                parsedData = typeof apiSubmission.data === 'string'
+                    ? JSON.parse(apiSubmission.data)
+                    : apiSubmission.data;
             } catch (e) {
                 console.error("Failed to parse submission data JSON string:", apiSubmission.data, e);
             }